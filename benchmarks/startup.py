@@ -0,0 +1,175 @@
+"""
+Startup-time benchmark for the `es` CLI.
+
+Each subcommand is executed in a fresh interpreter with `-X importtime`, so every
+measurement is a cold import of exactly the modules that subcommand pulls in. The
+median over several runs is printed per subcommand and appended to a JSON-lines
+history file; with `--max-regression` the script exits non-zero when a subcommand
+got slower than the previous recorded run by more than the given percentage.
+
+Usage:
+    python benchmarks/startup.py [--repeat 5] [--history benchmarks/startup_history.jsonl]
+                                 [--max-regression 25]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+EXAMPLE_SUITE = REPO_ROOT / "tests" / "example_suite"
+DEFAULT_HISTORY = REPO_ROOT / "benchmarks" / "startup_history.jsonl"
+
+# Subcommand label -> CLI arguments. `run` points at an environment that does not exist,
+# so it imports everything the run command needs and stops at configuration validation
+# without contacting a database.
+SUBCOMMANDS: dict[str, list[str]] = {
+    "--help": ["--help"],
+    "view tests": ["view", "tests", "-a"],
+    "view test": ["view", "test", "example"],
+    "setup --help": ["setup", "--help"],
+    "run": ["run", "-e", "__startup_benchmark__"],
+}
+
+RUNNER = "import sys; from echosphere.main import app; sys.argv = ['es', *sys.argv[1:]]; app()"
+
+# Modules that must never be imported just to start the CLI
+HEAVY_MODULES = ("openpyxl", "xml.etree.ElementTree", "snowflake.connector", "psycopg2", "psycopg", "databricks.sql")
+
+
+def parse_importtime(stderr: str) -> tuple[float, list[str]]:
+    """
+    Return the total import time in milliseconds and the imported module names from `-X importtime` output.
+
+    :param stderr: Standard error of a process started with `-X importtime`.
+    :return: (total milliseconds of top-level imports, imported module names)
+    """
+    total_us = 0
+    modules: list[str] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|", 2)
+        modules.append(name.strip())
+        # Top-level imports are not indented; their cumulative time includes all nested imports
+        if not name.startswith("  ", 1):
+            total_us += int(cumulative)
+    return total_us / 1000, modules
+
+
+def measure(args: list[str], cwd: Path) -> dict[str, float | list[str]]:
+    """
+    Run one subcommand in a fresh interpreter and return its import and wall-clock time.
+
+    :param args: CLI arguments after `es`.
+    :param cwd: Working directory containing the example `es_suite`.
+    :return: Dictionary with `import_ms`, `wall_ms` and the heavy modules that were imported.
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RUNNER, *args],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1", "ES_ENV_NAME": ""},
+        check=False,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    import_ms, modules = parse_importtime(proc.stderr)
+    return {"import_ms": import_ms, "wall_ms": wall_ms, "heavy": sorted(set(HEAVY_MODULES) & set(modules))}
+
+
+def run_benchmark(repeat: int) -> dict[str, dict[str, float | list[str]]]:
+    """
+    Measure every subcommand `repeat` times and return the medians.
+
+    :param repeat: Number of fresh processes per subcommand.
+    :return: Mapping of subcommand label to its median measurements.
+    """
+    results: dict[str, dict[str, float | list[str]]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = Path(tmp)
+        shutil.copytree(EXAMPLE_SUITE, cwd / "es_suite")
+        for label, args in SUBCOMMANDS.items():
+            runs = [measure(args, cwd) for _ in range(repeat)]
+            results[label] = {
+                "import_ms": round(statistics.median(float(r["import_ms"]) for r in runs), 2),  # type: ignore[arg-type]
+                "wall_ms": round(statistics.median(float(r["wall_ms"]) for r in runs), 2),  # type: ignore[arg-type]
+                "heavy": runs[0]["heavy"],
+            }
+    return results
+
+
+def load_previous(history: Path) -> dict[str, dict[str, float]] | None:
+    """Return the subcommand results of the last recorded run, if any."""
+    if not history.exists():
+        return None
+    lines = [line for line in history.read_text().splitlines() if line.strip()]
+    if not lines:
+        return None
+    previous: dict[str, dict[str, float]] = json.loads(lines[-1])["subcommands"]
+    return previous
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Run the benchmark, print a table, record it and check for regressions.
+
+    :param argv: Command line arguments (defaults to sys.argv).
+    :return: Process exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh processes per subcommand (median is used).")
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY, help="JSON-lines file to append results to.")
+    parser.add_argument("--no-record", action="store_true", help="Do not append this run to the history file.")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=None,
+        help="Fail if a subcommand's import time grew by more than this percentage since the last recorded run.",
+    )
+    opts = parser.parse_args(argv)
+
+    previous = load_previous(opts.history)
+    results = run_benchmark(opts.repeat)
+
+    failures: list[str] = []
+    print(f"{'subcommand':<16}{'import ms':>12}{'wall ms':>12}{'change':>10}  heavy modules")
+    for label, res in results.items():
+        change = ""
+        import_ms = float(res["import_ms"])  # type: ignore[arg-type]
+        if previous and label in previous and previous[label]["import_ms"] > 0:
+            pct = (import_ms / previous[label]["import_ms"] - 1) * 100
+            change = f"{pct:+.1f}%"
+            if opts.max_regression is not None and pct > opts.max_regression:
+                failures.append(f"{label}: import time {import_ms}ms is {pct:.1f}% above the last recorded run")
+        heavy = ", ".join(res["heavy"]) or "-"  # type: ignore[arg-type]
+        print(f"{label:<16}{import_ms:>12.2f}{float(res['wall_ms']):>12.2f}{change:>10}  {heavy}")  # type: ignore[arg-type]
+
+    if not opts.no_record:
+        opts.history.parent.mkdir(parents=True, exist_ok=True)
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "subcommands": results,
+        }
+        with opts.history.open("a") as fh:
+            fh.write(json.dumps(record) + "\n")
+
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
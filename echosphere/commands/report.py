@@ -0,0 +1,103 @@
+import typer
+
+from echosphere.core.latency_report import DEFAULT_MAX_RATIO, DEFAULT_MIN_DELTA
+
+app = typer.Typer()
+
+DEFAULT_BASELINE_RUNS = 5
+
+
+def _fmt(value: float | None) -> str:
+    """Format seconds for the report tables."""
+    return "-" if value is None else f"{value:.3f}s"
+
+
+@app.command(
+    name="latency",
+    help="Compare test durations of a run with a baseline and fail on latency regressions.",
+)
+def latency_report(
+    env: str | None = typer.Option(
+        None, "-e", "--environment", envvar="ES_ENV_NAME", show_envvar=False, help="Environment name config."
+    ),
+    run_id: int | None = typer.Option(None, "--run", help="Run id to check (default: the latest run)."),
+    baseline_runs: int = typer.Option(
+        DEFAULT_BASELINE_RUNS, "-n", "--baseline-runs", min=1, help="Compare with the median of the previous N runs."
+    ),
+    baseline_tag: str | None = typer.Option(
+        None, "-t", "--baseline-tag", help="Compare with the latest run recorded with `es run --tag TAG`."
+    ),
+    max_ratio: float = typer.Option(
+        DEFAULT_MAX_RATIO, "--max-ratio", help="Flag tests that got slower by more than this factor."
+    ),
+    min_delta: float = typer.Option(
+        DEFAULT_MIN_DELTA, "--min-delta", help="Only flag tests that also got slower by more than this many seconds."
+    ),
+) -> None:
+    """
+    Print a latency regression report from the run history and exit non-zero on regressions.
+
+    :param env: Environment whose history is read; if None, `[default].env` is used.
+    :param run_id: Run to check; defaults to the latest recorded run.
+    :param baseline_runs: Number of runs before `run_id` forming the baseline.
+    :param baseline_tag: Use the latest run with this tag as baseline instead.
+    :param max_ratio: Minimum slowdown factor for a regression.
+    :param min_delta: Minimum slowdown in seconds for a regression.
+    :return: None
+    """
+    from rich.console import Console
+    from rich.table import Table
+
+    from echosphere.core.history import DurationHistory, default_history_path
+    from echosphere.core.latency_report import build_latency_report
+    from echosphere.env_config_parser.EnvironmentRegistry import get_registry
+    from echosphere.env_config_parser.validation import ConfigurationError
+
+    console = Console()
+    try:
+        registry = get_registry()
+        resolved_env = registry.resolve_name(env)
+    except ConfigurationError as e:
+        for error in e.errors:
+            console.print(f"[bold red]Error:[/bold red] {error}")
+        raise typer.Exit(code=-1)
+
+    with DurationHistory(default_history_path(registry.path)) as history:
+        run_id = run_id if run_id is not None else history.latest_run_id(resolved_env)
+        if run_id is None:
+            console.print(f"[bold red]Error:[/bold red] No recorded runs for environment '{resolved_env}'.")
+            raise typer.Exit(code=-1)
+        if baseline_tag:
+            baseline_ids = history.find_runs(resolved_env, tag=baseline_tag, limit=1)
+        else:
+            baseline_ids = history.find_runs(resolved_env, before=run_id, limit=baseline_runs)
+        if not baseline_ids:
+            console.print("[bold yellow]No baseline runs found; nothing to compare.[/bold yellow]")
+            raise typer.Exit(code=0)
+        report = build_latency_report(
+            run_id,
+            history.run_durations([run_id]),
+            baseline_ids,
+            history.run_durations(baseline_ids),
+            max_ratio=max_ratio,
+            min_delta=min_delta,
+        )
+
+    console.print(
+        f"Run [bold]{report.run_id}[/bold] compared with run(s) {', '.join(map(str, report.baseline_run_ids))}"
+    )
+    suites = Table("Subsuite", "Tests", "p50", "p95", "Baseline p50", "Baseline p95", title="Durations per subsuite")
+    for s in report.subsuites:
+        suites.add_row(s.subsuite, str(s.tests), _fmt(s.p50), _fmt(s.p95), _fmt(s.baseline_p50), _fmt(s.baseline_p95))
+    console.print(suites)
+
+    if not report.failed:
+        console.print("[bold green]No latency regressions.[/bold green]")
+        return
+
+    regressions = Table("Test", "Subsuite", "Baseline", "Current", "Change", title="Latency regressions")
+    for t in report.regressions:
+        regressions.add_row(t.name, t.subsuite or "-", _fmt(t.baseline), _fmt(t.current), f"x{t.ratio:.1f}")
+    console.print(regressions)
+    console.print(f"[bold red]{len(report.regressions)} test(s) slower than x{max_ratio} and +{min_delta}s.[/bold red]")
+    raise typer.Exit(code=1)
@@ -1,7 +1,5 @@
 import typer
 
-from echosphere.core.suite_display import display_test_names_table, display_test_sql_code
-
 app = typer.Typer()
 
 
@@ -24,6 +22,8 @@ def list_test_suite(
         typer.echo("Error: Cannot use both --all and --suite options together.")
         raise typer.Exit(code=1)
 
+    from echosphere.core.suite_display import display_test_names_table
+
     display_test_names_table(subdir=None if all_tests else subdir)
 
 
@@ -36,4 +36,6 @@ def view_test_sql(name: str) -> None:
                  `<subsuite>/<test_name>`.
     :return: None
     """
+    from echosphere.core.suite_display import display_test_sql_code
+
     display_test_sql_code(name)
@@ -0,0 +1,251 @@
+"""
+Adaptive concurrency control for `es run`.
+
+The engine admits tests through an `AdaptiveConcurrencyLimiter`, which adjusts the
+number of in-flight tests with an AIMD (additive increase, multiplicative decrease)
+policy. It starts at the ceiling, so adapting never makes a healthy run slower than
+`--fixed-concurrency`:
+
+- every completed test with an expected duration from previous runs is a latency
+  sample: its duration divided by the expected one. Time spent queueing for a pooled
+  session or for warehouse capacity makes tests slower than usual, so queueing shows
+  up as latency growth, while a suite mixing long and short tests does not;
+- when the short-term latency inflates beyond `latency_tolerance` times the long-term
+  latency, the limit is multiplied by `decrease_factor`; a throttling error from the
+  database multiplies it by `throttle_factor`. After a decrease, further decreases
+  wait for one round of completions so a single burst is not punished twice;
+- while latency stays within the tolerance, the limit grows back by about one per
+  round of `limit` completions (by one per completion during slow start, i.e. until
+  the first decrease when started below the ceiling).
+
+The limit never exceeds the ceiling resolved by `resolve_concurrency_ceiling` from the
+CLI and `es.ini`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
+
+from echosphere.env_config_parser.EnvironmentRegistry import get_registry
+from echosphere.env_config_parser.validation import ConfigurationError
+
+DEFAULT_MAX_CONCURRENCY = 50
+# Built-in ceilings per platform, used when neither the CLI nor es.ini sets one
+DEFAULT_PLATFORM_CEILINGS: dict[str, int] = {
+    "snowflake": 64,
+    "databricks": 32,
+    "postgres": 16,
+}
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limiter for the number of tests in flight on one event loop.
+
+    Use `async with limiter.slot(expected):` around each dispatch and call `on_throttled()`
+    when the database rejects work because it is overloaded.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        *,
+        min_limit: int = 1,
+        initial_limit: int | None = None,
+        adaptive: bool = True,
+        decrease_factor: float = 0.9,
+        throttle_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        short_alpha: float = 0.2,
+        long_alpha: float = 0.02,
+    ) -> None:
+        """
+        Initialize the limiter.
+
+        :param max_limit: Ceiling for the number of in-flight tests.
+        :param min_limit: Floor for the number of in-flight tests.
+        :param initial_limit: Starting limit (default: `max_limit`); ignored if not adaptive.
+        :param adaptive: If False, the limit stays fixed at `max_limit`.
+        :param decrease_factor: Multiplier applied when latency inflates.
+        :param throttle_factor: Multiplier applied on a throttling error.
+        :param latency_tolerance: Allowed ratio of short-term to long-term latency.
+        :param short_alpha: Smoothing factor of the short-term latency average.
+        :param long_alpha: Smoothing factor of the long-term latency average.
+        """
+        if min_limit < 1 or max_limit < min_limit:
+            raise ValueError("Concurrency limits must satisfy 1 <= min_limit <= max_limit.")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.adaptive = adaptive
+        self.decrease_factor = decrease_factor
+        self.throttle_factor = throttle_factor
+        self.latency_tolerance = latency_tolerance
+        self.short_alpha = short_alpha
+        self.long_alpha = long_alpha
+
+        start = (initial_limit or max_limit) if adaptive else max_limit
+        self._limit = float(min(max_limit, max(min_limit, start)))
+        self._slow_start = adaptive
+        self._cooldown = 0
+        self._short_latency: float | None = None
+        self._long_latency: float | None = None
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+        self.peak_in_flight = 0
+        self.decreases = 0
+        self.throttles = 0
+
+    @property
+    def limit(self) -> int:
+        """Current number of tests allowed in flight."""
+        return max(self.min_limit, min(self.max_limit, int(self._limit)))
+
+    @property
+    def in_flight(self) -> int:
+        """Number of tests currently holding a slot."""
+        return self._in_flight
+
+    @asynccontextmanager
+    async def slot(self, expected: float | None = None) -> AsyncIterator[None]:
+        """
+        Hold one in-flight slot.
+
+        :param expected: Expected duration of the work in seconds, e.g. from previous runs. On success, the
+                         elapsed time divided by it is recorded as a latency sample; without it, no sample is taken.
+        """
+        await self._acquire()
+        start = time.monotonic()
+        latency: float | None = None
+        try:
+            yield
+            if expected:
+                latency = (time.monotonic() - start) / expected
+        finally:
+            self._release(latency)
+
+    def on_throttled(self) -> None:
+        """Record a throttling error: cut the limit by `throttle_factor`."""
+        self.throttles += 1
+        if self.adaptive:
+            self._decrease(self.throttle_factor, force=True)
+
+    async def _acquire(self) -> None:
+        """Wait until a slot is free and take it."""
+        if self._in_flight < self.limit and not self._waiters:
+            self._take()
+            return
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the cancellation; give it back
+                self._release(None)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _take(self) -> None:
+        """Account for one more in-flight test."""
+        self._in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+
+    def _release(self, latency: float | None) -> None:
+        """Give a slot back, update the limit and hand free slots to waiters."""
+        self._in_flight -= 1
+        if self.adaptive and latency is not None:
+            self._on_latency(latency)
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._take()
+                waiter.set_result(None)
+
+    def _on_latency(self, latency: float) -> None:
+        """Apply one latency sample, relative to the expected duration, to the AIMD state."""
+        if self._short_latency is None or self._long_latency is None:
+            self._short_latency = self._long_latency = latency
+        else:
+            self._short_latency += self.short_alpha * (latency - self._short_latency)
+            self._long_latency += self.long_alpha * (latency - self._long_latency)
+        self._cooldown = max(0, self._cooldown - 1)
+
+        if self._short_latency > self.latency_tolerance * self._long_latency:
+            self._decrease(self.decrease_factor)
+        elif self._slow_start:
+            self._limit = min(self.max_limit, self._limit + 1)
+        else:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+    def _decrease(self, factor: float, force: bool = False) -> None:
+        """Multiply the limit by `factor`, at most once per round unless forced."""
+        if not force and self._cooldown:
+            return
+        self._slow_start = False
+        self._limit = max(float(self.min_limit), self._limit * factor)
+        self._cooldown = self.limit
+        self.decreases += 1
+
+
+def parse_concurrency_overrides(values: Iterable[str]) -> dict[str | None, int]:
+    """
+    Parse `--max-concurrency` values into ceilings keyed by scope.
+
+    A bare number applies to every environment (key None); `<platform>=N` applies to one
+    platform and `<environment>=N` to one es.ini environment section.
+
+    :param values: Raw CLI values, e.g. ["16", "postgres=4", "env.snowflake.prod=128"].
+    :return: Mapping of scope (None, platform name or environment name) to ceiling.
+    :raises ValueError: If a value is malformed or not a positive integer.
+    """
+    overrides: dict[str | None, int] = {}
+    for raw in values:
+        scope, _, number = raw.rpartition("=")
+        try:
+            ceiling = int(number)
+        except ValueError:
+            raise ValueError(f"Invalid --max-concurrency value '{raw}'. Use N, <platform>=N or <environment>=N.")
+        if ceiling < 1:
+            raise ValueError(f"Invalid --max-concurrency value '{raw}'. The ceiling must be at least 1.")
+        overrides[scope.strip() or None] = ceiling
+    return overrides
+
+
+def resolve_concurrency_ceiling(env: str | None, overrides: dict[str | None, int] | None = None) -> int:
+    """
+    Return the maximum number of in-flight tests for an environment.
+
+    Precedence, first match wins: CLI value for the environment, CLI value for its
+    platform, bare CLI value, `max_concurrency` in the environment section,
+    `max_concurrency.<platform>` in `[default]`, `max_concurrency` in `[default]`,
+    and finally the built-in platform default.
+
+    :param env: Optional environment section; if None, uses `[default].env`.
+    :param overrides: Parsed `--max-concurrency` values (see `parse_concurrency_overrides`).
+    :return: The ceiling, at least 1.
+    :raises ConfigurationError: If a configured ceiling is below 1.
+    """
+    registry = get_registry()
+    resolved = registry.get(env)
+    overrides = overrides or {}
+    for scope in (resolved.name, resolved.platform, None):
+        if scope in overrides:
+            return overrides[scope]
+
+    for option, include_default in (
+        ("max_concurrency", False),
+        (f"max_concurrency.{resolved.platform}", True),
+        ("max_concurrency", True),
+    ):
+        value = registry.get_optional_int(option, resolved.name, include_default=include_default)
+        if value is not None:
+            if value < 1:
+                raise ConfigurationError([f"'{option}' must be at least 1 (environment '{resolved.name}')"])
+            return value
+    return DEFAULT_PLATFORM_CEILINGS.get(resolved.platform, DEFAULT_MAX_CONCURRENCY)
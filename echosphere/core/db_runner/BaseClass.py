@@ -1,7 +1,24 @@
 from __future__ import annotations
 
+import asyncio
+import importlib.util
+import logging
 from abc import ABC, abstractmethod
-from typing import Any, Type
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Any, ClassVar, Type
+
+from echosphere.core.db_runner.connection_pool import DEFAULT_POOL_SIZE, ConnectionPool, get_pool
+from echosphere.env_config_parser.PlatformExtractor import PlatformExtractor
+from echosphere.utils.sql_tables import TableRef
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+TOTAL_ROWS_COLUMN = "__es_total_rows"
+# Rows fetched for the failure sample of a test, unless `sample_rows` is set in es.ini
+DEFAULT_SAMPLE_ROWS = 1000
 
 
 class BaseRunner(ABC):
@@ -10,9 +27,44 @@ class BaseRunner(ABC):
 
     Runners must implement classmethods for:
     - dispatch_test(env, test_file_path) -> (row_count, execution_time_seconds, sql_text)
-    - fetch_failure_sample(env, sql, limit=1000) -> (column_names, rows)
+    - fetch_failure_sample(env, sql, limit=DEFAULT_SAMPLE_ROWS) -> (column_names, rows)
+
+    `dispatch_test_with_sample(env, test_file_path, limit)` returns the row count together
+    with the first `limit` rows. The default runs `dispatch_test` and, for failing tests,
+    `fetch_failure_sample`; runners that can get both from a single execution override it.
+
+    Every runner also exposes the async variants `dispatch_test_async` and
+    `fetch_failure_sample_async`. By default they run the blocking implementation
+    on the event loop's executor (bounded by the async engine); runners with a
+    native async driver override them.
+
+    Runners that borrow sessions from the shared connection pool implement
+    `_create_connection(env)` and may refine `_is_connection_healthy(conn)`.
+
+    Runners whose driver returns result sets as Arrow set `ARROW_SAMPLES` and implement
+    `fetch_failure_sample_arrow(env, sql, limit) -> pyarrow.Table`. The engine then uses
+    `dispatch_test_with_arrow_sample(_async)`, and the sample stays columnar up to the
+    exporters instead of becoming a Python object per cell.
+
+    Runners supporting incremental runs implement `table_versions(env, tables)`, which
+    returns a change marker per table (e.g. Snowflake `LAST_ALTERED`).
+
+    `is_throttling_error(exc)` tells the adaptive concurrency controller whether an
+    exception means the database is overloaded; runners extend `THROTTLING_MARKERS`
+    with their driver's messages.
     """
 
+    # Lower-case message fragments of errors caused by too much concurrent load
+    THROTTLING_MARKERS: ClassVar[tuple[str, ...]] = (
+        "too many connections",
+        "too many requests",
+        "rate limit",
+        "throttl",
+    )
+
+    # True for runners implementing `fetch_failure_sample_arrow`
+    ARROW_SAMPLES: ClassVar[bool] = False
+
     @classmethod
     @abstractmethod
     def dispatch_test(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
@@ -21,10 +73,201 @@ class BaseRunner(ABC):
 
     @classmethod
     @abstractmethod
-    def fetch_failure_sample(cls, env: str | None, sql: str, limit: int = 1000) -> tuple[list[str], list[tuple[Any]]]:
+    def fetch_failure_sample(
+        cls, env: str | None, sql: str, limit: int = DEFAULT_SAMPLE_ROWS
+    ) -> tuple[list[str], list[tuple[Any]]]:
         """Return (column_names, rows) for a limited sample of the failing SQL output."""
         raise NotImplementedError
 
+    @classmethod
+    def dispatch_test_with_sample(
+        cls, env: str | None, test_file_path: str, limit: int = DEFAULT_SAMPLE_ROWS
+    ) -> tuple[int, float, str, list[str], list[tuple[Any, ...]]]:
+        """
+        Execute the SQL test file and return (row_count, execution_time_seconds, sql_text, column_names, rows).
+
+        Rows are only sampled for failing tests; passing tests return empty columns and rows.
+        """
+        row_count, execution_time, sql = cls.dispatch_test(env=env, test_file_path=test_file_path)
+        if not row_count:
+            return row_count, execution_time, sql, [], []
+        try:
+            cols, rows = cls.fetch_failure_sample(env=env, sql=sql, limit=limit)
+        except Exception:
+            # Keep exporting flow robust; the test result itself is already known
+            logger.warning("Failed to fetch failure sample", exc_info=True)
+            return row_count, execution_time, sql, [], []
+        return row_count, execution_time, sql, list(cols), list(rows)
+
+    @classmethod
+    def supports_arrow(cls) -> bool:
+        """Return True if failure samples can be fetched as Arrow tables (the runner supports it and pyarrow is installed)."""
+        return cls.ARROW_SAMPLES and importlib.util.find_spec("pyarrow") is not None
+
+    @classmethod
+    def fetch_failure_sample_arrow(cls, env: str | None, sql: str, limit: int = DEFAULT_SAMPLE_ROWS) -> pa.Table | None:
+        """Return a limited sample of the failing SQL output as an Arrow table (None if it has no rows)."""
+        raise NotImplementedError(f"{cls.__name__} does not support Arrow samples.")
+
+    @classmethod
+    def dispatch_test_with_arrow_sample(
+        cls, env: str | None, test_file_path: str, limit: int = DEFAULT_SAMPLE_ROWS
+    ) -> tuple[int, float, str, pa.Table | None]:
+        """
+        Execute the SQL test file and return (row_count, execution_time_seconds, sql_text, sample_table).
+
+        Arrow variant of `dispatch_test_with_sample`; passing tests and failed sample fetches return no table.
+        """
+        row_count, execution_time, sql = cls.dispatch_test(env=env, test_file_path=test_file_path)
+        if not row_count:
+            return row_count, execution_time, sql, None
+        try:
+            table = cls.fetch_failure_sample_arrow(env=env, sql=sql, limit=limit)
+        except Exception:
+            logger.warning("Failed to fetch failure sample", exc_info=True)
+            return row_count, execution_time, sql, None
+        return row_count, execution_time, sql, table
+
+    @staticmethod
+    def _windowed_sample_sql(sql: str, limit: int) -> str:
+        """
+        Wrap test SQL so one execution returns its first `limit` rows plus the total row count.
+
+        The total is appended to every row as the last column `__es_total_rows`; an empty
+        result means zero rows.
+        """
+        sql_clean = sql.strip().rstrip(";")
+        return f"SELECT t.*, COUNT(*) OVER () AS {TOTAL_ROWS_COLUMN} FROM ({sql_clean}) AS t LIMIT {int(limit)}"
+
+    @staticmethod
+    def _split_windowed_sample(cols: list[str], rows: list[Any]) -> tuple[int, list[str], list[tuple[Any, ...]]]:
+        """Split the result of `_windowed_sample_sql` into (row_count, column_names, rows)."""
+        row_count = int(rows[0][-1]) if rows else 0
+        return row_count, cols[:-1], [tuple(r)[:-1] for r in rows]
+
+    @staticmethod
+    def _split_windowed_arrow(table: pa.Table) -> tuple[int, pa.Table]:
+        """Split the Arrow result of `_windowed_sample_sql` into (row_count, sample_table)."""
+        row_count = int(table.column(table.num_columns - 1)[0].as_py()) if table.num_rows else 0
+        return row_count, table.remove_column(table.num_columns - 1)
+
+    @classmethod
+    async def dispatch_test_async(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        """Async variant of `dispatch_test`; falls back to the blocking implementation in an executor thread."""
+        return await asyncio.to_thread(cls.dispatch_test, env, test_file_path)
+
+    @classmethod
+    async def fetch_failure_sample_async(
+        cls, env: str | None, sql: str, limit: int = DEFAULT_SAMPLE_ROWS
+    ) -> tuple[list[str], list[tuple[Any]]]:
+        """Async variant of `fetch_failure_sample`; falls back to the blocking implementation in an executor thread."""
+        return await asyncio.to_thread(cls.fetch_failure_sample, env, sql, limit)
+
+    @classmethod
+    async def dispatch_test_with_sample_async(
+        cls, env: str | None, test_file_path: str, limit: int = DEFAULT_SAMPLE_ROWS
+    ) -> tuple[int, float, str, list[str], list[tuple[Any, ...]]]:
+        """
+        Async variant of `dispatch_test_with_sample`.
+
+        The default composes `dispatch_test_async` and `fetch_failure_sample_async`, so runners
+        with a native async dispatch stay non-blocking. Runners overriding the blocking
+        single-pass method should override this one to run it in an executor thread.
+        """
+        row_count, execution_time, sql = await cls.dispatch_test_async(env, test_file_path)
+        if not row_count:
+            return row_count, execution_time, sql, [], []
+        try:
+            cols, rows = await cls.fetch_failure_sample_async(env, sql, limit)
+        except Exception:
+            logger.warning("Failed to fetch failure sample", exc_info=True)
+            return row_count, execution_time, sql, [], []
+        return row_count, execution_time, sql, list(cols), list(rows)
+
+    @classmethod
+    async def dispatch_test_with_arrow_sample_async(
+        cls, env: str | None, test_file_path: str, limit: int = DEFAULT_SAMPLE_ROWS
+    ) -> tuple[int, float, str, pa.Table | None]:
+        """
+        Async variant of `dispatch_test_with_arrow_sample`.
+
+        Like `dispatch_test_with_sample_async`, the default composes `dispatch_test_async` with the
+        blocking Arrow fetch in an executor thread.
+        """
+        row_count, execution_time, sql = await cls.dispatch_test_async(env, test_file_path)
+        if not row_count:
+            return row_count, execution_time, sql, None
+        try:
+            table = await asyncio.to_thread(cls.fetch_failure_sample_arrow, env, sql, limit)
+        except Exception:
+            logger.warning("Failed to fetch failure sample", exc_info=True)
+            return row_count, execution_time, sql, None
+        return row_count, execution_time, sql, table
+
+    @classmethod
+    def table_versions(cls, env: str | None, tables: Sequence[TableRef]) -> dict[TableRef, str | None]:
+        """
+        Return a marker per table that changes whenever the table's data may have changed.
+
+        Tables that do not exist, are views or cannot be tracked map to None.
+
+        :param env: Environment name from es.ini; if None, the default environment is used.
+        :param tables: Tables referenced by the tests.
+        :return: Mapping of table to its change marker or None.
+        """
+        raise NotImplementedError(f"{cls.__name__} does not support incremental runs.")
+
+    @classmethod
+    def is_throttling_error(cls, exc: BaseException) -> bool:
+        """Return True if `exc` signals that the database rejected work because of load."""
+        message = str(exc).lower()
+        return any(marker in message for marker in cls.THROTTLING_MARKERS)
+
+    @classmethod
+    def _create_connection(cls, env: str) -> Any:
+        """Open a new connection for the resolved environment and apply the session setup."""
+        raise NotImplementedError(f"{cls.__name__} does not support pooled connections.")
+
+    @classmethod
+    def _is_connection_healthy(cls, conn: Any) -> bool:
+        """Return True if a pooled connection still answers a trivial query."""
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT 1")
+            cur.fetchone()
+        finally:
+            cur.close()
+        return True
+
+    @classmethod
+    def _close_connection(cls, conn: Any) -> None:
+        """Close a pooled connection."""
+        conn.close()
+
+    @classmethod
+    def connection_pool(cls, env: str | None) -> ConnectionPool[Any]:
+        """
+        Return the process-wide connection pool of this runner for the given environment.
+
+        The pool is keyed by the resolved environment name, so `None` and the explicit default
+        environment share sessions. Its size is read from `pool_size` in the environment section
+        (or `[default]`) of es.ini.
+
+        :param env: Environment name from es.ini; if None, the default environment is used.
+        :return: The shared ConnectionPool.
+        """
+        resolved = PlatformExtractor.resolve_env_name(env)
+
+        def build() -> ConnectionPool[Any]:
+            return ConnectionPool(
+                factory=lambda: cls._create_connection(resolved),
+                health_check=cls._is_connection_healthy,
+                closer=cls._close_connection,
+                max_size=PlatformExtractor.extract_int_option("pool_size", DEFAULT_POOL_SIZE, env_name=resolved),
+            )
+
+        return get_pool((cls.__name__, resolved), build)
+
 
 # Convenient alias for factory typing
 RunnerType = Type[BaseRunner]
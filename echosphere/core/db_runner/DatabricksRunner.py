@@ -1,11 +1,21 @@
+from __future__ import annotations
+
+import asyncio
 import logging
 import time
-from typing import Any
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Any
 
 from databricks.sql import Connection
 
-from echosphere.core.db_runner.BaseClass import BaseRunner
+from echosphere.core.db_runner.BaseClass import DEFAULT_SAMPLE_ROWS, BaseRunner
+from echosphere.core.db_runner.cancellation import QueryCancelledError, track_query
 from echosphere.env_config_parser.DatabricksEnvConfigParser import DatabricksAgentConfig
+from echosphere.env_config_parser.EnvironmentRegistry import get_registry
+from echosphere.utils.sql_tables import TableRef
+
+if TYPE_CHECKING:
+    import pyarrow as pa
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +23,13 @@ logger = logging.getLogger(__name__)
 class DatabricksRunner(BaseRunner):
     """Execute SQL tests against Databricks using databricks-sql-connector."""
 
+    THROTTLING_MARKERS = (
+        *BaseRunner.THROTTLING_MARKERS,
+        "temporarily_unavailable",
+        "http 429",
+    )
+    ARROW_SAMPLES = True
+
     @classmethod
     def _connect(cls, cfg: DatabricksAgentConfig) -> Connection:
         """Return a Databricks SQL connection (import deferred to avoid hard dependency)."""
@@ -29,10 +46,36 @@ class DatabricksRunner(BaseRunner):
             access_token=cfg.access_token,
         )
 
+    @classmethod
+    def _create_connection(cls, env: str) -> Connection:
+        """Open a Databricks connection and switch to the configured catalog/schema once."""
+        cfg = get_registry().config_for(env, DatabricksAgentConfig)
+        connection = cls._connect(cfg)
+        with connection.cursor() as cursor:
+            # Optional initial USE statements for catalog/schema if provided
+            if cfg.catalog:
+                try:
+                    cursor.execute(f"USE CATALOG {cfg.catalog}")
+                except Exception:
+                    # Not all instances support catalogs; ignore silently
+                    pass
+            if cfg.schema:
+                try:
+                    cursor.execute(f"USE SCHEMA {cfg.schema}")
+                except Exception:
+                    pass
+        return connection
+
+    @classmethod
+    def _is_connection_healthy(cls, conn: Connection) -> bool:
+        """Return True if the connection is open and still answers a trivial query."""
+        if not conn.open:
+            return False
+        return super()._is_connection_healthy(conn)
+
     @classmethod
     def dispatch_test(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
         """Execute the SQL test file and return (row_count, execution_time_seconds, sql_text)."""
-        cfg = DatabricksAgentConfig(env_name=env)
         with open(test_file_path, "r") as s:
             sql = s.read()
         sql_clean = sql.strip().rstrip(";")
@@ -41,23 +84,12 @@ class DatabricksRunner(BaseRunner):
         logger.info("Executing Databricks test (COUNT wrapper)")
         start_time = time.time()
         try:
-            with cls._connect(cfg) as connection:
-                with connection.cursor() as cursor:
-                    # Optional initial USE statements for catalog/schema if provided
-                    if getattr(cfg, "catalog", None):
-                        try:
-                            cursor.execute(f"USE CATALOG {cfg.catalog}")
-                        except Exception:
-                            # Not all instances support catalogs; ignore silently
-                            pass
-                    if getattr(cfg, "schema", None):
-                        try:
-                            cursor.execute(f"USE SCHEMA {cfg.schema}")
-                        except Exception:
-                            pass
-
+            with cls.connection_pool(env).connection() as connection:
+                with connection.cursor() as cursor, track_query(cursor.cancel):
                     cursor.execute(count_sql)
                     row = cursor.fetchone()
+        except QueryCancelledError:
+            raise
         except Exception as e:
             logger.exception("Databricks query execution failed")
             raise Exception(f"Failed to execute test on Databricks: {e}")
@@ -73,30 +105,107 @@ class DatabricksRunner(BaseRunner):
         execution_time = round(end_time - start_time, 3)
         return row_count, execution_time, sql
 
+    @classmethod
+    def dispatch_test_with_sample(
+        cls, env: str | None, test_file_path: str, limit: int = DEFAULT_SAMPLE_ROWS
+    ) -> tuple[int, float, str, list[str], list[tuple[Any, ...]]]:
+        """Execute the SQL test file once and return its row count together with the first `limit` rows."""
+        with open(test_file_path, "r") as s:
+            sql = s.read()
+        sample_sql = cls._windowed_sample_sql(sql, limit)
+
+        logger.info("Executing Databricks test (windowed COUNT with sample, limit=%s)", limit)
+        start_time = time.time()
+        try:
+            with cls.connection_pool(env).connection() as connection:
+                with connection.cursor() as cursor, track_query(cursor.cancel):
+                    cursor.execute(sample_sql)
+                    rows = cursor.fetchmany(size=limit)
+                    cols = [d[0] for d in cursor.description] if cursor.description else []
+        except QueryCancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Databricks query execution failed")
+            raise Exception(f"Failed to execute test on Databricks: {e}")
+        end_time = time.time()
+
+        row_count, cols, rows = cls._split_windowed_sample(cols, rows)
+        execution_time = round(end_time - start_time, 3)
+        return row_count, execution_time, sql, cols, rows
+
+    @classmethod
+    async def dispatch_test_with_sample_async(
+        cls, env: str | None, test_file_path: str, limit: int = DEFAULT_SAMPLE_ROWS
+    ) -> tuple[int, float, str, list[str], list[tuple[Any, ...]]]:
+        """Async variant of `dispatch_test_with_sample`, running the single-pass query in an executor thread."""
+        return await asyncio.to_thread(cls.dispatch_test_with_sample, env, test_file_path, limit)
+
+    @classmethod
+    def dispatch_test_with_arrow_sample(
+        cls, env: str | None, test_file_path: str, limit: int = DEFAULT_SAMPLE_ROWS
+    ) -> tuple[int, float, str, pa.Table | None]:
+        """
+        Arrow variant of `dispatch_test_with_sample`: the single-pass query is fetched with
+        `fetchmany_arrow`, so the sample arrives as the Arrow batches the warehouse sent.
+        """
+        with open(test_file_path, "r") as s:
+            sql = s.read()
+        sample_sql = cls._windowed_sample_sql(sql, limit)
+
+        logger.info("Executing Databricks test (windowed COUNT with Arrow sample, limit=%s)", limit)
+        start_time = time.time()
+        try:
+            with cls.connection_pool(env).connection() as connection:
+                with connection.cursor() as cursor, track_query(cursor.cancel):
+                    cursor.execute(sample_sql)
+                    table = cursor.fetchmany_arrow(limit)
+        except QueryCancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Databricks query execution failed")
+            raise Exception(f"Failed to execute test on Databricks: {e}")
+        end_time = time.time()
+
+        row_count, table = cls._split_windowed_arrow(table)
+        execution_time = round(end_time - start_time, 3)
+        return row_count, execution_time, sql, table if row_count else None
+
+    @classmethod
+    async def dispatch_test_with_arrow_sample_async(
+        cls, env: str | None, test_file_path: str, limit: int = DEFAULT_SAMPLE_ROWS
+    ) -> tuple[int, float, str, pa.Table | None]:
+        """Async variant of `dispatch_test_with_arrow_sample`, running the single-pass query in an executor thread."""
+        return await asyncio.to_thread(cls.dispatch_test_with_arrow_sample, env, test_file_path, limit)
+
+    @classmethod
+    def fetch_failure_sample_arrow(cls, env: str | None, sql: str, limit: int = DEFAULT_SAMPLE_ROWS) -> pa.Table | None:
+        """Return a limited sample of the failing SQL output as an Arrow table."""
+        sql_clean = sql.strip().rstrip(";")
+        wrapped_sql = f"SELECT * FROM ({sql_clean}) AS t LIMIT {int(limit)}"
+
+        logger.info("Fetching Databricks failure sample as Arrow (limit=%s)", limit)
+        try:
+            with cls.connection_pool(env).connection() as connection:
+                with connection.cursor() as cursor, track_query(cursor.cancel):
+                    cursor.execute(wrapped_sql)
+                    table: pa.Table = cursor.fetchmany_arrow(limit)
+        except Exception as e:
+            logger.exception("Databricks failure sample fetch failed")
+            raise Exception(f"Failed to fetch failure sample from Databricks: {e}")
+        return table
+
     @classmethod
     def fetch_failure_sample(
-        cls, env: str | None, sql: str, limit: int = 1000
+        cls, env: str | None, sql: str, limit: int = DEFAULT_SAMPLE_ROWS
     ) -> tuple[list[str], list[tuple[Any, ...]]]:
         """Return (column_names, rows) for a limited sample of the failing SQL output."""
-        cfg = DatabricksAgentConfig(env_name=env)
         sql_clean = sql.strip().rstrip(";")
         wrapped_sql = f"SELECT * FROM ({sql_clean}) AS t LIMIT {int(limit)}"
 
         logger.info("Fetching Databricks failure sample (limit=%s)", limit)
         try:
-            with cls._connect(cfg) as connection:
-                with connection.cursor() as cursor:
-                    if getattr(cfg, "catalog", None):
-                        try:
-                            cursor.execute(f"USE CATALOG {cfg.catalog}")
-                        except Exception:
-                            pass
-                    if getattr(cfg, "schema", None):
-                        try:
-                            cursor.execute(f"USE SCHEMA {cfg.schema}")
-                        except Exception:
-                            pass
-
+            with cls.connection_pool(env).connection() as connection:
+                with connection.cursor() as cursor, track_query(cursor.cancel):
                     cursor.execute(wrapped_sql)
                     rows = cursor.fetchmany(size=limit)
                     cols = [d[0] for d in cursor.description] if cursor.description else []
@@ -105,3 +214,25 @@ class DatabricksRunner(BaseRunner):
             raise Exception(f"Failed to fetch failure sample from Databricks: {e}")
 
         return list(cols), list(rows)
+
+    @classmethod
+    def table_versions(cls, env: str | None, tables: Sequence[TableRef]) -> dict[TableRef, str | None]:
+        """
+        Return the current Delta table version of each table from `DESCRIBE HISTORY`.
+
+        Non-Delta tables, views and unknown names map to None.
+        """
+        versions: dict[TableRef, str | None] = {ref: None for ref in tables}
+        with cls.connection_pool(env).connection() as connection:
+            with connection.cursor() as cursor:
+                for ref in tables:
+                    name = ".".join("`" + part.replace("`", "``") + "`" for part, _ in ref.parts)
+                    try:
+                        cursor.execute(f"DESCRIBE HISTORY {name} LIMIT 1")
+                        row = cursor.fetchone()
+                    except Exception:
+                        logger.debug("No Delta history for %s", name, exc_info=True)
+                        continue
+                    if row is not None:
+                        versions[ref] = str(row[0])
+        return versions
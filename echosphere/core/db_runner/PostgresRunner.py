@@ -1,10 +1,23 @@
+import asyncio
 import time
-from typing import Any
+from collections.abc import Sequence
+from typing import Any, cast
 
 import psycopg2
+from psycopg2.extensions import connection as PgConnection
 
-from echosphere.core.db_runner.BaseClass import BaseRunner
+from echosphere.core.db_runner.BaseClass import DEFAULT_SAMPLE_ROWS, BaseRunner
+from echosphere.core.db_runner.cancellation import track_query
+from echosphere.core.db_runner.connection_pool import get_async_pool
+from echosphere.core.db_runner.postgres_pipeline import (
+    DEFAULT_PIPELINE_BATCH_SIZE,
+    DEFAULT_PIPELINE_CONNECTIONS,
+    PostgresPipeline,
+)
+from echosphere.env_config_parser.EnvironmentRegistry import get_registry
+from echosphere.env_config_parser.PlatformExtractor import PlatformExtractor
 from echosphere.env_config_parser.PostgresEnvConfigParser import PostgresAgentConfig
+from echosphere.utils.sql_tables import TableRef
 
 
 class PostgresRunner(BaseRunner):
@@ -12,17 +25,15 @@ class PostgresRunner(BaseRunner):
     A utility class for executing SQL tests against a PostgreSQL database.
     """
 
-    @classmethod
-    def dispatch_test(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
-        """
-        Execute a SQL test against Postgres and return results.
+    THROTTLING_MARKERS = (
+        *BaseRunner.THROTTLING_MARKERS,
+        "too many clients already",
+        "remaining connection slots are reserved",
+    )
 
-        The test SQL is expected to be a SELECT of violating rows. To get a
-        reliable row count without materializing all rows client-side, we wrap
-        the query in SELECT COUNT(*). The original SQL text is returned for
-        reporting and failure sampling.
-        """
-        cfg = PostgresAgentConfig(env_name=env)
+    @staticmethod
+    def _connection_kwargs(cfg: PostgresAgentConfig) -> dict[str, Any]:
+        """Return the driver keyword arguments shared by the sync and the pipelined connections."""
         conn_kwargs: dict[str, Any] = {
             "host": cfg.host,
             "port": cfg.port,
@@ -33,18 +44,49 @@ class PostgresRunner(BaseRunner):
         }
         if cfg.sslmode:
             conn_kwargs["sslmode"] = cfg.sslmode
+        return conn_kwargs
 
-        with psycopg2.connect(**conn_kwargs) as conn:
+    @classmethod
+    def _create_connection(cls, env: str) -> PgConnection:
+        """
+        Open an autocommit Postgres session for the environment.
+
+        Autocommit keeps pooled sessions from idling inside an open transaction; the optional
+        schema search path is set once per session.
+        """
+        cfg = get_registry().config_for(env, PostgresAgentConfig)
+        conn = psycopg2.connect(**cls._connection_kwargs(cfg))
+        conn.autocommit = True
+        # Optional schema search path
+        if cfg.schema:
             with conn.cursor() as cur:
-                # Optional schema search path
-                if cfg.schema:
-                    cur.execute(f"SET search_path TO {cfg.schema}")
+                cur.execute(f"SET search_path TO {cfg.schema}")
+        return conn
+
+    @classmethod
+    def _is_connection_healthy(cls, conn: PgConnection) -> bool:
+        """Return True if the session is open and still answers a trivial query."""
+        if conn.closed:
+            return False
+        return super()._is_connection_healthy(conn)
 
-                with open(test_file_path, "r") as s:
-                    sql = s.read()
-                sql_clean = sql.strip().rstrip(";")
-                count_sql = f"SELECT COUNT(*) FROM ({sql_clean}) AS t"
+    @classmethod
+    def dispatch_test(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        """
+        Execute a SQL test against Postgres and return results.
 
+        The test SQL is expected to be a SELECT of violating rows. To get a
+        reliable row count without materializing all rows client-side, we wrap
+        the query in SELECT COUNT(*). The original SQL text is returned for
+        reporting and failure sampling.
+        """
+        with open(test_file_path, "r") as s:
+            sql = s.read()
+        sql_clean = sql.strip().rstrip(";")
+        count_sql = f"SELECT COUNT(*) FROM ({sql_clean}) AS t"
+
+        with cls.connection_pool(env).connection() as conn:
+            with conn.cursor() as cur, track_query(conn.cancel):
                 start_time = time.time()
                 cur.execute(count_sql)
                 row_count_obj = cur.fetchone()
@@ -57,36 +99,133 @@ class PostgresRunner(BaseRunner):
         execution_time = round(end_time - start_time, 3)
         return row_count, execution_time, sql
 
+    @classmethod
+    def dispatch_test_with_sample(
+        cls, env: str | None, test_file_path: str, limit: int = DEFAULT_SAMPLE_ROWS
+    ) -> tuple[int, float, str, list[str], list[tuple[Any, ...]]]:
+        """
+        Execute a SQL test against Postgres and return its row count and first `limit` rows.
+
+        A windowed COUNT(*) OVER () returns the total alongside the sampled rows, so a
+        failing test is executed once instead of once for the count and once for the sample.
+        """
+        with open(test_file_path, "r") as s:
+            sql = s.read()
+        sample_sql = cls._windowed_sample_sql(sql, limit)
+
+        with cls.connection_pool(env).connection() as conn:
+            with conn.cursor() as cur, track_query(conn.cancel):
+                start_time = time.time()
+                cur.execute(sample_sql)
+                rows = cur.fetchmany(size=limit)
+                end_time = time.time()
+                cols = [d[0] for d in cur.description] if cur.description else []
+
+        row_count, cols, rows = cls._split_windowed_sample(cols, rows)
+        execution_time = round(end_time - start_time, 3)
+        return row_count, execution_time, sql, cols, rows
+
+    @classmethod
+    async def dispatch_test_with_sample_async(
+        cls, env: str | None, test_file_path: str, limit: int = DEFAULT_SAMPLE_ROWS
+    ) -> tuple[int, float, str, list[str], list[tuple[Any, ...]]]:
+        """Async variant of `dispatch_test_with_sample`, running the single-pass query in an executor thread."""
+        return await asyncio.to_thread(cls.dispatch_test_with_sample, env, test_file_path, limit)
+
+    @classmethod
+    async def dispatch_test_async(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        """
+        Execute a SQL test against Postgres from the async engine.
+
+        With `pipeline = true` in the environment section, the COUNT(*) query is queued on the
+        environment's pipelined psycopg connections instead of taking a pooled psycopg2 session
+        in an executor thread. The returned tuple is the same as for `dispatch_test`.
+        """
+        cfg = get_registry().config_for(env, PostgresAgentConfig)
+        if not cfg.pipeline:
+            return await super().dispatch_test_async(env, test_file_path)
+
+        with open(test_file_path, "r") as s:
+            sql = s.read()
+        sql_clean = sql.strip().rstrip(";")
+        # The server clock reading times the query within its pipelined batch
+        count_sql = f"SELECT COUNT(*), clock_timestamp() FROM ({sql_clean}) AS t"
+
+        row_count, execution_time = await cls._pipeline(env, cfg).count(count_sql)
+        return row_count, execution_time, sql
+
+    @classmethod
+    def _pipeline(cls, env: str | None, cfg: PostgresAgentConfig) -> PostgresPipeline:
+        """Return the pipelined connection set of the environment on the running event loop."""
+
+        async def connect() -> Any:
+            try:
+                import psycopg
+            except ImportError:
+                raise ImportError(
+                    "Pipelined Postgres mode requires psycopg 3. Install with 'pip install EchoSphere[postgres]'"
+                )
+            conn = await psycopg.AsyncConnection.connect(**cls._connection_kwargs(cfg), autocommit=True)
+            if cfg.schema:
+                await conn.execute(f"SET search_path TO {cfg.schema}")
+            return conn
+
+        def build() -> PostgresPipeline:
+            return PostgresPipeline(
+                connect,
+                connections=cfg.pipeline_connections or DEFAULT_PIPELINE_CONNECTIONS,
+                batch_size=cfg.pipeline_batch_size or DEFAULT_PIPELINE_BATCH_SIZE,
+            )
+
+        resolved = PlatformExtractor.resolve_env_name(env)
+        return cast(PostgresPipeline, get_async_pool(("PostgresPipeline", resolved), build))
+
     @classmethod
     def fetch_failure_sample(
-        cls, env: str | None, sql: str, limit: int = 1000
+        cls, env: str | None, sql: str, limit: int = DEFAULT_SAMPLE_ROWS
     ) -> tuple[list[str], list[tuple[Any, ...]]]:
         """
         Fetch up to `limit` rows and column names for a failed test's SQL query.
 
         The SQL is wrapped with a LIMIT to avoid loading too much data.
         """
-        cfg = PostgresAgentConfig(env_name=env)
         sql_clean = sql.strip().rstrip(";")
         wrapped_sql = f"SELECT * FROM ({sql_clean}) AS t LIMIT {int(limit)}"
 
-        conn_kwargs: dict[str, Any] = {
-            "host": cfg.host,
-            "port": cfg.port,
-            "dbname": cfg.database,
-            "user": cfg.user,
-            "password": cfg.password,
-            "options": "-c application_name=EchoSphere",
-        }
-        if cfg.sslmode:
-            conn_kwargs["sslmode"] = cfg.sslmode
-
-        with psycopg2.connect(**conn_kwargs) as conn:
-            with conn.cursor() as cur:
-                # Optional schema search path
-                if cfg.schema:
-                    cur.execute(f"SET search_path TO {cfg.schema}")
+        with cls.connection_pool(env).connection() as conn:
+            with conn.cursor() as cur, track_query(conn.cancel):
                 cur.execute(wrapped_sql)
                 rows = cur.fetchmany(size=limit)
                 cols = [d[0] for d in cur.description] if cur.description else []
         return list(cols), list(rows)
+
+    @classmethod
+    def table_versions(cls, env: str | None, tables: Sequence[TableRef]) -> dict[TableRef, str | None]:
+        """
+        Return the cumulative write statistics of each table from `pg_stat_all_tables`.
+
+        Names are resolved with `to_regclass` against the session's search path. The marker
+        combines inserted, updated and deleted tuple counters with the live/dead tuple counts
+        and the last statistics reset. Views, partitioned parents and unknown names map to None.
+        """
+        if not tables:
+            return {}
+        # Cross-database references are not possible in Postgres; drop a leading database part
+        names = [str(TableRef(ref.parts[-2:])) for ref in tables]
+        values = ", ".join(["(%s, %s)"] * len(names))
+        query = f"""
+            SELECT v.idx, s.n_tup_ins, s.n_tup_upd, s.n_tup_del, s.n_live_tup, s.n_dead_tup, d.stats_reset
+            FROM (VALUES {values}) AS v(idx, name)
+            JOIN pg_class c ON c.oid = to_regclass(v.name) AND c.relkind IN ('r', 'm')
+            JOIN pg_stat_all_tables s ON s.relid = c.oid
+            LEFT JOIN pg_stat_database d ON d.datname = current_database()
+        """
+        params = [p for idx, name in enumerate(names) for p in (idx, name)]
+
+        versions: dict[TableRef, str | None] = {ref: None for ref in tables}
+        with cls.connection_pool(env).connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                for idx, *stats in cur.fetchall():
+                    versions[tables[int(idx)]] = ":".join(str(v) for v in stats)
+        return versions
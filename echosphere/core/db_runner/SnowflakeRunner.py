@@ -1,11 +1,28 @@
+from __future__ import annotations
+
+import asyncio
+import threading
 import time
-from typing import Any
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Any, ClassVar
 
 import snowflake.connector
-from snowflake.connector import ProgrammingError
+from snowflake.connector import ProgrammingError, SnowflakeConnection
 
-from echosphere.core.db_runner.BaseClass import BaseRunner
+from echosphere.core.db_runner.BaseClass import DEFAULT_SAMPLE_ROWS, BaseRunner
+from echosphere.core.db_runner.cancellation import track_query
+from echosphere.core.db_runner.connection_pool import get_pool
+from echosphere.core.db_runner.snowflake_poller import SnowflakeQueryPoller
+from echosphere.env_config_parser.EnvironmentRegistry import get_registry
+from echosphere.env_config_parser.PlatformExtractor import PlatformExtractor
 from echosphere.env_config_parser.SnowflakeEnvConfigParser import SnowflakeAgentConfig
+from echosphere.utils.sql_tables import TableRef
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+MAX_REMEMBERED_RESULTS = 10_000
 
 
 class SnowflakeRunner(BaseRunner):
@@ -13,17 +30,22 @@ class SnowflakeRunner(BaseRunner):
     A utility class for executing SQL tests against a Snowflake database.
     """
 
-    @classmethod
-    def dispatch_test(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
-        """
-        Execute a SQL test against Snowflake and return results.
+    THROTTLING_MARKERS = (
+        *BaseRunner.THROTTLING_MARKERS,
+        "too many concurrent",
+        "concurrency limit",
+    )
+    ARROW_SAMPLES = True
 
-        :param env: Name of the environment/agent to use from es.ini.
-        :param test_file_path: Path to the SQL test file to execute.
-        :return: A tuple of (row_count, execution_time_seconds, sql_text).
-        """
-        sf_agent = SnowflakeAgentConfig(agent_name=env)
-        with snowflake.connector.connect(
+    # (resolved env, sql) -> query ID of its last execution, for RESULT_SCAN reuse
+    _result_ids: ClassVar[OrderedDict[tuple[str, str], str]] = OrderedDict()
+    _result_ids_lock = threading.Lock()
+
+    @classmethod
+    def _create_connection(cls, env: str) -> SnowflakeConnection:
+        """Open a Snowflake session for the environment with the EchoSphere query tag set."""
+        sf_agent = get_registry().config_for(env, SnowflakeAgentConfig)
+        return snowflake.connector.connect(
             user=sf_agent.user,
             password=sf_agent.password,
             account=sf_agent.account,
@@ -35,57 +57,199 @@ class SnowflakeRunner(BaseRunner):
                 "QUERY_TAG": "EchoSphere Testing Suite Run",
             },
             application="EchoSphere",
-        ) as conn:
+        )
+
+    @classmethod
+    def _is_connection_healthy(cls, conn: SnowflakeConnection) -> bool:
+        """Return True if the session is open and still answers a trivial query."""
+        if conn.is_closed():
+            return False
+        return super()._is_connection_healthy(conn)
+
+    @classmethod
+    def _poller(cls, env: str | None) -> SnowflakeQueryPoller:
+        """Return the shared query poller of the environment."""
+        resolved = PlatformExtractor.resolve_env_name(env)
+        return get_pool(("SnowflakeQueryPoller", resolved), lambda: SnowflakeQueryPoller(cls.connection_pool(resolved)))
+
+    @classmethod
+    def _count_result(cls, env: str | None, sql: str, qry_id: str) -> int:
+        """
+        Count the rows of a finished query on the server and remember its query ID.
+
+        The count runs over the persisted result via RESULT_SCAN, so the result set is never
+        transferred to the client. The query ID is kept so a failure sample for the same SQL
+        can be read from the same result instead of executing the test a second time.
+        """
+        count_sql = f"SELECT COUNT(*) FROM TABLE(RESULT_SCAN('{qry_id}'))"
+        with cls.connection_pool(env).connection() as conn:
             cur = conn.cursor()
-            with open(test_file_path, "r") as s:
-                sql = s.read()
+            try:
+                cur.execute(count_sql)
+                row = cur.fetchone()
+            finally:
+                cur.close()
+        if not row:
+            raise Exception("No row count returned from Snowflake.")
 
-            start_time = time.time()
-            cur.execute_async(sql)
+        key = (PlatformExtractor.resolve_env_name(env), sql)
+        with cls._result_ids_lock:
+            cls._result_ids[key] = qry_id
+            cls._result_ids.move_to_end(key)
+            while len(cls._result_ids) > MAX_REMEMBERED_RESULTS:
+                cls._result_ids.popitem(last=False)
+        return int(row[0])
 
+    @classmethod
+    def _abort_query(cls, env: str | None, qry_id: str) -> None:
+        """Ask Snowflake to abort a running query by its ID (used when a run is aborted early)."""
+        with cls.connection_pool(env).connection() as conn:
+            cur = conn.cursor()
             try:
-                qry_id = cur.sfqid
-                if not qry_id:
-                    raise Exception("No query ID returned from Snowflake.")
-                while conn.is_still_running(conn.get_query_status(qry_id)):
-                    time.sleep(2)
-            except ProgrammingError as err:
-                raise Exception("Programming Error: {0}".format(err))
-
-            end_time = time.time()
-            execution_time = round(end_time - start_time, 3)
-            cur.query_result(qry_id)
-            row_count = cur.rowcount
-            if row_count is None:
-                raise Exception("No row count returned from Snowflake.")
+                cur.abort_query(qry_id)
+            finally:
+                cur.close()
+
+    @classmethod
+    def _result_id(cls, env: str | None, sql: str) -> str | None:
+        """Return the query ID of the last execution of `sql` in the environment, if known."""
+        key = (PlatformExtractor.resolve_env_name(env), sql)
+        with cls._result_ids_lock:
+            return cls._result_ids.get(key)
+
+    @classmethod
+    def dispatch_test(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        """
+        Execute a SQL test against Snowflake and return results.
+
+        The query is submitted asynchronously and its completion is tracked by the
+        environment's central poller instead of a sleep loop in this thread.
+
+        :param env: Name of the environment/agent to use from es.ini.
+        :param test_file_path: Path to the SQL test file to execute.
+        :return: A tuple of (row_count, execution_time_seconds, sql_text).
+        """
+        with open(test_file_path, "r") as s:
+            sql = s.read()
 
+        start_time = time.time()
+        qry_id, done = cls._poller(env).submit(sql)
+        try:
+            with track_query(lambda: cls._abort_query(env, qry_id)):
+                end_time = done.result()
+        except ProgrammingError as err:
+            raise Exception("Programming Error: {0}".format(err))
+
+        execution_time = round(end_time - start_time, 3)
+        row_count = cls._count_result(env, sql, qry_id)
+        return row_count, execution_time, sql
+
+    @classmethod
+    async def dispatch_test_async(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        """
+        Async variant of `dispatch_test`.
+
+        Only the short submit and result-metadata calls run in executor threads; while the
+        query runs, the test is a suspended coroutine waiting on the poller's future.
+        """
+        with open(test_file_path, "r") as s:
+            sql = s.read()
+
+        start_time = time.time()
+        qry_id, done = await asyncio.to_thread(cls._poller(env).submit, sql)
+        try:
+            with track_query(lambda: cls._abort_query(env, qry_id)):
+                end_time = await asyncio.wrap_future(done)
+        except ProgrammingError as err:
+            raise Exception("Programming Error: {0}".format(err))
+
+        execution_time = round(end_time - start_time, 3)
+        row_count = await asyncio.to_thread(cls._count_result, env, sql, qry_id)
         return row_count, execution_time, sql
 
     @classmethod
-    def fetch_failure_sample(cls, env: str | None, sql: str, limit: int = 1000) -> tuple[list[str], list[tuple[Any]]]:
+    def _sample_sql(cls, env: str | None, sql: str, limit: int) -> str:
         """
-        Fetch up to `limit` rows and column names for a failed test's SQL query.
+        Return the query reading up to `limit` rows of a failed test's result.
 
-        The SQL is wrapped with a LIMIT to avoid loading too much data.
+        If the test query was executed by this runner, the sample is read from its persisted
+        result through RESULT_SCAN, which does not execute the test a second time. Otherwise
+        the SQL is wrapped with a LIMIT to avoid loading too much data.
         """
-        sf_agent = SnowflakeAgentConfig(agent_name=env)
+        qry_id = cls._result_id(env, sql)
+        if qry_id:
+            return f"SELECT * FROM TABLE(RESULT_SCAN('{qry_id}')) LIMIT {int(limit)}"
         sql_clean = sql.strip().rstrip(";")
-        wrapped_sql = f"SELECT * FROM ({sql_clean}) AS t LIMIT {int(limit)}"
-        with snowflake.connector.connect(
-            user=sf_agent.user,
-            password=sf_agent.password,
-            account=sf_agent.account,
-            warehouse=sf_agent.warehouse,
-            role=sf_agent.role,
-            database=sf_agent.database,
-            schema=sf_agent.schema,
-            session_parameters={
-                "QUERY_TAG": "EchoSphere Failure Sample Fetch",
-            },
-            application="EchoSphere",
-        ) as conn:
+        return f"SELECT * FROM ({sql_clean}) AS t LIMIT {int(limit)}"
+
+    @classmethod
+    def fetch_failure_sample(
+        cls, env: str | None, sql: str, limit: int = DEFAULT_SAMPLE_ROWS
+    ) -> tuple[list[str], list[tuple[Any]]]:
+        """Fetch up to `limit` rows and column names for a failed test's SQL query (see `_sample_sql`)."""
+        wrapped_sql = cls._sample_sql(env, sql, limit)
+        with cls.connection_pool(env).connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(wrapped_sql)
+                rows = cur.fetchmany(size=limit)
+                cols = [d[0] for d in cur.description] if cur.description else []
+            finally:
+                cur.close()
+        return list(cols), list(rows)
+
+    @classmethod
+    def fetch_failure_sample_arrow(cls, env: str | None, sql: str, limit: int = DEFAULT_SAMPLE_ROWS) -> pa.Table | None:
+        """
+        Fetch up to `limit` rows of a failed test's SQL query as an Arrow table (see `_sample_sql`).
+
+        The connector receives Snowflake results as Arrow chunks, so the sample is handed on
+        without converting a single cell to a Python object.
+        """
+        wrapped_sql = cls._sample_sql(env, sql, limit)
+        with cls.connection_pool(env).connection() as conn:
             cur = conn.cursor()
-            cur.execute(wrapped_sql)
-            rows = cur.fetchmany(size=limit)
-            cols = [d[0] for d in cur.description] if cur.description else []
-        return list(cols), list(rows)  # type: ignore
+            try:
+                cur.execute(wrapped_sql)
+                table: pa.Table | None = cur.fetch_arrow_all()
+            finally:
+                cur.close()
+        return table
+
+    @classmethod
+    def table_versions(cls, env: str | None, tables: Sequence[TableRef]) -> dict[TableRef, str | None]:
+        """
+        Return `LAST_ALTERED` of each base table, read from INFORMATION_SCHEMA.TABLES.
+
+        `LAST_ALTERED` moves on DML as well as DDL. Views and external tables map to None,
+        because their underlying data can change without it.
+        """
+        cfg = get_registry().config_for(env, SnowflakeAgentConfig)
+        wanted: dict[str, dict[tuple[str, str], list[TableRef]]] = {}
+        for ref in tables:
+            parts = ref.folded(upper=True)
+            database, schema = cfg.database.upper(), cfg.schema.upper()
+            if len(parts) == 3:
+                database, schema = parts[0], parts[1]
+            elif len(parts) == 2:
+                schema = parts[0]
+            wanted.setdefault(database, {}).setdefault((schema, parts[-1]), []).append(ref)
+
+        versions: dict[TableRef, str | None] = {ref: None for ref in tables}
+        with cls.connection_pool(env).connection() as conn:
+            cur = conn.cursor()
+            try:
+                for database, names in wanted.items():
+                    placeholders = ", ".join(["(%s, %s)"] * len(names))
+                    cur.execute(
+                        f'SELECT TABLE_SCHEMA, TABLE_NAME, LAST_ALTERED FROM "{database.replace(chr(34), chr(34) * 2)}"'
+                        f".INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE' "
+                        f"AND (TABLE_SCHEMA, TABLE_NAME) IN ({placeholders})",
+                        [part for key in names for part in key],
+                    )
+                    for schema, name, last_altered in cur.fetchall():
+                        for ref in names.get((schema, name), []):
+                            versions[ref] = str(last_altered)
+            finally:
+                cur.close()
+        return versions
@@ -0,0 +1,171 @@
+"""
+Server-side cancellation of in-flight test queries.
+
+Runners register a cancel callback for every query while it runs on the database
+(`track_query`). When a run is aborted early, e.g. because `--maxfail` was reached,
+the engine calls `cancel_in_flight_queries`, which invokes every registered callback
+from the calling thread: Snowflake aborts the query by its ID, Postgres sends a
+cancel request for the session's backend and Databricks cancels the cursor.
+
+Once cancelled, the registry stays aborted until `reset_query_tracking` is called at
+the start of the next run, so queries that a worker thread was about to start are
+refused instead of running unobserved.
+
+Queries are also registered with the scope opened by `query_scope`, if any. The engine
+opens one scope per test, so a test that exceeds its timeout can be cancelled alone.
+The scope is held in a context variable, which `asyncio.to_thread` carries into the
+worker thread running a blocking query. It also carries the test's time limit, for
+runners that must enforce it on the server (`current_query_timeout`).
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCancelledError(Exception):
+    """Raised when a query is refused or interrupted because the run was aborted."""
+
+
+class InFlightQueries:
+    """
+    Thread-safe registry of cancel callbacks of the queries currently running.
+    """
+
+    def __init__(self, timeout: float | None = None) -> None:
+        """
+        Initialize an empty registry that accepts queries.
+
+        :param timeout: Time limit in seconds of the queries in the registry, if any.
+        """
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._cancels: dict[int, Callable[[], object]] = {}
+        self._tokens = itertools.count()
+        self._aborted = False
+
+    @property
+    def aborted(self) -> bool:
+        """True after `cancel_all` until the next `reset`."""
+        return self._aborted
+
+    def reset(self) -> None:
+        """Accept queries again, e.g. at the start of a new run."""
+        with self._lock:
+            self._aborted = False
+            self._cancels.clear()
+
+    @contextmanager
+    def track(self, cancel: Callable[[], object]) -> Iterator[None]:
+        """
+        Register `cancel` for the duration of the block.
+
+        If the registry was already aborted, `cancel` is invoked right away (the query may
+        already be submitted) and QueryCancelledError is raised.
+
+        :param cancel: Callable stopping the query on the server; called from another thread.
+        """
+        with self._lock:
+            aborted = self._aborted
+            if not aborted:
+                token = next(self._tokens)
+                self._cancels[token] = cancel
+        if aborted:
+            _call_quietly(cancel)
+            raise QueryCancelledError("Query not run: the test run was aborted.")
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._cancels.pop(token, None)
+
+    def cancel_all(self) -> int:
+        """
+        Abort the registry and cancel every tracked query.
+
+        :return: Number of queries a cancellation was sent for.
+        """
+        with self._lock:
+            self._aborted = True
+            cancels = list(self._cancels.values())
+            self._cancels.clear()
+        for cancel in cancels:
+            _call_quietly(cancel)
+        return len(cancels)
+
+
+def _call_quietly(cancel: Callable[[], object]) -> None:
+    """Invoke a cancel callback; failures are logged, since the query may have finished meanwhile."""
+    try:
+        cancel()
+    except Exception:
+        logger.warning("Failed to cancel a running query", exc_info=True)
+
+
+_IN_FLIGHT = InFlightQueries()
+_SCOPE: ContextVar[InFlightQueries | None] = ContextVar("es_query_scope", default=None)
+
+
+@contextmanager
+def query_scope(timeout: float | None = None) -> Iterator[InFlightQueries]:
+    """
+    Collect the queries started in the current context (e.g. by one test) in their own registry.
+
+    :param timeout: Time limit of the test in seconds, returned by `current_query_timeout`.
+    :return: Context manager yielding the scope; `scope.cancel_all()` cancels only its queries.
+    """
+    scope = InFlightQueries(timeout)
+    token = _SCOPE.set(scope)
+    try:
+        yield scope
+    finally:
+        _SCOPE.reset(token)
+
+
+@contextmanager
+def track_query(cancel: Callable[[], object]) -> Iterator[None]:
+    """
+    Register a cancel callback with the process-wide registry, and the current scope, while a query runs.
+
+    :param cancel: Callable stopping the query on the server.
+    :raises QueryCancelledError: If the run or the scope was already aborted.
+    """
+    scope = _SCOPE.get()
+    with _IN_FLIGHT.track(cancel):
+        if scope is None:
+            yield
+        else:
+            with scope.track(cancel):
+                yield
+
+
+def current_query_timeout() -> float | None:
+    """Return the time limit of the current query scope (e.g. the running test), if any."""
+    scope = _SCOPE.get()
+    return scope.timeout if scope is not None else None
+
+
+def cancel_in_flight_queries() -> int:
+    """
+    Cancel every query registered with `track_query` and refuse new ones until the next reset.
+
+    :return: Number of queries a cancellation was sent for.
+    """
+    return _IN_FLIGHT.cancel_all()
+
+
+def query_tracking_aborted() -> bool:
+    """Return True if in-flight queries were cancelled and new ones are refused."""
+    return _IN_FLIGHT.aborted
+
+
+def reset_query_tracking() -> None:
+    """Accept queries again (called by the engine at the start of a run)."""
+    _IN_FLIGHT.reset()
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Generic, Protocol, TypeVar
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 50
+DEFAULT_HEALTH_CHECK_INTERVAL = 30.0
+
+ConnT = TypeVar("ConnT")
+
+
+@dataclass(slots=True)
+class _IdleConnection(Generic[ConnT]):
+    """An idle pooled connection together with its bookkeeping."""
+
+    conn: ConnT
+    last_used: float
+    verified: bool = True
+
+
+class ConnectionPool(Generic[ConnT]):
+    """
+    Thread-safe pool of database sessions for a single resolved environment.
+
+    Connections are opened lazily (up to ``max_size``) through ``factory``, which is also
+    responsible for the one-off session setup (catalog/schema, search path, query tag).
+    Borrowed connections are handed back to the pool after use so later tests reuse both the
+    login and the session setup. Idle connections are health-checked before reuse when they
+    sat idle longer than ``health_check_interval`` or when their last use raised an error.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], ConnT],
+        health_check: Callable[[ConnT], bool],
+        closer: Callable[[ConnT], None],
+        max_size: int = DEFAULT_POOL_SIZE,
+        health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+    ) -> None:
+        """
+        Initialize an empty pool.
+
+        :param factory: Callable opening a new, fully set-up connection.
+        :param health_check: Callable returning True if a connection is still usable.
+        :param closer: Callable closing a connection; errors are logged and ignored.
+        :param max_size: Maximum number of open connections (idle and borrowed).
+        :param health_check_interval: Idle seconds after which a connection is checked before reuse.
+        """
+        if max_size < 1:
+            raise ValueError("Connection pool size must be at least 1.")
+        self._factory = factory
+        self._health_check = health_check
+        self._closer = closer
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+
+        self._idle: list[_IdleConnection[ConnT]] = []
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def open_connections(self) -> int:
+        """Number of connections currently open (idle and borrowed)."""
+        with self._cond:
+            return self._open
+
+    @contextmanager
+    def connection(self) -> Iterator[ConnT]:
+        """
+        Borrow a connection for the duration of the ``with`` block.
+
+        If the block raises, the connection is still returned but marked for a health check
+        before its next use, so a broken session is never handed out twice.
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+        except BaseException:
+            self._release(conn, verified=False)
+            raise
+        self._release(conn, verified=True)
+
+    def _acquire(self) -> ConnT:
+        """Return an idle connection, open a new one or wait for one to be released."""
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed.")
+                if self._idle:
+                    idle = self._idle.pop()
+                elif self._open < self.max_size:
+                    self._open += 1
+                    idle = None
+                else:
+                    self._cond.wait()
+                    continue
+
+            if idle is None:
+                try:
+                    return self._factory()
+                except BaseException:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+
+            stale = time.monotonic() - idle.last_used > self.health_check_interval
+            if (idle.verified and not stale) or self._is_healthy(idle.conn):
+                return idle.conn
+
+            logger.info("Discarding unhealthy pooled connection")
+            self._discard(idle.conn)
+
+    def _release(self, conn: ConnT, verified: bool) -> None:
+        """Return a borrowed connection to the idle list (or close it if the pool is closed)."""
+        with self._cond:
+            if not self._closed:
+                self._idle.append(_IdleConnection(conn=conn, last_used=time.monotonic(), verified=verified))
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    def _discard(self, conn: ConnT) -> None:
+        """Close a connection and free its slot."""
+        self._safe_close(conn)
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def _is_healthy(self, conn: ConnT) -> bool:
+        """Run the health check, treating any exception as unhealthy."""
+        try:
+            return bool(self._health_check(conn))
+        except Exception:
+            return False
+
+    def _safe_close(self, conn: ConnT) -> None:
+        """Close a connection, logging instead of raising on failure."""
+        try:
+            self._closer(conn)
+        except Exception:
+            logger.debug("Ignoring error while closing pooled connection", exc_info=True)
+
+    def close(self) -> None:
+        """Close all idle connections; borrowed connections are closed when released."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for entry in idle:
+            self._discard(entry.conn)
+
+
+class Closable(Protocol):
+    """Process-wide resource (a pool or a poller built on one) that is closed at the end of a run."""
+
+    def close(self) -> None:
+        """Release the resource."""
+
+
+PoolT = TypeVar("PoolT", bound=Closable)
+
+_POOLS: dict[tuple[str, str], Any] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(key: tuple[str, str], builder: Callable[[], PoolT]) -> PoolT:
+    """
+    Return the process-wide pool registered under ``key``, creating it with ``builder`` once.
+
+    Besides connection pools, the registry also holds resources built on top of them (such as
+    query pollers), so they are closed together.
+
+    :param key: Tuple of (runner or resource name, resolved environment name).
+    :param builder: Callable returning a new pool when none exists yet.
+    :return: The shared pool for this key.
+    """
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = builder()
+            _POOLS[key] = pool
+        return pool
+
+
+def close_all_pools() -> None:
+    """Close and forget every registered pool (called at the end of a run), newest first."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in reversed(pools):
+        pool.close()
+
+
+class AsyncClosable(Protocol):
+    """Async resource (e.g. a pipelined connection set) that is bound to the running event loop."""
+
+    async def close(self) -> None:
+        """Release the resource."""
+
+
+_ASYNC_POOLS: dict[tuple[str, str], AsyncClosable] = {}
+
+
+def get_async_pool(key: tuple[str, str], builder: Callable[[], AsyncClosable]) -> AsyncClosable:
+    """
+    Return the async pool registered under ``key`` for the current event loop, creating it once.
+
+    Async pools are only used from the event loop thread, so no lock is needed.
+
+    :param key: Tuple of (pool kind, resolved environment name).
+    :param builder: Callable returning a new pool when none exists yet.
+    :return: The shared async pool for this key.
+    """
+    pool = _ASYNC_POOLS.get(key)
+    if pool is None:
+        pool = builder()
+        _ASYNC_POOLS[key] = pool
+    return pool
+
+
+async def aclose_all_pools() -> None:
+    """Close and forget every async pool (called by the engine before its event loop ends)."""
+    pools = list(_ASYNC_POOLS.values())
+    _ASYNC_POOLS.clear()
+    for pool in pools:
+        await pool.close()
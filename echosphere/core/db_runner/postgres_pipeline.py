@@ -0,0 +1,262 @@
+"""
+Pipelined COUNT(*) execution for Postgres on a small, fixed set of async connections.
+
+Instead of one backend process per in-flight test, a handful of psycopg
+`AsyncConnection`s in pipeline mode each take a batch of queued counting
+queries, send them back-to-back without waiting for round trips, and hand
+every result to the future of the test that queued it.
+
+A connection that cannot be opened, or breaks, fails only the jobs it held; its worker
+reconnects, or stops if reconnecting fails. Queries fail as a whole only once no
+worker is left.
+
+Statements of one pipeline run back to back on the server, so a query that also
+returns `clock_timestamp()` tells when it finished there. The batch round trip is
+split across its jobs by these readings, which keeps per-test durations (and the run
+history built from them) close to what the test took on its own.
+
+Pipelined statements cannot be cancelled one by one, so each job's time limit (the
+`query_scope` timeout of the test that queued it) is sent as `statement_timeout`
+right before its statement.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import itertools
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from echosphere.core.db_runner.cancellation import (
+    QueryCancelledError,
+    current_query_timeout,
+    query_tracking_aborted,
+    track_query,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PIPELINE_CONNECTIONS = 4
+DEFAULT_PIPELINE_BATCH_SIZE = 64
+
+
+@dataclass(slots=True)
+class _PipelineJob:
+    """A queued counting query, its time limit and the future awaiting its (row_count, seconds) result."""
+
+    sql: str
+    future: asyncio.Future[tuple[int, float]]
+    timeout: float | None = None
+
+
+class PostgresPipeline:
+    """
+    Multiplexes counting queries over a fixed number of pipelined async connections.
+
+    Each connection runs a worker that drains up to `batch_size` queued jobs, sends them in
+    one pipeline and resolves each job's future with its own result, in submission order.
+    If any statement of a batch errors, the batch is replayed statement by statement so the
+    error is attributed to the failing test only.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[Any]],
+        connections: int = DEFAULT_PIPELINE_CONNECTIONS,
+        batch_size: int = DEFAULT_PIPELINE_BATCH_SIZE,
+    ) -> None:
+        """
+        Initialize the pipeline; connections are opened lazily on first use.
+
+        :param connect: Coroutine factory returning a ready (autocommit, set-up) async connection.
+        :param connections: Number of connections (and worker tasks) to use.
+        :param batch_size: Maximum number of queries sent in one pipeline.
+        """
+        if connections < 1 or batch_size < 1:
+            raise ValueError("Pipeline connections and batch size must be at least 1.")
+        self._connect = connect
+        self.connections = connections
+        self.batch_size = batch_size
+        self._queue: asyncio.Queue[_PipelineJob] = asyncio.Queue()
+        self._workers: list[asyncio.Task[None]] = []
+        self._conns: list[Any] = []
+        self._live = 0
+        self._connect_error: BaseException | None = None
+
+    async def count(self, sql: str) -> tuple[int, float]:
+        """
+        Queue a counting query and wait for its result.
+
+        :param sql: A query returning a single row with the count in its first column, optionally
+            followed by `clock_timestamp()` to time it within its batch.
+        :return: Tuple of (row_count, execution_time_seconds) where the time is the query's share of its batch.
+        :raises Exception: The connection error, once no connection could be kept open.
+        """
+        if self._connect_error is not None:
+            raise self._connect_error
+        if not self._workers:
+            # Workers serve every test, so they must not inherit the query scope of the test that started them
+            self._live = self.connections
+            self._workers = [
+                contextvars.Context().run(asyncio.ensure_future, self._worker()) for _ in range(self.connections)
+            ]
+        future: asyncio.Future[tuple[int, float]] = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PipelineJob(sql=sql, future=future, timeout=current_query_timeout()))
+        return await future
+
+    async def _worker(self) -> None:
+        """Keep one connection open and send queued batches through it; reconnect when it breaks."""
+        while True:
+            try:
+                conn = await self._connect()
+            except Exception as e:
+                logger.exception("Failed to open pipelined Postgres connection")
+                self._drop_worker(e)
+                return
+            self._conns.append(conn)
+            await self._serve(conn)
+            logger.warning("Pipelined Postgres connection broke; reconnecting")
+            self._conns.remove(conn)
+            await self._close_quietly(conn)
+
+    def _drop_worker(self, exc: BaseException) -> None:
+        """Stop one worker; once none is left, fail the queued jobs and every later query with `exc`."""
+        self._live -= 1
+        if self._live <= 0:
+            self._connect_error = exc
+            self._fail_pending(exc)
+
+    async def _serve(self, conn: Any) -> None:
+        """Send queued batches through a connection until it breaks."""
+        while not conn.closed:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            batch = [job for job in batch if not job.future.done()]
+            if not batch:
+                continue
+            try:
+                with track_query(conn.cancel):
+                    await self._run_batch(conn, batch)
+            except QueryCancelledError as e:
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+
+    async def _run_batch(self, conn: Any, batch: list[_PipelineJob]) -> None:
+        """Send a batch in one pipeline and match each result back to its job."""
+        start_time = time.time()
+        try:
+            cursors = []
+            async with conn.pipeline():
+                limit: int | None = None
+                for job in batch:
+                    limit = await _set_statement_timeout(conn, job, limit)
+                    cur = conn.cursor()
+                    await cur.execute(job.sql)
+                    cursors.append(cur)
+            rows = [await cur.fetchone() for cur in cursors]
+        except Exception as e:
+            if query_tracking_aborted():
+                # The batch was cancelled on the server; replaying it would defeat the cancellation
+                raise QueryCancelledError("Pipelined batch cancelled: the test run was aborted.") from e
+            logger.info("Pipelined batch of %s queries failed; replaying them one by one", len(batch))
+            await self._run_sequentially(conn, batch)
+            return
+
+        durations = _split_batch_time(time.time() - start_time, rows)
+        for job, row, execution_time in zip(batch, rows, durations):
+            self._resolve(job, row, execution_time)
+
+    async def _run_sequentially(self, conn: Any, batch: list[_PipelineJob]) -> None:
+        """Run each job on its own so an error only affects the test that caused it."""
+        limit: int | None = None
+        for job in batch:
+            # Tests that timed out meanwhile are not replayed
+            if job.future.done():
+                continue
+            start_time = time.time()
+            try:
+                limit = await _set_statement_timeout(conn, job, limit)
+                cur = conn.cursor()
+                await cur.execute(job.sql)
+                row = await cur.fetchone()
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+                continue
+            self._resolve(job, row, round(time.time() - start_time, 3))
+
+    @staticmethod
+    def _resolve(job: _PipelineJob, row: Any, execution_time: float) -> None:
+        """Resolve a job's future from its COUNT(*) row."""
+        if job.future.done():
+            return
+        if not row:
+            job.future.set_exception(Exception("Failed to retrieve row count from Postgres."))
+            return
+        job.future.set_result((int(row[0]), execution_time))
+
+    def _fail_pending(self, exc: BaseException) -> None:
+        """Fail every queued job, e.g. when no connection could be opened."""
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            if not job.future.done():
+                job.future.set_exception(exc)
+
+    @staticmethod
+    async def _close_quietly(conn: Any) -> None:
+        """Close a connection, ignoring errors (e.g. of a broken one)."""
+        try:
+            await conn.close()
+        except Exception:
+            logger.debug("Ignoring error while closing pipelined connection", exc_info=True)
+
+    async def close(self) -> None:
+        """Stop the workers and close all connections."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for conn in self._conns:
+            await self._close_quietly(conn)
+        self._conns = []
+        self._fail_pending(Exception("Postgres pipeline was closed."))
+
+
+async def _set_statement_timeout(conn: Any, job: _PipelineJob, current: int | None) -> int:
+    """
+    Send the job's time limit as `statement_timeout` unless the session already has it.
+
+    :param conn: Connection the job runs on.
+    :param job: The job about to be sent.
+    :param current: Limit in milliseconds sent last on the connection in this batch, if any.
+    :return: The job's limit in milliseconds (0: none).
+    """
+    limit = int(job.timeout * 1000) if job.timeout else 0
+    if limit != current:
+        await conn.execute(f"SET statement_timeout = {limit}")
+    return limit
+
+
+def _split_batch_time(elapsed: float, rows: list[Any]) -> list[float]:
+    """
+    Split the round trip of a batch across its jobs.
+
+    A job took the time between the server's `clock_timestamp()` readings of the previous
+    job and its own; the first job also carries the network round trip. Without readings
+    in every row, the time is split evenly.
+
+    :param elapsed: Seconds from sending the batch to receiving its last result.
+    :param rows: Result rows of the jobs, in submission order.
+    :return: Seconds per job.
+    """
+    ends: list[Any] = [row[1] if row and len(row) > 1 else None for row in rows]
+    if not rows or any(end is None for end in ends):
+        return [round(elapsed / max(len(rows), 1), 3)] * len(rows)
+    gaps = [max((end - prev).total_seconds(), 0.0) for prev, end in itertools.pairwise(ends)]
+    return [round(max(elapsed - sum(gaps), 0.0), 3)] + [round(gap, 3) for gap in gaps]
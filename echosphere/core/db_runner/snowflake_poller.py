@@ -0,0 +1,173 @@
+"""
+Central status poller for asynchronous Snowflake queries.
+
+Tests submit their SQL with `execute_async` on a pooled session, which is
+returned to the pool right away, and receive a future. A single background
+thread tracks every outstanding query ID and polls its status with adaptive
+backoff: first after a few tens of milliseconds, then less and less often
+while the query keeps running. No thread or session is held while a query
+waits on the warehouse, and short tests finish close to their real duration.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any
+
+from echosphere.core.db_runner.connection_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_POLL_INTERVAL = 0.025
+DEFAULT_MAX_POLL_INTERVAL = 2.0
+DEFAULT_POLL_BACKOFF = 1.5
+
+
+@dataclass(slots=True)
+class _TrackedQuery:
+    """An outstanding query and its polling schedule."""
+
+    query_id: str
+    future: Future[float]
+    next_poll: float
+    interval: float
+
+
+class SnowflakeQueryPoller:
+    """
+    Submits asynchronous queries on pooled sessions and polls all of them from one thread.
+
+    The future returned by `submit` resolves to the wall-clock time (`time.time()`) at which
+    the poller observed the query as finished, or raises the query's error.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool[Any],
+        min_interval: float = DEFAULT_MIN_POLL_INTERVAL,
+        max_interval: float = DEFAULT_MAX_POLL_INTERVAL,
+        backoff: float = DEFAULT_POLL_BACKOFF,
+    ) -> None:
+        """
+        Initialize the poller; its thread starts with the first submitted query.
+
+        :param pool: Connection pool of the environment; sessions are borrowed only briefly.
+        :param min_interval: Delay before the first status check of a query, in seconds.
+        :param max_interval: Upper bound of the delay between two checks of a query, in seconds.
+        :param backoff: Factor applied to a query's poll interval after each check that finds it running.
+        """
+        self._pool = pool
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+
+        self._queries: dict[str, _TrackedQuery] = {}
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self.status_requests = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Number of queries currently tracked."""
+        with self._cond:
+            return len(self._queries)
+
+    def submit(self, sql: str) -> tuple[str, Future[float]]:
+        """
+        Start `sql` asynchronously and track it until it finishes.
+
+        :param sql: SQL text to execute.
+        :return: Tuple of (query_id, future resolving to the completion time).
+        """
+        with self._pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute_async(sql)
+                qry_id = cur.sfqid
+            finally:
+                cur.close()
+        if not qry_id:
+            raise Exception("No query ID returned from Snowflake.")
+
+        future: Future[float] = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Snowflake query poller is closed.")
+            self._queries[qry_id] = _TrackedQuery(
+                query_id=qry_id,
+                future=future,
+                next_poll=time.monotonic() + self.min_interval,
+                interval=self.min_interval,
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="es-snowflake-poller", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return qry_id, future
+
+    def _run(self) -> None:
+        """Poll loop: wait until the earliest query is due, then check all due queries."""
+        while True:
+            with self._cond:
+                while not self._closed and not self._queries:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                now = time.monotonic()
+                due = [q for q in self._queries.values() if q.next_poll <= now]
+                if not due:
+                    self._cond.wait(timeout=min(q.next_poll for q in self._queries.values()) - now)
+                    continue
+            self._poll(due)
+
+    def _poll(self, due: list[_TrackedQuery]) -> None:
+        """Check the status of all due queries on one borrowed session."""
+        finished: list[tuple[_TrackedQuery, BaseException | None]] = []
+        try:
+            with self._pool.connection() as conn:
+                for query in due:
+                    self.status_requests += 1
+                    try:
+                        status = conn.get_query_status_throw_if_error(query.query_id)
+                    except Exception as e:
+                        finished.append((query, e))
+                        continue
+                    if not conn.is_still_running(status):
+                        finished.append((query, None))
+        except Exception as e:
+            logger.exception("Failed to poll Snowflake query status")
+            finished = [(query, e) for query in due]
+
+        end_time = time.time()
+        done_ids = {query.query_id for query, _ in finished}
+        with self._cond:
+            now = time.monotonic()
+            for query in due:
+                if query.query_id in done_ids:
+                    self._queries.pop(query.query_id, None)
+                else:
+                    query.interval = min(query.interval * self.backoff, self.max_interval)
+                    query.next_poll = now + query.interval
+
+        for query, error in finished:
+            if query.future.done():
+                continue
+            if error is not None:
+                query.future.set_exception(error)
+            else:
+                query.future.set_result(end_time)
+
+    def close(self) -> None:
+        """Stop polling; queries still tracked fail with an error."""
+        with self._cond:
+            self._closed = True
+            pending, self._queries = list(self._queries.values()), {}
+            self._cond.notify_all()
+        for query in pending:
+            if not query.future.done():
+                query.future.set_exception(RuntimeError("Snowflake query poller was closed."))
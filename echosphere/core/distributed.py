@@ -0,0 +1,327 @@
+"""
+Distributed execution: one coordinator hands out tests to many workers.
+
+`es coordinator` discovers the suite, orders it longest-first and listens on a TCP
+socket. Each `es worker` connects, asks for as many tests as it has free slots, and
+feeds them to one `AsyncTestEngine` that runs for the whole session. Every
+`TestResult` is streamed back as soon as it completes, and each freed slot is
+requested again right away, so a long test occupies one slot while the others keep
+pulling work. Tests stay in the coordinator's queue until a worker has a free slot
+for them: a worker that is busy with slow tests leases fewer, and the rest go to the
+workers that ask. As the queue drains, batches shrink so the last tests spread over
+all workers. Tests handed to a worker that disconnects before reporting them are put
+back in the queue.
+
+Messages are JSON objects, one per line:
+
+- worker -> coordinator: `hello`, `request` (with `slots`), `result` (with `result`)
+- coordinator -> worker: `welcome` (with `env` and `capture_failure_data`),
+  `work` (with `tests`), `done`
+
+A worker has at most one `request` open and keeps sending results while it waits
+for the answer.
+
+Test files are sent as paths relative to the coordinator's working directory, so
+workers must run from a checkout of the same project (same `es_suite` and `es.ini`
+environment names).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import socket
+from collections import deque
+from collections.abc import Callable, Mapping
+from typing import Any
+
+from echosphere.core.test_result import TestResult
+from echosphere.utils.sql_test_fetcher import TestFileInfo
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Largest message (a result with its failure sample) accepted on the socket
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+# While many tests remain, a batch covers at most this share of the queue per connected worker
+_BATCH_SHARE = 2
+
+
+async def _send(writer: asyncio.StreamWriter, message: dict[str, Any]) -> None:
+    """Write one JSON message and wait until it is flushed."""
+    writer.write(json.dumps(message, default=str).encode() + b"\n")
+    await writer.drain()
+
+
+async def _receive(reader: asyncio.StreamReader) -> dict[str, Any] | None:
+    """Read one JSON message; None when the peer closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    message: dict[str, Any] = json.loads(line)
+    return message
+
+
+class Coordinator:
+    """
+    Serves the tests of one run to connected workers and gathers their results.
+    """
+
+    def __init__(
+        self,
+        test_files: Mapping[str, TestFileInfo],
+        env: str,
+        *,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        capture_failure_data: bool = False,
+        on_result: Callable[[TestResult], None] | None = None,
+    ) -> None:
+        """
+        Initialize the coordinator.
+
+        :param test_files: Tests to run, in dispatch order (e.g. longest expected first).
+        :param env: Resolved environment name the workers run against.
+        :param host: Interface to listen on.
+        :param port: TCP port to listen on; 0 picks a free port (see `port` once serving).
+        :param capture_failure_data: If True, workers fetch a failure sample for failing tests.
+        :param on_result: Called with every result as soon as it arrives.
+        """
+        self.test_files = dict(test_files)
+        self.env = env
+        self.host = host
+        self.port = port
+        self.capture_failure_data = capture_failure_data
+        self.on_result = on_result
+        self.workers_seen = 0
+        self._queue: deque[str] = deque(self.test_files)
+        self._results: dict[str, TestResult] = {}
+        self._connected = 0
+        self._worker_ids = itertools.count(1)
+        self._changed: asyncio.Condition | None = None
+        self._finished: asyncio.Event | None = None
+
+    @property
+    def pending(self) -> int:
+        """Number of tests without a result."""
+        return len(self.test_files) - len(self._results)
+
+    async def serve(self, ready: Callable[[int], None] | None = None) -> list[TestResult]:
+        """
+        Listen for workers until every test has a result.
+
+        :param ready: Called with the bound port once the coordinator accepts connections.
+        :return: Results of all tests, in dispatch order.
+        """
+        self._changed = asyncio.Condition()
+        self._finished = asyncio.Event()
+        if not self.test_files:
+            return []
+        server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_MESSAGE_BYTES)
+        self.port = server.sockets[0].getsockname()[1]
+        async with server:
+            if ready is not None:
+                ready(self.port)
+            await self._finished.wait()
+        return [self._results[name] for name in self.test_files]
+
+    def _batch_size(self, slots: int) -> int:
+        """Return how many tests to hand to a worker with `slots` free slots."""
+        share = math.ceil(len(self._queue) / (_BATCH_SHARE * max(1, self._connected)))
+        return max(1, min(slots, share))
+
+    async def _next_batch(self, slots: int) -> list[str]:
+        """Wait until tests are queued (or the run is finished) and take a batch."""
+        assert self._changed is not None and self._finished is not None
+        finished = self._finished
+        async with self._changed:
+            await self._changed.wait_for(lambda: bool(self._queue) or finished.is_set())
+            if finished.is_set():
+                return []
+            return [self._queue.popleft() for _ in range(min(len(self._queue), self._batch_size(slots)))]
+
+    async def _record(self, result: TestResult) -> None:
+        """Store a result (the first one wins if a requeued test reports twice)."""
+        assert self._changed is not None and self._finished is not None
+        if result.name not in self.test_files or result.name in self._results:
+            return
+        self._results[result.name] = result
+        if self.on_result is not None:
+            self.on_result(result)
+        if not self.pending:
+            self._finished.set()
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def _lease(self, writer: asyncio.StreamWriter, slots: int, leased: set[str]) -> None:
+        """Answer a worker's request with a batch of tests, or `done` once the run is finished."""
+        batch = await self._next_batch(slots)
+        if not batch:
+            await _send(writer, {"type": "done"})
+            return
+        leased.update(batch)
+        tests = [
+            {
+                "name": name,
+                "path": self.test_files[name]["full_path"],
+                "subfolder": self.test_files[name]["subfolder"],
+            }
+            for name in batch
+        ]
+        await _send(writer, {"type": "work", "tests": tests})
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one worker connection."""
+        assert self._changed is not None
+        worker_id = next(self._worker_ids)
+        leased: set[str] = set()
+        # A request may wait for queued tests; results keep arriving meanwhile
+        lease: asyncio.Task[None] | None = None
+        self._connected += 1
+        self.workers_seen += 1
+        try:
+            hello = await _receive(reader)
+            if hello is None or hello.get("type") != "hello":
+                return
+            logger.info("Worker %s connected (%s)", worker_id, hello.get("name"))
+            await _send(writer, {"type": "welcome", "env": self.env, "capture_failure_data": self.capture_failure_data})
+            while (message := await _receive(reader)) is not None:
+                if message["type"] == "result":
+                    result = TestResult.from_dict(message["result"])
+                    leased.discard(result.name)
+                    await self._record(result)
+                elif message["type"] == "request" and (lease is None or lease.done()):
+                    lease = asyncio.create_task(self._lease(writer, int(message.get("slots", 1)), leased))
+        except (ConnectionError, json.JSONDecodeError):
+            logger.warning("Lost worker %s", worker_id, exc_info=True)
+        finally:
+            if lease is not None:
+                lease.cancel()
+                await asyncio.gather(lease, return_exceptions=True)
+            self._connected -= 1
+            lost = [name for name in leased if name not in self._results]
+            if lost:
+                logger.warning("Requeueing %s test(s) of worker %s", len(lost), worker_id)
+                async with self._changed:
+                    self._queue.extendleft(reversed(lost))
+                    self._changed.notify_all()
+            writer.close()
+
+
+class Worker:
+    """
+    Connects to a coordinator and runs the tests it hands out until the run is finished.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        *,
+        max_in_flight: int | None = None,
+        adaptive: bool = True,
+        name: str | None = None,
+    ) -> None:
+        """
+        Initialize the worker.
+
+        :param host: Coordinator host.
+        :param port: Coordinator port.
+        :param max_in_flight: Concurrency ceiling; defaults to the ceiling configured for the coordinator's environment.
+        :param adaptive: If False, always keep the ceiling in flight.
+        :param name: Name reported to the coordinator (default: host name and process id).
+        """
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        self.adaptive = adaptive
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.executed = 0
+
+    async def run(self) -> int:
+        """
+        Pull and run tests until the coordinator reports that the run is finished.
+
+        One engine runs the tests of the whole session, fed from a local queue. A new
+        request is sent whenever a slot is free and no request is open, so finished
+        tests are replaced while the others still run.
+
+        :return: Number of tests run for the coordinator.
+        """
+        from echosphere.core.concurrency import resolve_concurrency_ceiling
+        from echosphere.core.engine import AsyncTestEngine
+        from echosphere.core.run_async_tests import build_error_result
+        from echosphere.env_config_parser.EnvironmentRegistry import get_registry
+
+        reader, writer = await asyncio.open_connection(self.host, self.port, limit=MAX_MESSAGE_BYTES)
+        engine_task: asyncio.Task[list[TestResult]] | None = None
+        try:
+            await _send(writer, {"type": "hello", "name": self.name})
+            welcome = await _receive(reader)
+            if welcome is None or welcome.get("type") != "welcome":
+                raise ConnectionError("Coordinator closed the connection during the handshake.")
+            env: str = welcome["env"]
+            capture = bool(welcome["capture_failure_data"])
+            slots = self.max_in_flight or resolve_concurrency_ceiling(env)
+            timeout = get_registry().get_optional_int("timeout", env)
+
+            # Leased tests without a result; a slot is free whenever fewer than `slots` are outstanding
+            outstanding: dict[str, TestFileInfo] = {}
+            slot_freed = asyncio.Event()
+            feed: asyncio.Queue[tuple[str, TestFileInfo] | None] = asyncio.Queue()
+
+            def send(result: TestResult) -> None:
+                if outstanding.pop(result.name, None) is None:
+                    return
+                self.executed += 1
+                writer.write(json.dumps({"type": "result", "result": result.to_dict()}, default=str).encode() + b"\n")
+                slot_freed.set()
+
+            def start_engine() -> None:
+                nonlocal engine_task, feed
+                feed = asyncio.Queue()
+                engine = AsyncTestEngine(max_in_flight=slots, adaptive=self.adaptive, timeout=timeout, on_result=send)
+                engine_task = asyncio.create_task(engine.run_feed_async(feed, env, capture))
+                engine_task.add_done_callback(engine_stopped)
+
+            def engine_stopped(task: asyncio.Task[list[TestResult]]) -> None:
+                if task.cancelled() or task.exception() is None:
+                    return
+                # Report the tests the engine still held instead of leaving the coordinator waiting for them
+                e = task.exception()
+                logger.error("Engine failed on worker %s", self.name, exc_info=e)
+                for name, info in list(outstanding.items()):
+                    send(build_error_result(name, "", f"Worker error: {e}", subsuite=info["subfolder"]))
+                start_engine()
+
+            start_engine()
+            while True:
+                while len(outstanding) >= slots:
+                    slot_freed.clear()
+                    await slot_freed.wait()
+                await _send(writer, {"type": "request", "slots": slots - len(outstanding)})
+                message = await _receive(reader)
+                if message is None:
+                    # The coordinator is gone; its tests are stopped below
+                    break
+                if message["type"] == "done":
+                    feed.put_nowait(None)
+                    assert engine_task is not None
+                    await asyncio.gather(engine_task, return_exceptions=True)
+                    await writer.drain()
+                    break
+                for t in message["tests"]:
+                    info: TestFileInfo = {"full_path": t["path"], "subfolder": t["subfolder"]}
+                    outstanding[t["name"]] = info
+                    feed.put_nowait((t["name"], info))
+        finally:
+            if engine_task is not None and not engine_task.done():
+                engine_task.cancel()
+                await asyncio.gather(engine_task, return_exceptions=True)
+            writer.close()
+        return self.executed
@@ -0,0 +1,414 @@
+"""
+Asyncio execution engine for `es run`.
+
+Every discovered test becomes a coroutine, so the number of in-flight tests
+costs coroutines instead of OS threads. Runners with a native async driver
+are awaited directly; blocking runners fall back to the event loop's default
+executor, which the engine bounds to a fixed number of threads.
+
+Tests are admitted through an adaptive concurrency limiter
+(`echosphere.core.concurrency`) that grows and shrinks the number of in-flight
+tests between 1 and `max_in_flight` based on throttling errors and on how much
+slower than their expected duration tests run. Tests rejected with a throttling
+error are retried with backoff.
+
+With a `ResultCache`, tests whose SQL ran recently in the same environment are
+answered from the cache without taking a slot; executed results refresh it.
+
+With `max_failures`, the run stops once that many tests failed: tests that did
+not start are dropped, queries still running are cancelled on the server, and
+every test without a result is reported as skipped.
+
+Each test runs under its own time limit (`timeout`, or the test's `es:timeout`
+directive) and the whole run under `run_timeout`. A test that exceeds its limit
+has its queries cancelled on the server and is reported as an error.
+
+With a `FailureSpool`, failure samples are moved into the spool as soon as their
+test has a result, so failing results keep only a reference to their rows.
+
+`run_environments` runs the suite against several environments on the same event
+loop. Each environment gets its own runner and concurrency limiter, so a slow or
+throttled environment does not hold back the others; `max_failures` and
+`run_timeout` apply to the run as a whole.
+
+`run_feed_async` runs tests as they are put into a queue, e.g. by a distributed
+worker that receives them from a coordinator while earlier tests still run.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from echosphere.core import run_async_tests
+from echosphere.core.concurrency import AdaptiveConcurrencyLimiter
+from echosphere.core.db_runner.BaseClass import DEFAULT_SAMPLE_ROWS
+from echosphere.core.db_runner.cancellation import cancel_in_flight_queries, query_scope, reset_query_tracking
+from echosphere.core.db_runner.connection_pool import aclose_all_pools
+from echosphere.core.failure_spool import FailureSpool
+from echosphere.core.result_cache import ResultCache
+from echosphere.core.test_result import TestResult
+from echosphere.env_config_parser.EnvironmentRegistry import get_registry
+from echosphere.utils.sql_directives import read_timeout
+from echosphere.utils.sql_test_fetcher import TestFileInfo
+
+DEFAULT_MAX_IN_FLIGHT = 256
+MAX_THROTTLE_RETRIES = 3
+THROTTLE_BACKOFF_SECONDS = 0.5
+# Threads reserved for sending cancellations of timed-out or aborted queries
+CANCEL_WORKERS = 4
+
+
+@dataclass(frozen=True, slots=True)
+class EnvironmentRun:
+    """Tests to run against one environment, with the limits of that environment."""
+
+    env: str | None
+    test_files: Mapping[str, TestFileInfo]
+    # Concurrency ceiling and default per-test time limit; None uses the engine's
+    max_in_flight: int | None = None
+    timeout: float | None = None
+    # Rows and serialized bytes kept of each failure sample; None uses the defaults (no byte limit)
+    sample_rows: int | None = None
+    sample_max_bytes: int | None = None
+    # Expected duration of each test in seconds, e.g. from the run history; the concurrency limiter
+    # compares actual durations with these to detect queueing
+    expected_durations: Mapping[str, float] | None = None
+
+
+class AsyncTestEngine:
+    """
+    Orchestrates a full test run on a single asyncio event loop.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        blocking_workers: int | None = None,
+        *,
+        adaptive: bool = True,
+        cache: ResultCache | None = None,
+        read_cache: bool = True,
+        max_failures: int | None = None,
+        timeout: float | None = None,
+        run_timeout: float | None = None,
+        on_result: Callable[[TestResult], None] | None = None,
+        on_start: Callable[[str, str | None], None] | None = None,
+        spool: FailureSpool | None = None,
+    ) -> None:
+        """
+        Initialize the engine limits.
+
+        :param max_in_flight: Ceiling for the number of tests dispatched at the same time.
+        :param blocking_workers: Size of the executor used by runners without a native async driver
+                                 (default: `max_in_flight`).
+        :param adaptive: If False, always keep `max_in_flight` tests in flight.
+        :param cache: Optional result cache that executed results are stored in.
+        :param read_cache: If False, the cache is only refreshed, never used to answer a test.
+        :param max_failures: Stop the run after this many failed tests (default: run everything).
+        :param timeout: Default time limit per test in seconds; an `es:timeout` directive in a test overrides it.
+        :param run_timeout: Deadline for the whole run in seconds.
+        :param on_result: Called with every result as soon as its test completes.
+        :param on_start: Called with the test name and environment when a test takes a slot and starts executing.
+        :param spool: Optional spool that failure samples are moved into as soon as their test has a result.
+        """
+        if (
+            max_in_flight < 1
+            or (blocking_workers is not None and blocking_workers < 1)
+            or (max_failures is not None and max_failures < 1)
+            or (timeout is not None and timeout < 0)
+            or (run_timeout is not None and run_timeout <= 0)
+        ):
+            raise ValueError("Engine limits must be at least 1.")
+        self.max_in_flight = max_in_flight
+        self.blocking_workers = blocking_workers or max_in_flight
+        self.adaptive = adaptive
+        self.cache = cache
+        self.read_cache = read_cache
+        self.max_failures = max_failures
+        self.timeout = timeout
+        self.run_timeout = run_timeout
+        self.on_result = on_result
+        self.on_start = on_start
+        self.spool = spool
+        # Limiter of each environment of the last run; `limiter` is the one of the last environment
+        self.limiters: dict[str | None, AdaptiveConcurrencyLimiter] = {}
+        self.limiter: AdaptiveConcurrencyLimiter | None = None
+        # Outcome of the last run: whether it stopped at `max_failures` or at the run deadline, and how
+        # many queries were cancelled
+        self.stopped_early = False
+        self.deadline_exceeded = False
+        self.cancelled_queries = 0
+
+    def run(
+        self, test_files: Mapping[str, TestFileInfo], env: str | None, capture_failure_data: bool = False
+    ) -> list[TestResult]:
+        """
+        Run all tests to completion and return their results in completion order.
+
+        Tests are dispatched in the iteration order of `test_files`.
+
+        :param test_files: Mapping of test name to discovered file information.
+        :param env: Optional environment name from es.ini; if None, default is used.
+        :param capture_failure_data: If True, fetch a failure sample for failing tests.
+        :return: List of TestResult objects.
+        """
+        return asyncio.run(self.run_async(test_files, env, capture_failure_data))
+
+    async def run_async(
+        self, test_files: Mapping[str, TestFileInfo], env: str | None, capture_failure_data: bool = False
+    ) -> list[TestResult]:
+        """
+        Coroutine variant of `run`, for callers that already own an event loop.
+
+        If a test raises, the remaining tests are cancelled and the exception is propagated.
+        """
+        return await self.run_environments_async([EnvironmentRun(env, test_files)], capture_failure_data)
+
+    async def run_feed_async(
+        self,
+        feed: asyncio.Queue[tuple[str, TestFileInfo] | None],
+        env: str | None,
+        capture_failure_data: bool = False,
+    ) -> list[TestResult]:
+        """
+        Run tests as they are put into `feed` until None is put, and return their results in completion order.
+
+        A test starts as soon as it is fed and a slot is free, while earlier tests still run.
+
+        :param feed: Queue of (test name, file information) pairs, closed by None.
+        :param env: Optional environment name from es.ini; if None, default is used.
+        :param capture_failure_data: If True, fetch a failure sample for failing tests.
+        :return: List of TestResult objects.
+        """
+        return await self.run_environments_async([EnvironmentRun(env, {})], capture_failure_data, feed=feed)
+
+    def run_environments(self, runs: Sequence[EnvironmentRun], capture_failure_data: bool = False) -> list[TestResult]:
+        """
+        Run the tests of several environments concurrently and return their results in completion order.
+
+        With more than one environment, the environment name is shown next to each test name in the output.
+        Every result carries the environment it ran against in `env`.
+
+        :param runs: One EnvironmentRun per environment; environments must be distinct.
+        :param capture_failure_data: If True, fetch a failure sample for failing tests.
+        :return: List of TestResult objects.
+        """
+        return asyncio.run(self.run_environments_async(runs, capture_failure_data))
+
+    async def run_environments_async(
+        self,
+        runs: Sequence[EnvironmentRun],
+        capture_failure_data: bool = False,
+        *,
+        feed: asyncio.Queue[tuple[str, TestFileInfo] | None] | None = None,
+    ) -> list[TestResult]:
+        """
+        Coroutine variant of `run_environments`.
+
+        If a test raises, the remaining tests are cancelled and the exception is propagated.
+
+        :param feed: Optional queue of further tests for the single environment run, closed by None
+                     (see `run_feed_async`).
+        """
+        if len({run.env for run in runs}) != len(runs):
+            raise ValueError("Each environment can only be run once per run.")
+        if feed is not None and len(runs) != 1:
+            raise ValueError("A fed run needs exactly one environment.")
+        self.stopped_early = False
+        self.deadline_exceeded = False
+        self.cancelled_queries = 0
+        reset_query_tracking()
+        ceilings = [run.max_in_flight or self.max_in_flight for run in runs]
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(
+            ThreadPoolExecutor(
+                max_workers=self.blocking_workers if len(runs) == 1 else sum(ceilings),
+                thread_name_prefix="es-run",
+            )
+        )
+        # Cancellations run on their own threads: the default executor may be busy with the very queries to cancel
+        canceller = ThreadPoolExecutor(max_workers=CANCEL_WORKERS, thread_name_prefix="es-cancel")
+        self.limiters = {
+            run.env: AdaptiveConcurrencyLimiter(ceiling, adaptive=self.adaptive) for run, ceiling in zip(runs, ceilings)
+        }
+        self.limiter = self.limiters[runs[-1].env] if runs else None
+        cache = self.cache
+        cache_envs = {run.env: get_registry().resolve_name(run.env) for run in runs} if cache is not None else {}
+        labelled = len(runs) > 1
+        # Tests are keyed by (environment, test name)
+        started: set[tuple[str | None, str]] = set()
+
+        async def execute(
+            run: EnvironmentRun, test_name: str, test_info: TestFileInfo, sql: str, timeout: float | None
+        ) -> TestResult:
+            """Run one attempt of a test; on timeout, cancel its queries on the server and report an error."""
+            with query_scope(timeout) as scope:
+                # The task copies the current context, so the test's queries register with `scope`
+                attempt = asyncio.ensure_future(
+                    run_async_tests.run_test_async(
+                        test_name,
+                        test_info["full_path"],
+                        run.env,
+                        capture_failure_data,
+                        sample_rows=run.sample_rows or DEFAULT_SAMPLE_ROWS,
+                    )
+                )
+            start = loop.time()
+            try:
+                done, _ = await asyncio.wait({attempt}, timeout=timeout)
+                if done:
+                    return attempt.result()
+                # Cancel on the server first; cancelling the task would unregister its queries
+                await loop.run_in_executor(canceller, scope.cancel_all)
+                attempt.cancel()
+                await asyncio.gather(attempt, return_exceptions=True)
+            finally:
+                attempt.cancel()
+            return run_async_tests.build_error_result(
+                test_name,
+                sql,
+                f"Timed out after {timeout:g}s; the query was cancelled.",
+                execution_time=round(loop.time() - start, 3),
+            )
+
+        async def run_one(run: EnvironmentRun, test_name: str, test_info: TestFileInfo) -> TestResult:
+            result = await evaluate(run, test_name, _label(test_name, run.env) if labelled else test_name, test_info)
+            result.name = test_name
+            result.env = run.env
+            result.subsuite = test_info["subfolder"]
+            if self.spool is not None and (result.failure_rows is not None or result.failure_table is not None):
+                await asyncio.to_thread(self.spool.add, result, run.sample_max_bytes)
+            return result
+
+        async def evaluate(run: EnvironmentRun, test_name: str, label: str, test_info: TestFileInfo) -> TestResult:
+            with open(test_info["full_path"], "r") as f:
+                sql = f.read()
+            try:
+                directive = read_timeout(sql)
+            except ValueError as e:
+                return run_async_tests.build_error_result(label, sql, str(e))
+            default_timeout = run.timeout if run.timeout is not None else self.timeout
+            timeout = (directive if directive is not None else default_timeout) or None
+
+            cache_env = cache_envs.get(run.env, "")
+            if cache is not None and self.read_cache:
+                cached = cache.get(cache_env, sql, capture_failure_data)
+                if cached is not None:
+                    return run_async_tests.build_cached_result(label, sql, cached)
+
+            runner = run_async_tests.resolve_runner(run.env)
+            limiter = self.limiters[run.env]
+            expected = run.expected_durations.get(test_name) if run.expected_durations is not None else None
+            attempt = 0
+            while True:
+                async with limiter.slot(expected):
+                    if (run.env, test_info["full_path"]) not in started:
+                        started.add((run.env, test_info["full_path"]))
+                        if self.on_start is not None:
+                            self.on_start(test_name, run.env)
+                    try:
+                        result = await execute(run, label, test_info, sql, timeout)
+                        if cache is not None and result.error_message is None:
+                            cache.put(cache_env, sql, result)
+                        return result
+                    except Exception as e:
+                        if attempt >= MAX_THROTTLE_RETRIES or not runner.is_throttling_error(e):
+                            raise
+                        limiter.on_throttled()
+                await asyncio.sleep(THROTTLE_BACKOFF_SECONDS * 2**attempt)
+                attempt += 1
+
+        results: list[TestResult] = []
+
+        def collect(result: TestResult) -> None:
+            results.append(result)
+            if self.on_result is not None:
+                self.on_result(result)
+
+        tasks: list[asyncio.Future[TestResult]] = []
+        # Tests received through `feed`, by name
+        fed: dict[str, TestFileInfo] = {}
+        # Finished tests in completion order; None once the feed is closed
+        completed: asyncio.Queue[asyncio.Future[TestResult] | None] = asyncio.Queue()
+
+        def submit(run: EnvironmentRun, test_name: str, test_info: TestFileInfo) -> None:
+            task = asyncio.ensure_future(run_one(run, test_name, test_info))
+            task.add_done_callback(completed.put_nowait)
+            tasks.append(task)
+
+        async def take_feed(queue: asyncio.Queue[tuple[str, TestFileInfo] | None]) -> None:
+            while (item := await queue.get()) is not None:
+                fed[item[0]] = item[1]
+                submit(runs[0], *item)
+            completed.put_nowait(None)
+
+        for run in runs:
+            for t_n, t_fp in run.test_files.items():
+                submit(run, t_n, t_fp)
+        feeder = asyncio.ensure_future(take_feed(feed)) if feed is not None else None
+        feeding = feeder is not None
+        deadline = loop.time() + self.run_timeout if self.run_timeout is not None else None
+        handled = 0
+        failures = 0
+        try:
+            while feeding or handled < len(tasks):
+                remaining = deadline - loop.time() if deadline is not None else None
+                next_done = await asyncio.wait_for(completed.get(), remaining)
+                if next_done is None:
+                    feeding = False
+                    continue
+                handled += 1
+                result = next_done.result()
+                collect(result)
+                failures += not result.passed
+                if self.max_failures is not None and failures >= self.max_failures:
+                    self.stopped_early = True
+                    break
+        except asyncio.TimeoutError:
+            self.deadline_exceeded = True
+        finally:
+            if feeder is not None:
+                feeder.cancel()
+                await asyncio.gather(feeder, return_exceptions=True)
+            if any(not task.done() for task in tasks):
+                self.cancelled_queries = await loop.run_in_executor(canceller, cancel_in_flight_queries)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            canceller.shutdown(wait=False)
+            await aclose_all_pools()
+
+        if self.stopped_early or self.deadline_exceeded:
+            # Tests that finished while the run was being stopped keep their results
+            seen = {id(r) for r in results}
+            for task in tasks:
+                if task.done() and not task.cancelled() and task.exception() is None and id(task.result()) not in seen:
+                    collect(task.result())
+            if self.deadline_exceeded:
+                reason = f"run deadline of {self.run_timeout:g}s exceeded"
+            else:
+                reason = f"stopped after {failures} failed test(s)"
+            finished = {(r.env, r.name) for r in results}
+            for run in runs:
+                for name, info in {**run.test_files, **fed}.items():
+                    if (run.env, name) in finished:
+                        continue
+                    if self.deadline_exceeded and (run.env, info["full_path"]) in started:
+                        result = run_async_tests.build_error_result(
+                            name, "", f"Cancelled: {reason}.", subsuite=info["subfolder"]
+                        )
+                    else:
+                        result = run_async_tests.build_skipped_result(
+                            name, "", f"not run: {reason}", subsuite=info["subfolder"], announce=False
+                        )
+                    result.env = run.env
+                    collect(result)
+        return results
+
+
+def _label(test_name: str, env: str | None) -> str:
+    """Return the name a test is printed with in a run over several environments."""
+    return f"{test_name} [{env}]"
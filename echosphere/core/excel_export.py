@@ -7,13 +7,57 @@ from datetime import datetime
 from typing import Any
 
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment, Font
+from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.worksheet import Worksheet
 
+from echosphere.core.failure_export import BackgroundFailureExporter
 from echosphere.core.test_result import TestResult
 
 INVALID_SHEET_CHARS = r"[\\/*?:\[\]]"
 MAX_SHEET_NAME_LEN = 31
+MIN_COLUMN_WIDTH = 10
+MAX_COLUMN_WIDTH = 80
+
+
+def _prepare_path(path: str) -> str:
+    """Return the absolute path of an Excel file, adding the extension and creating missing directories."""
+    if not path.lower().endswith(".xlsx"):
+        path = f"{path}.xlsx"
+
+    abs_path = os.path.abspath(path)
+    dir_name = os.path.dirname(abs_path)
+    if dir_name and not os.path.exists(dir_name):
+        try:
+            os.makedirs(dir_name, exist_ok=True)
+        except OSError as e:
+            raise Exception(f"Failed to create directories for path '{abs_path}': {e}")
+    return abs_path
+
+
+def _meta_rows(r: TestResult) -> list[tuple[str, Any]]:
+    """Return the label/value rows describing a failed test at the top of its sheet."""
+    return [
+        ("Test Name:", r.name),
+        *([("Environment:", r.env)] if r.env else []),
+        ("Execution Time:", f"{r.duration:.3f} seconds"),
+        ("Failed With:", f"{r.row_count} rows (showing first {r.sample_size:,})"),
+        ("SQL Query:", r.sql),
+        ("Execution Timestamp:", r.timestamp.replace(microsecond=0).isoformat()),
+    ]
+
+
+def _cell_value(value: Any) -> Any:
+    """Return a value Excel can store; Excel has no time zones, so aware datetimes are made naive."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+def _column_width(longest: int) -> int:
+    """Return the width of a column whose longest value has `longest` characters."""
+    return min(max(MIN_COLUMN_WIDTH, longest + 2), MAX_COLUMN_WIDTH)
 
 
 class FailedTestExporter:
@@ -28,7 +72,7 @@ class FailedTestExporter:
     def add_results(self, results: Iterable[TestResult]) -> None:
         """Append only failed TestResult instances from the iterable."""
         for r in results:
-            if not r.passed:
+            if r.status == "fail":
                 self._results.append(r)
 
     @staticmethod
@@ -57,20 +101,11 @@ class FailedTestExporter:
                 val = "" if cell is None else str(cell)
                 max_width[idx] = max(max_width.get(idx, 0), len(val))
         for idx, width in max_width.items():
-            ws.column_dimensions[ws.cell(row=1, column=idx).column_letter].width = min(max(10, width + 2), 80)
+            ws.column_dimensions[ws.cell(row=1, column=idx).column_letter].width = _column_width(width)
 
     def write_to_file(self, path: str) -> str:
         """Write failed test details to an Excel (.xlsx) file and return its absolute path."""
-        if not path.lower().endswith(".xlsx"):
-            path = f"{path}.xlsx"
-
-        abs_path = os.path.abspath(path)
-        dir_name = os.path.dirname(abs_path)
-        if dir_name and not os.path.exists(dir_name):
-            try:
-                os.makedirs(dir_name, exist_ok=True)
-            except OSError as e:
-                raise Exception(f"Failed to create directories for path '{abs_path}': {e}")
+        abs_path = _prepare_path(path)
 
         wb = Workbook()
         if self._results:
@@ -78,21 +113,17 @@ class FailedTestExporter:
             wb.remove(default_ws)
 
         used_names: set[str] = set()
+        # The same test can fail in several environments; its sheets are then told apart by environment
+        multi_env = len({r.env for r in self._results}) > 1
         header_font = Font(bold=True)
         meta_label_font = Font(bold=True)
         wrap_alignment = Alignment(wrap_text=True, vertical="top")
 
         for r in self._results:
-            sheet_name = self._sanitize_sheet_name(r.name, used_names)
+            sheet_name = self._sanitize_sheet_name(f"{r.env} {r.name}" if multi_env else r.name, used_names)
             ws = wb.create_sheet(title=sheet_name)
 
-            meta_rows = [
-                ("Test Name:", r.name),
-                ("Execution Time:", f"{r.duration:.3f} seconds"),
-                ("Failed With:", f"{r.row_count} rows (showing first 1,000)"),
-                ("SQL Query:", r.sql),
-                ("Execution Timestamp:", r.timestamp.replace(microsecond=0).isoformat()),
-            ]
+            meta_rows = _meta_rows(r)
             row_idx = 1
             for label, value in meta_rows:
                 ws.cell(row=row_idx, column=1, value=label).font = meta_label_font
@@ -103,7 +134,7 @@ class FailedTestExporter:
             row_idx += 1  # blank line
 
             columns = r.failure_columns or []
-            rows = r.failure_rows or []
+            rows = r.iter_failure_rows()
 
             for col_idx, col_name in enumerate(columns, start=1):
                 c = ws.cell(row=row_idx, column=col_idx, value=col_name)
@@ -113,9 +144,7 @@ class FailedTestExporter:
             for dr in rows:
                 row_idx += 1
                 for col_idx, cell_val in enumerate(dr, start=1):
-                    if isinstance(cell_val, datetime):
-                        cell_val.replace(tzinfo=None)
-                    ws.cell(row=row_idx, column=col_idx, value=cell_val)
+                    ws.cell(row=row_idx, column=col_idx, value=_cell_value(cell_val))
 
             ws.freeze_panes = ws.cell(row=header_row + 1, column=1)
             self._auto_fit_columns(ws)
@@ -131,3 +160,85 @@ class FailedTestExporter:
             raise Exception(f"Failed to write Excel file to '{abs_path}': {e}")
 
         return abs_path
+
+
+class StreamingFailedTestExporter(BackgroundFailureExporter):
+    """
+    Exports failed EchoSphere tests into an Excel workbook while the run is in progress.
+
+    The workbook is write-only: the rows of a sheet go straight to a temporary file and
+    are never kept as cells, so memory holds at most one failed test at a time. Column
+    widths are measured while the rows are converted, before the sheet is written,
+    instead of in a second pass over the cells. Sheets are built on the background
+    thread of `BackgroundFailureExporter`, so the export overlaps with query execution.
+    """
+
+    def __init__(self, path: str, *, show_env: bool = False) -> None:
+        """
+        Create the workbook and start the writer thread.
+
+        :param path: Path of the Excel file (``.xlsx`` is added if missing).
+        :param show_env: If True, sheet names start with the environment, for runs over several environments.
+        """
+        self._wb = Workbook(write_only=True)
+        self._used_names: set[str] = set()
+        super().__init__(_prepare_path(path), show_env=show_env)
+
+    def _finish(self) -> None:
+        """Save the workbook; without failed tests it holds a single placeholder sheet."""
+        if not self.exported:
+            ws = self._wb.create_sheet(title="No Failures")
+            ws.append(["No failed tests to export."])
+        try:
+            self._wb.save(self.path)
+        except OSError as e:
+            raise Exception(f"Failed to write Excel file to '{self.path}': {e}")
+
+    def _export(self, r: TestResult) -> None:
+        """Write the sheet of one failed test and close it, which releases its temporary file."""
+        name = f"{r.env} {r.name}" if self.show_env else r.name
+        ws = self._wb.create_sheet(title=FailedTestExporter._sanitize_sheet_name(name, self._used_names))
+        # Widths are measured in the one pass that converts the values, before any row is written,
+        # because a write-only sheet takes its column widths only ahead of the first row
+        widths: dict[int, int] = {}
+
+        def measure(values: Iterable[Any]) -> None:
+            for idx, value in enumerate(values, start=1):
+                length = 0 if value is None else len(str(value))
+                if length > widths.get(idx, 0):
+                    widths[idx] = length
+
+        meta_rows = _meta_rows(r)
+        columns = r.failure_columns or []
+        rows = []
+        for row in meta_rows:
+            measure(row)
+        measure(columns)
+        for dr in r.iter_failure_rows():
+            values = [_cell_value(v) for v in dr]
+            measure(values)
+            rows.append(values)
+
+        for idx, width in widths.items():
+            ws.column_dimensions[get_column_letter(idx)].width = _column_width(width)
+        header_row = len(meta_rows) + 2  # after a blank line
+        ws.freeze_panes = f"A{header_row + 1}"
+
+        bold = Font(bold=True)
+        wrap_alignment = Alignment(wrap_text=True, vertical="top")
+        for label, value in meta_rows:
+            label_cell = WriteOnlyCell(ws, value=label)
+            label_cell.font = bold
+            value_cell = WriteOnlyCell(ws, value=value)
+            value_cell.alignment = wrap_alignment
+            ws.append([label_cell, value_cell])
+        ws.append([])
+        header = []
+        for col_name in columns:
+            cell = WriteOnlyCell(ws, value=col_name)
+            cell.font = bold
+            header.append(cell)
+        ws.append(header)
+        for values in rows:
+            ws.append(values)
+        ws.close()
@@ -0,0 +1,289 @@
+"""
+Export of failure samples while a run is in progress.
+
+`--export-failures` writes the captured rows of every failed test in one of
+`EXPORT_FORMATS`:
+
+- `xlsx`: one Excel workbook with a sheet per failed test (`StreamingFailedTestExporter`).
+- `parquet`: a directory with one Parquet file per failed test. Arrow samples are written
+  as they were fetched; row samples are converted column by column.
+- `csv`: a directory with one gzip-compressed CSV file per failed test.
+
+The directory formats write a `_metadata.json` sidecar that lists every exported test
+with its name, environment, subsuite, SQL, row count, timestamp and file. Readers that
+load the whole directory (e.g. `pyarrow.dataset`) skip files starting with `_`.
+
+All exporters build their output on a background thread fed through a queue, so the
+run loop only enqueues results.
+"""
+
+from __future__ import annotations
+
+import csv
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Sequence
+from typing import TYPE_CHECKING, Any
+
+from echosphere.core.test_result import TestResult
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+EXPORT_FORMATS = ("xlsx", "parquet", "csv")
+METADATA_FILE = "_metadata.json"
+_UNSAFE_FILE_CHARS = r"[^\w.-]+"
+
+
+class BackgroundFailureExporter(ABC):
+    """
+    Base class of the failure exporters: failed tests are queued by `add_result` and
+    written one at a time on a writer thread until `close`.
+    """
+
+    def __init__(self, path: str, *, show_env: bool = False) -> None:
+        """
+        Initialize the exporter and start the writer thread.
+
+        :param path: Absolute output path.
+        :param show_env: If True, the environment is part of each test's sheet or file name.
+        """
+        self.path = path
+        self.show_env = show_env
+        self.exported = 0
+        self.error: str | None = None
+        self._queue: queue.SimpleQueue[TestResult | None] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = threading.Thread(
+            target=self._consume, name="es-failure-export", daemon=True
+        )
+        self._thread.start()
+
+    def add_result(self, result: TestResult) -> None:
+        """
+        Queue a result for export; only failed tests are exported. Matches the engine's `on_result` callback.
+
+        :param result: Result of the test.
+        """
+        if result.status == "fail":
+            self._queue.put(result)
+
+    def add_results(self, results: Iterable[TestResult]) -> None:
+        """Queue the failed tests of the iterable for export."""
+        for r in results:
+            self.add_result(r)
+
+    def close(self) -> str:
+        """
+        Write the queued tests, finish the output and return its absolute path.
+
+        A test that could not be written is recorded in ``error``; the tests before it are still kept.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._finish()
+        return self.path
+
+    def __enter__(self) -> BackgroundFailureExporter:
+        """Return the exporter."""
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        """Close the exporter."""
+        self.close()
+
+    def _consume(self) -> None:
+        """Write every queued result until ``close``; stop exporting after the first error."""
+        while (r := self._queue.get()) is not None:
+            if self.error is not None:
+                continue
+            try:
+                self._export(r)
+                self.exported += 1
+            except Exception as e:
+                self.error = f"Failed to export test '{r.name}': {e}"
+
+    @abstractmethod
+    def _export(self, r: TestResult) -> None:
+        """Write one failed test; runs on the writer thread."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _finish(self) -> None:
+        """Complete the output once every queued test is written."""
+        raise NotImplementedError
+
+
+class _DirectoryExporter(BackgroundFailureExporter):
+    """Writes one file per failed test into a directory, plus the `_metadata.json` sidecar."""
+
+    export_format = ""
+    suffix = ""
+
+    def __init__(self, path: str, *, show_env: bool = False) -> None:
+        """
+        Create the output directory.
+
+        :param path: Directory to write to (created if missing).
+        :param show_env: If True, file names start with the environment.
+        """
+        abs_path = os.path.abspath(path)
+        try:
+            os.makedirs(abs_path, exist_ok=True)
+        except OSError as e:
+            raise Exception(f"Failed to create directory '{abs_path}': {e}")
+        self._entries: list[dict[str, Any]] = []
+        self._used_names: set[str] = set()
+        super().__init__(abs_path, show_env=show_env)
+
+    def _file_name(self, r: TestResult) -> str:
+        """Return a unique file name for the test; qualified names become flat file names."""
+        base = re.sub(_UNSAFE_FILE_CHARS, "_", f"{r.env}__{r.name}" if self.show_env else r.name)
+        name, i = base, 1
+        while name.lower() in self._used_names:
+            name = f"{base}_{i}"
+            i += 1
+        self._used_names.add(name.lower())
+        return name + self.suffix
+
+    def _export(self, r: TestResult) -> None:
+        """Write the sample file of one test and record its metadata."""
+        file_name = self._file_name(r)
+        columns = list(r.failure_columns or [])
+        sample_rows = self._write(os.path.join(self.path, file_name), r, columns)
+        self._entries.append(
+            {
+                "name": r.name,
+                "env": r.env,
+                "subsuite": r.subsuite,
+                "sql": r.sql,
+                "row_count": r.row_count,
+                "sample_rows": sample_rows,
+                "columns": columns,
+                "duration": r.duration,
+                "timestamp": r.timestamp.isoformat(),
+                "file": file_name,
+            }
+        )
+
+    @abstractmethod
+    def _write(self, file_path: str, r: TestResult, columns: list[str]) -> int:
+        """Write the sample of one test to `file_path` and return the number of rows written."""
+        raise NotImplementedError
+
+    def _finish(self) -> None:
+        """Write the metadata sidecar."""
+        sidecar = os.path.join(self.path, METADATA_FILE)
+        try:
+            with open(sidecar, "w", encoding="utf-8") as f:
+                json.dump({"format": self.export_format, "tests": self._entries}, f, indent=2, default=str)
+        except OSError as e:
+            raise Exception(f"Failed to write '{sidecar}': {e}")
+
+
+class ParquetFailureExporter(_DirectoryExporter):
+    """Writes the failure sample of each failed test to its own Parquet file."""
+
+    export_format = "parquet"
+    suffix = ".parquet"
+
+    def __init__(self, path: str, *, show_env: bool = False) -> None:
+        """
+        Check that pyarrow is installed and create the output directory.
+
+        :param path: Directory to write to (created if missing).
+        :param show_env: If True, file names start with the environment.
+        """
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as e:
+            raise Exception(
+                "The parquet export format requires the pyarrow package. Install with 'pip install pyarrow'"
+            ) from e
+        super().__init__(path, show_env=show_env)
+
+    def _write(self, file_path: str, r: TestResult, columns: list[str]) -> int:
+        """Write the sample as one Parquet file with the test metadata in its schema metadata."""
+        import pyarrow.parquet as pq
+
+        table = r.failure_arrow()
+        if table is None:
+            table = _rows_to_table(columns, r.iter_failure_rows())
+        metadata = {
+            "echosphere.test": r.name,
+            "echosphere.env": r.env or "",
+            "echosphere.sql": r.sql,
+            "echosphere.row_count": str(r.row_count),
+            "echosphere.timestamp": r.timestamp.isoformat(),
+        }
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+        pq.write_table(table, file_path)
+        return int(table.num_rows)
+
+
+class CsvFailureExporter(_DirectoryExporter):
+    """Writes the failure sample of each failed test to its own gzip-compressed CSV file."""
+
+    export_format = "csv"
+    suffix = ".csv.gz"
+
+    def _write(self, file_path: str, r: TestResult, columns: list[str]) -> int:
+        """Write the header and the sample rows; values are written as their string form."""
+        written = 0
+        with gzip.open(file_path, "wt", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in r.iter_failure_rows():
+                writer.writerow(row)
+                written += 1
+        return written
+
+
+def _rows_to_table(columns: list[str], rows: Iterable[Sequence[Any]]) -> pa.Table:
+    """
+    Build an Arrow table from row tuples, one column at a time.
+
+    Columns whose values Arrow cannot bring to one type (e.g. mixed numbers and strings)
+    are stored as strings.
+    """
+    import pyarrow as pa
+
+    values: list[list[Any]] = [[] for _ in columns]
+    for row in rows:
+        for column, value in zip(values, row):
+            column.append(value)
+    arrays = []
+    for column in values:
+        try:
+            arrays.append(pa.array(column))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays.append(pa.array([None if v is None else str(v) for v in column], type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=columns)
+
+
+def open_failure_exporter(
+    path: str, export_format: str = "xlsx", *, show_env: bool = False
+) -> BackgroundFailureExporter:
+    """
+    Create the failure exporter of a format.
+
+    :param path: Excel file for `xlsx`, output directory for the other formats.
+    :param export_format: One of `EXPORT_FORMATS`.
+    :param show_env: If True, each test's sheet or file name starts with its environment.
+    :return: The started exporter.
+    """
+    if export_format == "xlsx":
+        from echosphere.core.excel_export import StreamingFailedTestExporter
+
+        return StreamingFailedTestExporter(path, show_env=show_env)
+    if export_format == "parquet":
+        return ParquetFailureExporter(path, show_env=show_env)
+    if export_format == "csv":
+        return CsvFailureExporter(path, show_env=show_env)
+    raise ValueError(f"Unknown export format '{export_format}'. Use one of: {', '.join(EXPORT_FORMATS)}.")
@@ -0,0 +1,203 @@
+"""
+Spool for failure samples.
+
+Without a spool, every failing `TestResult` holds its sample rows as Python objects
+until the run ends. With one, the engine hands each sample to `FailureSpool.add` as
+soon as the test's result is known. The sample is serialized (Arrow samples as an
+Arrow IPC stream, row samples pickled) and the result keeps only a `SampleRef`.
+
+Serialized samples stay in memory while their total is within `memory_budget` bytes;
+later samples go to files in a temporary directory that is removed on `close`. The
+serialized form is far smaller than the Python objects, and spilled Arrow samples
+are read back through a memory map.
+
+A per-test byte limit (`max_bytes`) truncates a sample to the rows that fit;
+`SampleRef.truncated` records it.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+    from echosphere.core.test_result import TestResult
+
+DEFAULT_MEMORY_BUDGET_MB = 64
+DEFAULT_SAMPLE_MAX_KB = 10 * 1024
+
+_ARROW = "arrow"
+_ROWS = "rows"
+
+
+@dataclass(frozen=True, slots=True)
+class SampleRef:
+    """A failure sample stored in a `FailureSpool`."""
+
+    spool: FailureSpool
+    key: int
+    kind: str
+    rows: int
+    nbytes: int
+    truncated: bool = False
+
+    def iter_rows(self) -> Iterator[Sequence[Any]]:
+        """Yield the rows of the sample; Arrow samples are converted one record batch at a time."""
+        if self.kind == _ARROW:
+            for batch in self.to_arrow().to_batches():
+                yield from zip(*(column.to_pylist() for column in batch.columns))
+        else:
+            yield from pickle.loads(self.spool.read(self))
+
+    def to_arrow(self) -> pa.Table:
+        """Return an Arrow sample as a table."""
+        import pyarrow as pa
+
+        if self.kind != _ARROW:
+            raise ValueError("The sample was not stored as Arrow data.")
+        source = self.spool.open_arrow(self)
+        return pa.ipc.open_stream(source).read_all()
+
+
+class FailureSpool:
+    """
+    Holds the failure samples of a run in serialized form, in memory up to a budget and on disk beyond it.
+    """
+
+    def __init__(
+        self, memory_budget: int = DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024, directory: str | None = None
+    ) -> None:
+        """
+        Initialize the spool; its temporary directory is created when the first sample spills.
+
+        :param memory_budget: Bytes of serialized samples kept in memory.
+        :param directory: Parent directory of the spool files (default: the system temporary directory).
+        """
+        self.memory_budget = memory_budget
+        self.parent_directory = directory
+        self.in_memory = 0
+        self.on_disk = 0
+        self.spilled = 0
+        self._directory: str | None = None
+        self._memory: dict[int, bytes] = {}
+        self._keys = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, result: TestResult, max_bytes: int | None = None) -> None:
+        """
+        Move the in-memory failure sample of a result into the spool.
+
+        The result's `failure_rows` and `failure_table` are replaced by `failure_sample`.
+        Results without an in-memory sample are left unchanged.
+
+        :param result: Result of a failed test.
+        :param max_bytes: Limit for the serialized sample of this test; rows beyond it are dropped.
+        """
+        if result.failure_table is not None:
+            kind, payload, rows, truncated = _ARROW, *_encode_arrow(result.failure_table, max_bytes)
+        elif result.failure_rows is not None:
+            kind, payload, rows, truncated = _ROWS, *_encode_rows(result.failure_rows, max_bytes)
+        else:
+            return
+        result.failure_sample = self._store(kind, payload, rows, truncated)
+        result.failure_rows = None
+        result.failure_table = None
+
+    def _store(self, kind: str, payload: bytes, rows: int, truncated: bool) -> SampleRef:
+        """Keep a serialized sample in memory if the budget allows, otherwise write it to a spool file."""
+        with self._lock:
+            key = next(self._keys)
+            keep = self.in_memory + len(payload) <= self.memory_budget
+            if keep:
+                self._memory[key] = payload
+                self.in_memory += len(payload)
+            else:
+                self.spilled += 1
+                self.on_disk += len(payload)
+                if self._directory is None:
+                    self._directory = tempfile.mkdtemp(prefix="es-spool-", dir=self.parent_directory)
+        if not keep:
+            with open(self._path(key), "wb") as f:
+                f.write(payload)
+        return SampleRef(self, key, kind, rows, len(payload), truncated)
+
+    def _path(self, key: int) -> str:
+        """Return the spool file of a sample."""
+        assert self._directory is not None
+        return os.path.join(self._directory, f"{key}.bin")
+
+    def read(self, ref: SampleRef) -> bytes:
+        """
+        Return the serialized form of a sample.
+
+        :param ref: Reference returned for the sample.
+        """
+        payload = self._memory.get(ref.key)
+        if payload is not None:
+            return payload
+        with open(self._path(ref.key), "rb") as f:
+            return f.read()
+
+    def open_arrow(self, ref: SampleRef) -> Any:
+        """Return a readable source of an Arrow sample: the bytes in memory or a memory map of its spool file."""
+        import pyarrow as pa
+
+        payload = self._memory.get(ref.key)
+        if payload is not None:
+            return pa.py_buffer(payload)
+        return pa.memory_map(self._path(ref.key))
+
+    def close(self) -> None:
+        """Drop all samples and remove the spool files."""
+        with self._lock:
+            self._memory.clear()
+            self.in_memory = 0
+            directory, self._directory = self._directory, None
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def __enter__(self) -> FailureSpool:
+        """Return the spool."""
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        """Close the spool."""
+        self.close()
+
+
+def _encode_rows(rows: Sequence[Sequence[object]], max_bytes: int | None) -> tuple[bytes, int, bool]:
+    """Pickle sample rows, keeping only as many rows as fit into `max_bytes`."""
+    payload = pickle.dumps(list(rows), protocol=pickle.HIGHEST_PROTOCOL)
+    kept = len(rows)
+    while max_bytes is not None and len(payload) > max_bytes and kept:
+        # Rows have similar sizes; estimate the rows that fit, then shrink until they do
+        kept = min(kept - 1, len(rows) * max_bytes // len(payload))
+        payload = pickle.dumps(list(rows[:kept]), protocol=pickle.HIGHEST_PROTOCOL)
+    return payload, kept, kept < len(rows)
+
+
+def _encode_arrow(table: pa.Table, max_bytes: int | None) -> tuple[bytes, int, bool]:
+    """Serialize an Arrow sample as an IPC stream, keeping only as many rows as fit into `max_bytes`."""
+    import pyarrow as pa
+
+    def serialize(t: pa.Table) -> bytes:
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, t.schema) as writer:
+            writer.write_table(t)
+        return bytes(sink.getvalue().to_pybytes())
+
+    kept = table.num_rows
+    payload = serialize(table)
+    while max_bytes is not None and len(payload) > max_bytes and kept:
+        kept = min(kept - 1, table.num_rows * max_bytes // len(payload))
+        payload = serialize(table.slice(0, kept))
+    return payload, kept, kept < table.num_rows
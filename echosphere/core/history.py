@@ -0,0 +1,298 @@
+"""
+Run-history store for `es run`.
+
+Every run appends the duration of each test to a small SQLite database next to
+`es.ini`. The history is used to schedule the longest expected tests first, so a
+long test does not start last and stretch the total run time.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import statistics
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from datetime import datetime
+
+from echosphere.core.test_result import TestResult
+
+HISTORY_FILE = ".es_history.sqlite"
+# Number of most recent runs per test used to estimate its duration
+HISTORY_WINDOW = 10
+
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at  TEXT NOT NULL,
+    env         TEXT NOT NULL,
+    tag         TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id      INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    test        TEXT NOT NULL,
+    subsuite    TEXT,
+    duration    REAL NOT NULL,
+    expected    REAL,
+    passed      INTEGER NOT NULL,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS results_test ON results(test, run_id);
+CREATE INDEX IF NOT EXISTS runs_env ON runs(env, run_id);
+CREATE INDEX IF NOT EXISTS results_fingerprint ON results(fingerprint);
+"""
+# Statements upgrading a database from the previous schema version
+MIGRATIONS: dict[int, str] = {
+    2: """
+    ALTER TABLE results ADD COLUMN fingerprint TEXT;
+    CREATE INDEX IF NOT EXISTS results_fingerprint ON results(fingerprint);
+    """,
+}
+# SQLite's default limit of host parameters per statement is 999
+_MAX_PARAMS = 900
+
+
+@dataclass(frozen=True, slots=True)
+class Expectation:
+    """Expected duration of a test and how far observed durations strayed from expectations."""
+
+    duration: float
+    variance: float
+    samples: int
+
+
+def default_history_path(ini_path: str = "es.ini") -> str:
+    """
+    Return the path of the history database that sits next to the given es.ini.
+
+    :param ini_path: Path to es.ini.
+    :return: Path of the SQLite history file.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(ini_path)), HISTORY_FILE)
+
+
+class DurationHistory:
+    """
+    SQLite-backed store of per-test durations, keyed by environment.
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        """
+        Open (and if needed create) the history database.
+
+        :param path: Database file; defaults to `.es_history.sqlite` next to es.ini.
+        """
+        self.path = path or default_history_path()
+        self._conn = sqlite3.connect(self.path, timeout=30)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            if version == 0:
+                self._conn.executescript(SCHEMA)
+            else:
+                for target in range(version + 1, SCHEMA_VERSION + 1):
+                    self._conn.executescript(MIGRATIONS[target])
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
+
+    def __enter__(self) -> DurationHistory:
+        """Return the store itself."""
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        """Close the store."""
+        self.close()
+
+    def record_run(
+        self,
+        env: str,
+        results: Iterable[TestResult],
+        expectations: Mapping[str, Expectation] | None = None,
+        tag: str | None = None,
+        fingerprints: Mapping[str, str] | None = None,
+    ) -> int:
+        """
+        Store the durations of one run.
+
+        Skipped tests and results served from the result cache did not execute and are not stored.
+        Errors are not stored either: a timed-out or cancelled test has a cut-off duration.
+
+        :param env: Resolved environment name the run used.
+        :param results: Results of the run.
+        :param expectations: Expected durations the run was scheduled with, stored to measure their accuracy.
+        :param tag: Optional label of the run, e.g. a release name.
+        :param fingerprints: Input fingerprints of incremental runs, by test name.
+        :return: The new run id.
+        """
+        expectations = expectations or {}
+        fingerprints = fingerprints or {}
+        with self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO runs (started_at, env, tag) VALUES (?, ?, ?)",
+                (datetime.now().isoformat(timespec="seconds"), env, tag),
+            )
+            run_id = int(cur.lastrowid or 0)
+            self._conn.executemany(
+                "INSERT INTO results (run_id, test, subsuite, duration, expected, passed, fingerprint) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        r.name,
+                        r.subsuite,
+                        float(r.duration),
+                        expectations[r.name].duration if r.name in expectations else None,
+                        int(r.passed),
+                        fingerprints.get(r.name),
+                    )
+                    for r in results
+                    if r.status != "error" and not r.skipped and not r.cached
+                ],
+            )
+        return run_id
+
+    def expectations(self, env: str, window: int = HISTORY_WINDOW) -> dict[str, Expectation]:
+        """
+        Return the expected duration of every test with history in the environment.
+
+        The expectation is the mean of the last `window` durations. The variance is the mean
+        squared relative error of past observations against the expectation they were scheduled
+        with; for tests without such records it falls back to the squared coefficient of variation.
+
+        :param env: Resolved environment name.
+        :param window: Number of most recent runs per test to consider.
+        :return: Mapping of test name to Expectation.
+        """
+        rows = self._conn.execute(
+            """
+            SELECT test, duration, expected FROM (
+                SELECT r.test, r.duration, r.expected,
+                       ROW_NUMBER() OVER (PARTITION BY r.test ORDER BY r.run_id DESC) AS rn
+                FROM results r JOIN runs USING (run_id)
+                WHERE runs.env = ?
+            ) WHERE rn <= ?
+            """,
+            (env, window),
+        ).fetchall()
+
+        per_test: dict[str, list[tuple[float, float | None]]] = {}
+        for test, duration, expected in rows:
+            per_test.setdefault(test, []).append((duration, expected))
+
+        out: dict[str, Expectation] = {}
+        for test, samples in per_test.items():
+            durations = [d for d, _ in samples]
+            mean = statistics.fmean(durations)
+            errors = [((d - e) / e) ** 2 for d, e in samples if e]
+            if errors:
+                variance = statistics.fmean(errors)
+            elif len(durations) > 1 and mean > 0:
+                variance = statistics.pvariance(durations) / mean**2
+            else:
+                variance = float("inf")
+            out[test] = Expectation(duration=mean, variance=variance, samples=len(durations))
+        return out
+
+    def passing_fingerprints(self, env: str, fingerprints: Iterable[str]) -> set[str]:
+        """
+        Return the fingerprints among `fingerprints` that belong to a passing test in a previous run.
+
+        :param env: Resolved environment name.
+        :param fingerprints: Candidate fingerprints.
+        :return: Subset of fingerprints recorded for passing tests.
+        """
+        candidates = list(set(fingerprints))
+        found: set[str] = set()
+        for i in range(0, len(candidates), _MAX_PARAMS):
+            chunk = candidates[i : i + _MAX_PARAMS]
+            found.update(
+                r[0]
+                for r in self._conn.execute(
+                    "SELECT DISTINCT fingerprint FROM results JOIN runs USING (run_id) "
+                    f"WHERE runs.env = ? AND passed = 1 AND fingerprint IN ({','.join('?' * len(chunk))})",
+                    [env, *chunk],
+                )
+            )
+        return found
+
+    def latest_run_id(self, env: str) -> int | None:
+        """
+        Return the id of the most recent run in the environment.
+
+        :param env: Resolved environment name.
+        :return: Run id, or None if the environment has no recorded runs.
+        """
+        row = self._conn.execute("SELECT MAX(run_id) FROM runs WHERE env = ?", (env,)).fetchone()
+        return int(row[0]) if row and row[0] is not None else None
+
+    def find_runs(self, env: str, *, before: int | None = None, tag: str | None = None, limit: int = 1) -> list[int]:
+        """
+        Return the ids of the most recent runs matching the filters, newest first.
+
+        :param env: Resolved environment name.
+        :param before: Only consider runs older than this run id.
+        :param tag: Only consider runs recorded with this tag.
+        :param limit: Maximum number of run ids to return.
+        :return: List of run ids.
+        """
+        query = "SELECT run_id FROM runs WHERE env = ?"
+        params: list[object] = [env]
+        if before is not None:
+            query += " AND run_id < ?"
+            params.append(before)
+        if tag is not None:
+            query += " AND tag = ?"
+            params.append(tag)
+        query += " ORDER BY run_id DESC LIMIT ?"
+        params.append(limit)
+        return [int(r[0]) for r in self._conn.execute(query, params)]
+
+    def run_durations(self, run_ids: Iterable[int]) -> dict[str, tuple[str | None, list[float]]]:
+        """
+        Return the durations of every test in the given runs.
+
+        :param run_ids: Runs to read.
+        :return: Mapping of test name to (subsuite, durations across the runs).
+        """
+        ids = list(run_ids)
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        out: dict[str, tuple[str | None, list[float]]] = {}
+        for test, subsuite, duration in self._conn.execute(
+            f"SELECT test, subsuite, duration FROM results WHERE run_id IN ({placeholders}) ORDER BY run_id",
+            ids,
+        ):
+            out.setdefault(test, (subsuite, []))[1].append(float(duration))
+        return out
+
+
+def order_longest_first(test_names: Iterable[str], expectations: Mapping[str, Expectation]) -> list[str]:
+    """
+    Order tests so the longest expected ones start first.
+
+    Ties on the expected duration go to the test whose past durations matched expectations
+    best (lowest variance). Tests without history are assumed to take the median expected
+    duration and are placed after known tests of the same length.
+
+    :param test_names: Names of the tests to schedule.
+    :param expectations: Expected durations from `DurationHistory.expectations`.
+    :return: Test names in dispatch order.
+    """
+    names = list(test_names)
+    known = [expectations[n].duration for n in names if n in expectations]
+    unknown_duration = statistics.median(known) if known else 0.0
+
+    def key(name: str) -> tuple[float, float]:
+        exp = expectations.get(name)
+        if exp is None:
+            return -unknown_duration, float("inf")
+        return -exp.duration, exp.variance
+
+    # sorted() is stable, so discovery order breaks any remaining ties
+    return sorted(names, key=key)
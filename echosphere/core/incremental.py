@@ -0,0 +1,103 @@
+"""
+Change-aware incremental runs.
+
+Each test is fingerprinted from its SQL text, the resolved environment and a change
+marker of every table it reads (Snowflake `LAST_ALTERED`, Postgres write statistics,
+Delta table version). A test whose fingerprint was recorded for a passing test in an
+earlier run has unchanged inputs and is skipped.
+
+Tests are always executed when their tables cannot be determined or tracked (no
+table found in the SQL, views, unknown names) or when the platform does not support
+table change markers.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+from echosphere.core.db_runner.BaseClass import RunnerType
+from echosphere.core.history import DurationHistory
+from echosphere.core.run_async_tests import build_skipped_result
+from echosphere.core.test_result import TestResult
+from echosphere.utils.sql_tables import TableRef, extract_table_references
+from echosphere.utils.sql_test_fetcher import TestFileInfo
+
+logger = logging.getLogger(__name__)
+
+SKIP_REASON = "inputs unchanged since last passing run"
+
+
+@dataclass(slots=True)
+class IncrementalPlan:
+    """Tests to execute, tests skipped as unchanged, and the fingerprints to record for the run."""
+
+    to_run: dict[str, TestFileInfo]
+    skipped: list[TestResult] = field(default_factory=list)
+    fingerprints: dict[str, str] = field(default_factory=dict)
+    warning: str | None = None
+
+
+def fingerprint_test(sql: str, env: str, table_versions: Mapping[TableRef, str]) -> str:
+    """
+    Return a stable fingerprint of a test's inputs.
+
+    :param sql: SQL text of the test.
+    :param env: Resolved environment name.
+    :param table_versions: Change marker of every table the test reads.
+    :return: Hex digest.
+    """
+    digest = hashlib.sha256()
+    for part in (sql, env, *sorted(f"{ref}={version}" for ref, version in table_versions.items())):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def plan_incremental_run(
+    runner: RunnerType, env: str, test_files: Mapping[str, TestFileInfo], history: DurationHistory
+) -> IncrementalPlan:
+    """
+    Split the suite into tests to execute and tests whose inputs are unchanged since they last passed.
+
+    Table change markers of all tests are fetched in one call to `runner.table_versions`.
+
+    :param runner: Runner of the environment's platform.
+    :param env: Resolved environment name.
+    :param test_files: Discovered tests, in dispatch order.
+    :param history: Run history holding fingerprints of earlier runs.
+    :return: The IncrementalPlan.
+    """
+    sqls: dict[str, str] = {}
+    refs: dict[str, list[TableRef]] = {}
+    for name, info in test_files.items():
+        with open(info["full_path"], "r") as f:
+            sqls[name] = f.read()
+        refs[name] = extract_table_references(sqls[name])
+
+    all_refs = list(dict.fromkeys(ref for test_refs in refs.values() for ref in test_refs))
+    try:
+        versions = runner.table_versions(env, all_refs) if all_refs else {}
+    except NotImplementedError as e:
+        return IncrementalPlan(to_run=dict(test_files), warning=str(e))
+    except Exception as e:
+        logger.warning("Failed to read table change markers", exc_info=True)
+        return IncrementalPlan(to_run=dict(test_files), warning=f"Failed to read table change markers: {e}")
+
+    plan = IncrementalPlan(to_run={})
+    for name, test_refs in refs.items():
+        test_versions = {ref: versions.get(ref) for ref in test_refs}
+        if test_refs and all(v is not None for v in test_versions.values()):
+            plan.fingerprints[name] = fingerprint_test(
+                sqls[name], env, {ref: v for ref, v in test_versions.items() if v is not None}
+            )
+
+    unchanged = history.passing_fingerprints(env, plan.fingerprints.values())
+    for name, info in test_files.items():
+        if plan.fingerprints.get(name) in unchanged:
+            plan.skipped.append(build_skipped_result(name, sqls[name], SKIP_REASON, info["subfolder"]))
+        else:
+            plan.to_run[name] = info
+    return plan
@@ -4,16 +4,100 @@ import os
 import xml.etree.ElementTree as ET
 from collections.abc import Iterable
 from datetime import datetime
+from typing import BinaryIO
+from xml.sax.saxutils import quoteattr
 
 from echosphere.core.test_result import TestResult
 
+DEFAULT_SUITE_NAME = "EchoSphere SQL Tests"
+DEFAULT_CLASSNAME = "echosphere.sql_tests"
+# Bytes reserved in a streamed ``testsuite`` start tag for the totals, which change with every test case
+_TOTALS_WIDTH = 192
+_STREAM_HEAD = b"<?xml version='1.0' encoding='utf-8'?>\n<testsuites>\n"
+_STREAM_TAIL = b"</testsuite>\n</testsuites>\n"
+# Report files a split streaming report keeps open; the least recently written ones are closed and reopened on demand
+MAX_OPEN_FILES = 32
+
+
+def _prepare_path(path: str) -> str:
+    """
+    Return the absolute path of an XML report, adding the ``.xml`` extension and creating
+    missing directories.
+
+    :param path: Requested path.
+    :return: Absolute path to write to.
+    """
+    if not path.lower().endswith(".xml"):
+        # Ensure xml extension for clarity
+        path = f"{path}.xml"
+
+    abs_path = os.path.abspath(path)
+    dir_name = os.path.dirname(abs_path)
+    if dir_name and not os.path.exists(dir_name):
+        try:
+            os.makedirs(dir_name, exist_ok=True)
+        except OSError as e:
+            raise Exception(f"Failed to create directories for path '{abs_path}': {e}")
+    return abs_path
+
+
+def _testcase(r: TestResult, classname: str) -> ET.Element:
+    """
+    Build the ``testcase`` element of one result.
+
+    :param r: Result of the test.
+    :param classname: Classname of the test case.
+    :return: The ``testcase`` element.
+    """
+    tc = ET.Element(
+        "testcase",
+        attrib={
+            "name": r.name,
+            "classname": classname,
+            "time": f"{r.duration:.3f}",
+        },
+    )
+    if r.cached_at is not None:
+        # Mark results reused from the result cache, so CI reports show they did not execute
+        props = ET.SubElement(tc, "properties")
+        ET.SubElement(props, "property", attrib={"name": "cached", "value": "true"})
+        ET.SubElement(
+            props,
+            "property",
+            attrib={"name": "cached_at", "value": r.cached_at.replace(microsecond=0).isoformat()},
+        )
+    if r.skipped:
+        ET.SubElement(tc, "skipped", attrib={"message": r.skip_message or "Test skipped"})
+    elif r.error_message is not None:
+        # The test did not complete (e.g. timed out), so there is no result to judge
+        error = ET.SubElement(tc, "error", attrib={"message": r.error_message})
+        error.text = "\nSQL:\n" + r.sql + "\n"
+    elif not r.passed:
+        failure = ET.SubElement(
+            tc,
+            "failure",
+            attrib={
+                "message": r.failure_message or "Test failed",
+            },
+        )
+        # Detailed block (escaped by ElementTree)
+        details_lines = [
+            "SQL:",
+            r.sql,
+            "",
+            f"Execution time: {r.duration:.3f}s",
+            f"Row count: {r.row_count}",
+        ]
+        failure.text = "\n" + "\n".join(details_lines) + "\n"
+    return tc
+
 
 class JUnitXmlExporter:
     """
     Builds and writes JUnit XML results for EchoSphere test executions.
     """
 
-    def __init__(self, suite_name: str = "EchoSphere SQL Tests", classname: str = "echosphere.sql_tests") -> None:
+    def __init__(self, suite_name: str = DEFAULT_SUITE_NAME, classname: str = DEFAULT_CLASSNAME) -> None:
         """
         Initializes a test suite with a specified name and classname.
 
@@ -50,24 +134,48 @@ class JUnitXmlExporter:
         of the test cases, their execution times, and the results such as passed,
         failures, skipped, and errors.
 
+        Results of a run over several environments get one test suite per environment,
+        named and classed after the environment, so the same test appears once per suite.
+
         :return: An ElementTree object representing the complete XML tree for the
             test results.
         """
-        tests = len(self._results)
-        failures = sum(1 for r in self._results if not r.passed)
-        errors = 0
-        skipped = 0
-        total_time = round(sum(r.duration for r in self._results), 3) if self._results else 0.0
+        root = ET.Element("testsuites")
+        by_env: dict[str | None, list[TestResult]] = {}
+        for r in self._results:
+            by_env.setdefault(r.env, []).append(r)
+        if len(by_env) > 1:
+            for env, results in by_env.items():
+                suffix = env or "default"
+                self._add_suite(root, f"{self.suite_name} [{suffix}]", f"{self.classname}.{suffix}", results)
+        else:
+            self._add_suite(root, self.suite_name, self.classname, self._results)
+        return ET.ElementTree(root)
+
+    @staticmethod
+    def _add_suite(root: ET.Element, suite_name: str, classname: str, results: list[TestResult]) -> None:
+        """
+        Append one ``testsuite`` element with a ``testcase`` per result to ``root``.
+
+        :param root: The ``testsuites`` element.
+        :param suite_name: Name of the test suite.
+        :param classname: Classname of its test cases.
+        :param results: Results of the suite.
+        """
+        tests = len(results)
+        failures = sum(1 for r in results if r.status == "fail")
+        errors = sum(1 for r in results if r.status == "error")
+        skipped = sum(1 for r in results if r.skipped)
+        total_time = round(sum(r.duration for r in results), 3) if results else 0.0
         # Use the timestamp of the first test, or now if none
-        suite_timestamp_dt: datetime = self._results[0].timestamp if self._results else datetime.now()
+        suite_timestamp_dt: datetime = results[0].timestamp if results else datetime.now()
         suite_timestamp = suite_timestamp_dt.replace(microsecond=0).isoformat()
 
-        root = ET.Element("testsuites")
         suite = ET.SubElement(
             root,
             "testsuite",
             attrib={
-                "name": self.suite_name,
+                "name": suite_name,
                 "tests": str(tests),
                 "failures": str(failures),
                 "errors": str(errors),
@@ -77,35 +185,8 @@ class JUnitXmlExporter:
             },
         )
 
-        for r in self._results:
-            tc = ET.SubElement(
-                suite,
-                "testcase",
-                attrib={
-                    "name": r.name,
-                    "classname": self.classname,
-                    "time": f"{r.duration:.3f}",
-                },
-            )
-            if not r.passed:
-                failure = ET.SubElement(
-                    tc,
-                    "failure",
-                    attrib={
-                        "message": r.failure_message or "Test failed",
-                    },
-                )
-                # Detailed block (escaped by ElementTree)
-                details_lines = [
-                    "SQL:",
-                    r.sql,
-                    "",
-                    f"Execution time: {r.duration:.3f}s",
-                    f"Row count: {r.row_count}",
-                ]
-                failure.text = "\n" + "\n".join(details_lines) + "\n"
-
-        return ET.ElementTree(root)
+        for r in results:
+            suite.append(_testcase(r, classname))
 
     def write_to_file(self, path: str) -> str:
         """
@@ -115,17 +196,7 @@ class JUnitXmlExporter:
         :param path: Path to the output xml file.
         :return: The absolute path to the written file.
         """
-        if not path.lower().endswith(".xml"):
-            # Ensure xml extension for clarity
-            path = f"{path}.xml"
-
-        abs_path = os.path.abspath(path)
-        dir_name = os.path.dirname(abs_path)
-        if dir_name and not os.path.exists(dir_name):
-            try:
-                os.makedirs(dir_name, exist_ok=True)
-            except OSError as e:
-                raise Exception(f"Failed to create directories for path '{abs_path}': {e}")
+        abs_path = _prepare_path(path)
 
         tree = self._build_xml_tree()
         try:
@@ -134,3 +205,191 @@ class JUnitXmlExporter:
             raise Exception(f"Failed to write JUnit XML file to '{abs_path}': {e}")
 
         return abs_path
+
+
+class _StreamedSuite:
+    """
+    One JUnit XML file with a single test suite that stays well-formed after every test case.
+
+    Each test case overwrites the closing tags at the end of the file and writes them
+    again after itself, in one write. The totals live in space padding reserved in the
+    ``testsuite`` start tag and are rewritten in place, so they always match the test
+    cases written so far. The file can be released between writes; the next test case
+    reopens it.
+    """
+
+    def __init__(self, path: str, suite_name: str, classname: str) -> None:
+        """
+        Create the file with an empty test suite.
+
+        :param path: Absolute path of the file.
+        :param suite_name: Name of the test suite.
+        :param classname: Classname of its test cases.
+        """
+        self.path = path
+        self.classname = classname
+        self.tests = 0
+        self.failures = 0
+        self.errors = 0
+        self.skipped = 0
+        self.time = 0.0
+        self.timestamp = datetime.now().replace(microsecond=0).isoformat()
+        start = _STREAM_HEAD + f"<testsuite name={quoteattr(suite_name)} ".encode()
+        try:
+            # Unbuffered: every write reaches the file at once, so a killed run leaves a complete document
+            self._file: BinaryIO | None = open(path, "wb", buffering=0)
+            self._file.write(start + self._totals() + b">\n")
+            self._end = self._file.tell()
+            self._file.write(_STREAM_TAIL)
+        except OSError as e:
+            raise Exception(f"Failed to write JUnit XML file to '{path}': {e}")
+        self._totals_at = len(start)
+
+    def _totals(self) -> bytes:
+        """Return the totals attributes, padded to the reserved width."""
+        totals = (
+            f'tests="{self.tests}" failures="{self.failures}" errors="{self.errors}" '
+            f'skipped="{self.skipped}" time="{self.time:.3f}" timestamp="{self.timestamp}"'
+        )
+        return totals.ljust(_TOTALS_WIDTH).encode()
+
+    def append(self, r: TestResult) -> None:
+        """
+        Append the test case of one result and update the totals.
+
+        :param r: Result of the test.
+        """
+        if not self.tests:
+            self.timestamp = r.timestamp.replace(microsecond=0).isoformat()
+        self.tests += 1
+        self.failures += r.status == "fail"
+        self.errors += r.status == "error"
+        self.skipped += r.skipped
+        self.time += r.duration
+        case = b"  " + ET.tostring(_testcase(r, self.classname), encoding="utf-8") + b"\n"
+        try:
+            if self._file is None:
+                self._file = open(self.path, "r+b", buffering=0)
+            self._file.seek(self._end)
+            self._file.write(case + _STREAM_TAIL)
+            self._end += len(case)
+            self._file.seek(self._totals_at)
+            self._file.write(self._totals())
+        except OSError as e:
+            raise Exception(f"Failed to write JUnit XML file to '{self.path}': {e}")
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the file is currently open."""
+        return self._file is not None
+
+    def close(self) -> None:
+        """Close the file; a later ``append`` reopens it."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class StreamingJUnitWriter:
+    """
+    Writes JUnit XML while a run is in progress: every result is appended as a ``testcase``
+    as soon as it is added, and the suite totals are kept up to date in place.
+
+    The file is a complete JUnit document after every test case, so a run killed by a CI
+    timeout still leaves a valid report of the tests that finished. ``{subsuite}`` and
+    ``{env}`` in the path split the report into one file (and test suite) per subsuite
+    and per environment; without them all results go to one test suite. At most
+    ``MAX_OPEN_FILES`` of the split files are open at a time.
+    """
+
+    def __init__(self, path: str, suite_name: str = DEFAULT_SUITE_NAME, classname: str = DEFAULT_CLASSNAME) -> None:
+        """
+        Initialize the writer; the report file is created at once unless the path is split.
+
+        :param path: Path of the XML file, optionally with ``{subsuite}`` and ``{env}`` placeholders.
+        :param suite_name: Name of the test suite.
+        :param classname: Classname of the test cases.
+        """
+        self.path = path
+        self.suite_name = suite_name
+        self.classname = classname
+        self.split_subsuite = "{subsuite}" in path
+        self.split_env = "{env}" in path
+        self._suites: dict[tuple[str | None, str | None], _StreamedSuite] = {}
+        # Open suites, least recently written first
+        self._open: dict[tuple[str | None, str | None], _StreamedSuite] = {}
+        self.error: str | None = None
+        if not (self.split_subsuite or self.split_env):
+            # Even a run killed before its first result leaves an (empty) report
+            self._suite(None, None)
+
+    @property
+    def paths(self) -> list[str]:
+        """Absolute paths of the files written so far."""
+        return [suite.path for suite in self._suites.values()]
+
+    def _suite(self, env: str | None, subsuite: str | None) -> _StreamedSuite:
+        """Return the streamed suite of a partition, creating its file on first use."""
+        key = (env if self.split_env else None, subsuite if self.split_subsuite else None)
+        suite = self._suites.get(key)
+        if suite is None:
+            path, suite_name, classname = self.path, self.suite_name, self.classname
+            if self.split_env:
+                env_part = env or "default"
+                path = path.replace("{env}", env_part)
+                suite_name = f"{suite_name} [{env_part}]"
+                classname = f"{classname}.{env_part}"
+            if self.split_subsuite:
+                # Nested subsuites map to dotted names, which are flat file names and JUnit packages
+                subsuite_part = subsuite.replace("/", ".") if subsuite else "_root"
+                path = path.replace("{subsuite}", subsuite_part)
+                suite_name = f"{suite_name} ({subsuite or 'root'})"
+                classname = f"{classname}.{subsuite_part}"
+            suite = self._suites[key] = _StreamedSuite(_prepare_path(path), suite_name, classname)
+        self._open.pop(key, None)
+        self._open[key] = suite
+        while len(self._open) > MAX_OPEN_FILES:
+            self._open.pop(next(iter(self._open))).close()
+        return suite
+
+    def add_result(self, result: TestResult) -> None:
+        """
+        Append a result to the report. A write error does not interrupt the run: it is kept
+        in ``error`` and later results are no longer written.
+
+        :param result: The ``TestResult`` to append.
+        """
+        if self.error is not None:
+            return
+        try:
+            self._suite(result.env, result.subsuite).append(result)
+        except Exception as e:
+            self.error = str(e)
+
+    def add_results(self, results: Iterable[TestResult]) -> None:
+        """
+        Append multiple results to the report.
+
+        :param results: An iterable of `TestResult` objects.
+        """
+        for r in results:
+            self.add_result(r)
+
+    def close(self) -> list[str]:
+        """
+        Close all report files.
+
+        :return: Absolute paths of the written files.
+        """
+        for suite in self._suites.values():
+            suite.close()
+        self._open.clear()
+        return self.paths
+
+    def __enter__(self) -> StreamingJUnitWriter:
+        """Return the writer."""
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        """Close the writer."""
+        self.close()
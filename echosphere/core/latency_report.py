@@ -0,0 +1,143 @@
+"""
+Latency regression report built from the run history.
+
+A run is compared with a baseline (the previous N runs, or the latest run recorded
+with a tag). Each test's baseline duration is the median of its durations in the
+baseline runs. A test regresses when it became slower by more than a ratio and
+by more than an absolute number of seconds, so millisecond-level noise on fast
+tests is not flagged.
+"""
+
+from __future__ import annotations
+
+import math
+import statistics
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+
+DEFAULT_MAX_RATIO = 2.0
+DEFAULT_MIN_DELTA = 1.0
+ROOT_SUBSUITE = "(root)"
+
+
+@dataclass(frozen=True, slots=True)
+class TestLatency:
+    """Current and baseline duration of one test."""
+
+    name: str
+    subsuite: str | None
+    current: float
+    baseline: float | None
+
+    @property
+    def ratio(self) -> float | None:
+        """Current duration divided by the baseline, or None without a usable baseline."""
+        if self.baseline is None:
+            return None
+        if self.baseline <= 0:
+            return math.inf if self.current > 0 else 1.0
+        return self.current / self.baseline
+
+
+@dataclass(frozen=True, slots=True)
+class SubsuiteLatency:
+    """Duration distribution of one subsuite in the current run and in the baseline."""
+
+    subsuite: str
+    tests: int
+    p50: float
+    p95: float
+    baseline_p50: float | None
+    baseline_p95: float | None
+
+
+@dataclass(slots=True)
+class LatencyReport:
+    """Result of comparing a run with its baseline."""
+
+    run_id: int
+    baseline_run_ids: list[int]
+    tests: list[TestLatency] = field(default_factory=list)
+    subsuites: list[SubsuiteLatency] = field(default_factory=list)
+    regressions: list[TestLatency] = field(default_factory=list)
+
+    @property
+    def failed(self) -> bool:
+        """True if at least one test regressed."""
+        return bool(self.regressions)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    Return the q-th percentile of `values` with linear interpolation between closest ranks.
+
+    :param values: Non-empty sequence of numbers.
+    :param q: Percentile between 0 and 100.
+    :return: The interpolated percentile.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        raise ValueError("percentile() requires at least one value")
+    pos = (len(ordered) - 1) * q / 100
+    lower = math.floor(pos)
+    upper = math.ceil(pos)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def build_latency_report(
+    run_id: int,
+    current: Mapping[str, tuple[str | None, list[float]]],
+    baseline_run_ids: list[int],
+    baseline: Mapping[str, tuple[str | None, list[float]]],
+    *,
+    max_ratio: float = DEFAULT_MAX_RATIO,
+    min_delta: float = DEFAULT_MIN_DELTA,
+) -> LatencyReport:
+    """
+    Compare the durations of a run with its baseline.
+
+    :param run_id: Id of the run under test.
+    :param current: Durations of that run, as returned by `DurationHistory.run_durations`.
+    :param baseline_run_ids: Ids of the baseline runs.
+    :param baseline: Durations of the baseline runs, as returned by `DurationHistory.run_durations`.
+    :param max_ratio: Minimum current / baseline ratio for a regression.
+    :param min_delta: Minimum current - baseline difference in seconds for a regression.
+    :return: The LatencyReport.
+    """
+    report = LatencyReport(run_id=run_id, baseline_run_ids=baseline_run_ids)
+    for name, (subsuite, durations) in sorted(current.items()):
+        base = baseline.get(name)
+        test = TestLatency(
+            name=name,
+            subsuite=subsuite,
+            current=statistics.median(durations),
+            baseline=statistics.median(base[1]) if base else None,
+        )
+        report.tests.append(test)
+        ratio = test.ratio
+        if (
+            test.baseline is not None
+            and ratio is not None
+            and ratio > max_ratio
+            and test.current - test.baseline > min_delta
+        ):
+            report.regressions.append(test)
+    report.regressions.sort(key=lambda t: t.ratio or 0.0, reverse=True)
+
+    by_subsuite: dict[str, list[TestLatency]] = {}
+    for test in report.tests:
+        by_subsuite.setdefault(test.subsuite or ROOT_SUBSUITE, []).append(test)
+    for subsuite, tests in sorted(by_subsuite.items()):
+        currents = [t.current for t in tests]
+        baselines = [t.baseline for t in tests if t.baseline is not None]
+        report.subsuites.append(
+            SubsuiteLatency(
+                subsuite=subsuite,
+                tests=len(tests),
+                p50=percentile(currents, 50),
+                p95=percentile(currents, 95),
+                baseline_p50=percentile(baselines, 50) if baselines else None,
+                baseline_p95=percentile(baselines, 95) if baselines else None,
+            )
+        )
+    return report
@@ -0,0 +1,262 @@
+"""
+Progress reporting for `es run`.
+
+With thousands of tests, printing every outcome as it is built costs terminal
+rendering time on the event loop and produces interleaved output. A `RunReporter`
+instead receives test events through a queue: the engine only enqueues them, and
+a single reporter thread renders them.
+
+Modes:
+
+- `live`: a progress view redrawn at most every `refresh_interval` seconds with the
+  counts so far, the tests in flight, the slowest running test and an estimated time
+  left. Failures and errors are printed above it as they happen.
+- `ci`: no progress view; only failures and errors are printed, one line each, so CI
+  logs stay short.
+- `plain`: every outcome is printed as it is built, as before.
+- `auto`: `live` on a terminal, `ci` otherwise.
+
+`subsuite_summary` renders the outcome per subsuite at the end of the run.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from rich.console import Console
+from rich.live import Live
+from rich.table import Table
+from rich.text import Text
+
+from echosphere.core import run_async_tests
+from echosphere.core.test_result import TestResult
+
+PROGRESS_MODES = ("auto", "live", "ci", "plain")
+DEFAULT_REFRESH_INTERVAL = 0.25  # seconds
+ROOT_SUBSUITE = "(root)"
+
+# Event kinds on the reporter queue
+_STARTED = "started"
+_FINISHED = "finished"
+_STOP = "stop"
+
+
+def _format_seconds(seconds: float) -> str:
+    """Format a duration as e.g. `42s`, `3m05s` or `1h02m`."""
+    seconds = max(0, int(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+def _display_name(name: str, env: str | None, show_env: bool) -> str:
+    """Return the name a test is shown with."""
+    return f"{name} [{env}]" if show_env else name
+
+
+class RunReporter:
+    """
+    Renders the progress of a run from a queue of test events on its own thread.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        mode: str = "auto",
+        *,
+        console: Console | None = None,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+        show_env: bool = False,
+    ) -> None:
+        """
+        Initialize the reporter.
+
+        :param total: Number of tests the run will execute.
+        :param mode: One of `PROGRESS_MODES`.
+        :param console: Console to render to (default: a new one on stdout).
+        :param refresh_interval: Minimum seconds between two redraws of the live view.
+        :param show_env: If True, the environment is shown next to each test name.
+        """
+        if mode not in PROGRESS_MODES:
+            raise ValueError(f"Unknown progress mode '{mode}'. Use one of: {', '.join(PROGRESS_MODES)}.")
+        self.console = console or Console()
+        if mode == "auto":
+            mode = "live" if self.console.is_terminal else "ci"
+        self.mode = mode
+        self.total = total
+        self.refresh_interval = refresh_interval
+        self.show_env = show_env
+        self.counts = {"pass": 0, "fail": 0, "error": 0, "skip": 0}
+        self._running: dict[tuple[str | None, str], float] = {}
+        self._queue: queue.SimpleQueue[tuple[str, Any, float]] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._started_at = time.monotonic()
+
+    @property
+    def finished(self) -> int:
+        """Number of tests with an outcome so far."""
+        return sum(self.counts.values())
+
+    def start(self) -> None:
+        """Start rendering; in every mode but `plain`, per-test messages are turned off until `close`."""
+        self._started_at = time.monotonic()
+        if self.mode == "plain":
+            return
+        run_async_tests.set_result_messages(False)
+        self._thread = threading.Thread(target=self._consume, name="es-reporter", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Render the remaining events, stop the reporter thread and turn per-test messages back on."""
+        if self._thread is None:
+            return
+        self._queue.put((_STOP, None, time.monotonic()))
+        self._thread.join()
+        self._thread = None
+        run_async_tests.set_result_messages(True)
+
+    def __enter__(self) -> RunReporter:
+        """Start the reporter."""
+        self.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        """Close the reporter."""
+        self.close()
+
+    def test_started(self, name: str, env: str | None = None) -> None:
+        """
+        Record that a test started executing; matches the engine's `on_start` callback.
+
+        :param name: Test name.
+        :param env: Environment the test runs against.
+        """
+        if self._thread is not None:
+            self._queue.put((_STARTED, (env, name), time.monotonic()))
+
+    def test_finished(self, result: TestResult) -> None:
+        """
+        Record the outcome of a test; matches the engine's `on_result` callback.
+
+        :param result: Result of the test.
+        """
+        if self._thread is not None:
+            self._queue.put((_FINISHED, result, time.monotonic()))
+
+    def _consume(self) -> None:
+        """Apply queued events and redraw at most every `refresh_interval` seconds."""
+        live = (
+            Live(self._render(), console=self.console, auto_refresh=False, transient=True)
+            if self.mode == "live"
+            else None
+        )
+        if live is not None:
+            live.start()
+        last_render = 0.0
+        try:
+            stopping = False
+            while not stopping:
+                try:
+                    event: tuple[str, Any, float] | None = self._queue.get(timeout=self.refresh_interval)
+                except queue.Empty:
+                    event = None
+                # Apply everything queued before redrawing once
+                while event is not None:
+                    if event[0] == _STOP:
+                        stopping = True
+                        break
+                    self._apply(event)
+                    try:
+                        event = self._queue.get_nowait()
+                    except queue.Empty:
+                        event = None
+                now = time.monotonic()
+                if live is not None and (stopping or now - last_render >= self.refresh_interval):
+                    live.update(self._render(), refresh=True)
+                    last_render = now
+        finally:
+            if live is not None:
+                live.stop()
+
+    def _apply(self, event: tuple[str, Any, float]) -> None:
+        """Update the counters with one event and print failures and errors."""
+        kind, payload, at = event
+        if kind == _STARTED:
+            self._running[payload] = at
+            return
+        result: TestResult = payload
+        self._running.pop((result.env, result.name), None)
+        self.counts[result.status] += 1
+        if result.status in ("fail", "error"):
+            self.console.print(self._outcome_line(result), highlight=False)
+
+    def _outcome_line(self, result: TestResult) -> Text:
+        """Return the one-line report of a failed or errored test."""
+        name = _display_name(result.name, result.env, self.show_env)
+        if result.status == "error":
+            return Text.assemble(
+                ("ERROR ", "bold magenta"), name, f" ({result.duration:.2f}s) ", (result.error_message or "", "magenta")
+            )
+        detail = f"{result.row_count} row(s)" + (" (cached)" if result.cached else "")
+        return Text.assemble(("FAIL  ", "bold red"), name, f" ({result.duration:.2f}s) ", (detail, "red"))
+
+    def _render(self) -> Text:
+        """Return the live progress view."""
+        now = time.monotonic()
+        done = self.finished
+        elapsed = now - self._started_at
+        line = Text.assemble(
+            ("Tests ", "bold"),
+            f"{done}/{self.total}  ",
+            (f"{self.counts['pass']} passed", "green"),
+            "  ",
+            (f"{self.counts['fail']} failed", "red"),
+            "  ",
+            (f"{self.counts['error']} errors", "magenta"),
+            "  ",
+            (f"{self.counts['skip']} skipped", "yellow"),
+            f"  |  {len(self._running)} running",
+        )
+        if self._running:
+            (env, name), since = min(self._running.items(), key=lambda item: item[1])
+            line.append(f"  |  slowest: {_display_name(name, env, self.show_env)} ({_format_seconds(now - since)})")
+        if 0 < done < self.total:
+            line.append(f"  |  ETA {_format_seconds(elapsed / done * (self.total - done))}")
+        line.append(f"  |  {_format_seconds(elapsed)} elapsed", style="dim")
+        return line
+
+
+def subsuite_summary(results: Iterable[TestResult]) -> Table:
+    """
+    Return a table with the outcome of the run per subsuite.
+
+    :param results: Results of the run.
+    :return: Table with one row per subsuite (tests in the suite root as `(root)`), sorted by name.
+    """
+    rows: dict[str, list[float]] = {}
+    for r in results:
+        row = rows.setdefault(r.subsuite or ROOT_SUBSUITE, [0, 0, 0, 0, 0, 0.0])
+        row[0] += 1
+        row[1 + ("pass", "fail", "error", "skip").index(r.status)] += 1
+        row[5] += r.duration
+
+    table = Table(title="Results by Subsuite")
+    table.add_column("Subsuite")
+    for column in ("Tests", "Passed", "Failed", "Errors", "Skipped", "Time"):
+        table.add_column(column, justify="right")
+    for subsuite in sorted(rows):
+        tests, passed, failed, errors, skipped, duration = rows[subsuite]
+        style = "red" if failed or errors else None
+        table.add_row(
+            subsuite,
+            *(str(int(v)) for v in (tests, passed, failed, errors, skipped)),
+            f"{duration:.1f}s",
+            style=style,
+        )
+    return table
@@ -0,0 +1,190 @@
+"""
+On-disk result cache for `es run`.
+
+While iterating on a subsuite, the same test SQL is often executed against the same
+environment many times in a row. The cache stores the row count (and, for failing
+tests, the captured failure sample) of each executed test in a SQLite file next to
+`es.ini`, keyed by the normalized SQL and the resolved environment name. A later
+run within the time-to-live reuses the stored result instead of querying the
+database.
+
+Entries expire after `cache_ttl` seconds; the file is kept below `cache_max_mb`
+by evicting the least recently used entries. Failure samples are stored as JSON,
+so values without a JSON representation (dates, decimals) are read back as text.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from echosphere.core.test_result import TestResult
+from echosphere.utils.sql_tables import normalize_sql
+
+CACHE_FILE = ".es_cache.sqlite"
+DEFAULT_CACHE_TTL = 300  # seconds
+DEFAULT_CACHE_MAX_MB = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key         TEXT PRIMARY KEY,
+    row_count   INTEGER NOT NULL,
+    duration    REAL NOT NULL,
+    created_at  REAL NOT NULL,
+    last_used   REAL NOT NULL,
+    columns     TEXT,
+    rows        TEXT,
+    size        INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used);
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResult:
+    """Outcome of an earlier execution of a test query."""
+
+    row_count: int
+    duration: float
+    cached_at: datetime
+    failure_columns: list[str] | None = None
+    failure_rows: list[list[Any]] | None = None
+
+
+def default_cache_path(ini_path: str = "es.ini") -> str:
+    """
+    Return the path of the result cache that sits next to the given es.ini.
+
+    :param ini_path: Path to es.ini.
+    :return: Path of the SQLite cache file.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(ini_path)), CACHE_FILE)
+
+
+def cache_key(env: str, sql: str) -> str:
+    """
+    Return the cache key of a test query in an environment.
+
+    :param env: Resolved environment name.
+    :param sql: Test SQL; formatting and comments do not change the key.
+    :return: Hex digest identifying the query in the environment.
+    """
+    return hashlib.sha256(f"{env}\0{normalize_sql(sql)}".encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite-backed cache of test results with a time-to-live and LRU eviction.
+    """
+
+    def __init__(
+        self, path: str | None = None, ttl: float = DEFAULT_CACHE_TTL, max_mb: float = DEFAULT_CACHE_MAX_MB
+    ) -> None:
+        """
+        Open (and if needed create) the cache database.
+
+        :param path: Database file; defaults to `.es_cache.sqlite` next to es.ini.
+        :param ttl: Seconds an entry stays valid.
+        :param max_mb: Upper bound for the stored entries in megabytes.
+        """
+        self.path = path or default_cache_path()
+        self.ttl = ttl
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._conn = sqlite3.connect(self.path, timeout=30)
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Evict expired and least recently used entries, then close the database connection."""
+        try:
+            self.prune()
+        finally:
+            self._conn.close()
+
+    def __enter__(self) -> ResultCache:
+        """Return the cache itself."""
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        """Close the cache."""
+        self.close()
+
+    def get(self, env: str, sql: str, need_sample: bool = False) -> CachedResult | None:
+        """
+        Return the cached result of a query, or None if there is no valid entry.
+
+        :param env: Resolved environment name.
+        :param sql: Test SQL.
+        :param need_sample: If True, entries of failing tests stored without a failure sample are ignored.
+        :return: CachedResult or None.
+        """
+        key = cache_key(env, sql)
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT row_count, duration, created_at, columns, rows FROM results WHERE key = ? AND created_at > ?",
+            (key, now - self.ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        row_count, duration, created_at, columns, rows = row
+        if need_sample and row_count and columns is None:
+            return None
+        with self._conn:
+            self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+        return CachedResult(
+            row_count=int(row_count),
+            duration=float(duration),
+            cached_at=datetime.fromtimestamp(created_at),
+            failure_columns=json.loads(columns) if columns is not None else None,
+            failure_rows=json.loads(rows) if rows is not None else None,
+        )
+
+    def put(self, env: str, sql: str, result: TestResult) -> None:
+        """
+        Store the result of an executed test, replacing any previous entry for the query.
+
+        :param env: Resolved environment name.
+        :param sql: Test SQL.
+        :param result: Result of the execution.
+        """
+        columns = rows = None
+        if result.failure_columns is not None:
+            columns = json.dumps(result.failure_columns)
+            rows = json.dumps([list(r) for r in result.iter_failure_rows()], default=str)
+        key = cache_key(env, sql)
+        size = len(key) + len(columns or "") + len(rows or "")
+        now = time.time()
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, row_count, duration, created_at, last_used, columns, rows, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, result.row_count, float(result.duration), now, now, columns, rows, size),
+            )
+
+    def prune(self) -> int:
+        """
+        Delete expired entries, then the least recently used ones until the cache fits its size bound.
+
+        :return: Number of deleted entries.
+        """
+        with self._conn:
+            deleted = self._conn.execute(
+                "DELETE FROM results WHERE created_at <= ?", (time.time() - self.ttl,)
+            ).rowcount
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total <= self.max_bytes:
+                return deleted
+            # Walk from the most recently used entry and drop everything past the size bound
+            kept = 0
+            evict: list[tuple[str]] = []
+            for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY last_used DESC"):
+                kept += size
+                if kept > self.max_bytes:
+                    evict.append((key,))
+            self._conn.executemany("DELETE FROM results WHERE key = ?", evict)
+        return deleted + len(evict)
@@ -1,59 +1,94 @@
+from __future__ import annotations
+
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Sequence
+from typing import TYPE_CHECKING, Sequence
 
 from rich import print
 
 from echosphere.core.db_runner import get_db_runner
+from echosphere.core.db_runner.BaseClass import DEFAULT_SAMPLE_ROWS, RunnerType
 from echosphere.core.platforms import PlatformEnum
+from echosphere.core.result_cache import CachedResult
 from echosphere.core.test_result import TestResult
 from echosphere.env_config_parser.PlatformExtractor import PlatformExtractor
 
+if TYPE_CHECKING:
+    import pyarrow as pa
+
 FAILED_TEST_MESSAGE = "{test_name}...[red bold]Failed[/red bold] [yellow bold]{execution_time}s[/yellow bold][red]\n{sql}\nMore than zero rows ({row_count}) detected.[/red]"
 SUCCESS_TEST_MESSAGE = "{test_name}...[green bold]Passed[/green bold] [yellow bold]{execution_time}s[/yellow bold]"
+CACHED_FAILED_TEST_MESSAGE = "{test_name}...[red bold]Failed[/red bold] [cyan bold]cached {age}s ago[/cyan bold][red]\n{sql}\nMore than zero rows ({row_count}) detected.[/red]"
+CACHED_SUCCESS_TEST_MESSAGE = "{test_name}...[green bold]Passed[/green bold] [cyan bold]cached {age}s ago[/cyan bold]"
+ERROR_TEST_MESSAGE = "{test_name}...[magenta bold]Error[/magenta bold] [yellow bold]{execution_time}s[/yellow bold] [magenta]{message}[/magenta]"
+SKIPPED_TEST_MESSAGE = "{test_name}...[yellow bold]Skipped[/yellow bold] [dim]{reason}[/dim]"
 
+# Whether every test outcome is printed as it is built; a progress reporter that renders
+# outcomes itself turns this off (see `echosphere.core.reporter`). Tasks and worker threads
+# started afterwards inherit the setting with the context.
+_RESULT_MESSAGES: ContextVar[bool] = ContextVar("es_result_messages", default=True)
 
-def run_async_test_and_poll(
-    test_name: str, test_file_path: str, env: str | None, capture_failure_data: bool = False
-) -> TestResult:
+
+def set_result_messages(enabled: bool) -> None:
     """
-    Run a single SQL test asynchronously on the configured platform and evaluate its result.
+    Turn the per-test messages printed by the `build_*` functions on or off.
 
-    A test is considered successful when the executed query returns zero rows.
+    :param enabled: If False, outcomes are built silently.
+    :return: None
+    """
+    _RESULT_MESSAGES.set(enabled)
+
+
+def _emit(message: str) -> None:
+    """Print a per-test message unless per-test messages are turned off."""
+    if _RESULT_MESSAGES.get():
+        print(message)
+
+
+def resolve_runner(env: str | None) -> RunnerType:
+    """
+    Return the runner class for the platform configured for `env` in es.ini.
 
-    :param test_name: Human-friendly identifier of the test (used for output).
-    :param test_file_path: Full path to the SQL file to execute.
     :param env: Optional environment/agent name from es.ini; if None, default is used.
-    :param capture_failure_data: If True, fetch up to 1000 rows and columns when the test fails.
-    :return: TestResult with pass/fail and details.
+    :return: The BaseRunner subclass for the configured platform.
     """
     platform_name = PlatformExtractor.extract_platform_info(env_name=env)
-    if platform_name not in PlatformEnum:
+    if platform_name not in {p.value for p in PlatformEnum}:
         raise Exception(f"Unsupported platform name found in .ini file. Should be one of: [{','.join(PlatformEnum)}]")
+    return get_db_runner(platform_name)
+
+
+def build_test_result(
+    test_name: str,
+    row_count: int,
+    execution_time: float,
+    sql: str,
+    *,
+    failure_columns: list[str] | None = None,
+    failure_rows: list[Sequence[object]] | None = None,
+    failure_table: pa.Table | None = None,
+) -> TestResult:
+    """
+    Evaluate a dispatched test, print its outcome and return the TestResult.
 
-    runner = get_db_runner(platform_name)
-    row_count, execution_time, sql = runner.dispatch_test(env=env, test_file_path=test_file_path)
+    A test is considered successful when the executed query returns zero rows.
 
+    :param test_name: Human-friendly identifier of the test (used for output).
+    :param row_count: Number of rows returned by the test query.
+    :param execution_time: Query execution time in seconds.
+    :param sql: SQL text of the test.
+    :param failure_columns: Optional column names of the captured failure sample.
+    :param failure_rows: Optional rows of the captured failure sample.
+    :param failure_table: Optional failure sample as an Arrow table, instead of `failure_rows`.
+    :return: TestResult with pass/fail and details.
+    """
     timestamp = datetime.now()
-    failed = bool(row_count)
 
-    if failed:
+    if row_count:
         error_msg = FAILED_TEST_MESSAGE.format(
             test_name=test_name, execution_time=execution_time, sql=sql, row_count=row_count
         )
-        print(error_msg)
-
-        failure_columns: list[str] | None = None
-        failure_rows: list[Sequence[object]] | None = None
-        if capture_failure_data:
-            try:
-                cols, rows = runner.fetch_failure_sample(env=env, sql=sql, limit=1000)
-                failure_columns = cols
-                # Ensure rows are a list of sequences
-                failure_rows = list(rows[:1000]) if rows else []
-            except Exception:
-                # Keep exporting flow robust; just record message
-                pass
-
+        _emit(error_msg)
         return TestResult(
             name=test_name,
             passed=False,
@@ -64,10 +99,11 @@ def run_async_test_and_poll(
             failure_message=f"Test returned {row_count} rows. Expected 0 rows.",
             failure_columns=failure_columns,
             failure_rows=failure_rows,
+            failure_table=failure_table,
         )
 
     success_message = SUCCESS_TEST_MESSAGE.format(test_name=test_name, execution_time=execution_time)
-    print(success_message)
+    _emit(success_message)
     return TestResult(
         name=test_name,
         passed=True,
@@ -77,3 +113,165 @@ def run_async_test_and_poll(
         timestamp=timestamp,
         failure_message=None,
     )
+
+
+def build_skipped_result(
+    test_name: str, sql: str, reason: str, subsuite: str | None = None, announce: bool = True
+) -> TestResult:
+    """
+    Print a skipped test and return its TestResult.
+
+    :param test_name: Human-friendly identifier of the test (used for output).
+    :param sql: SQL text of the test.
+    :param reason: Why the test was not executed.
+    :param subsuite: Subsuite of the test, if any.
+    :param announce: If False, the test is not printed (e.g. when a summary line covers many skipped tests).
+    :return: TestResult marked as skipped.
+    """
+    if announce:
+        _emit(SKIPPED_TEST_MESSAGE.format(test_name=test_name, reason=reason))
+    return TestResult(
+        name=test_name,
+        passed=True,
+        duration=0.0,
+        sql=sql,
+        row_count=0,
+        timestamp=datetime.now(),
+        subsuite=subsuite,
+        skipped=True,
+        skip_message=reason,
+    )
+
+
+def build_error_result(
+    test_name: str, sql: str, message: str, execution_time: float = 0.0, subsuite: str | None = None
+) -> TestResult:
+    """
+    Print a test that could not complete (e.g. it timed out) and return its TestResult.
+
+    :param test_name: Human-friendly identifier of the test (used for output).
+    :param sql: SQL text of the test.
+    :param message: What went wrong.
+    :param execution_time: Time spent on the test in seconds.
+    :param subsuite: Subsuite of the test, if any.
+    :return: TestResult marked as an error.
+    """
+    _emit(ERROR_TEST_MESSAGE.format(test_name=test_name, execution_time=execution_time, message=message))
+    return TestResult(
+        name=test_name,
+        passed=False,
+        duration=execution_time,
+        sql=sql,
+        row_count=0,
+        timestamp=datetime.now(),
+        subsuite=subsuite,
+        error_message=message,
+    )
+
+
+def build_cached_result(test_name: str, sql: str, cached: CachedResult) -> TestResult:
+    """
+    Print a result served from the result cache and return its TestResult.
+
+    The result takes no time in this run; `cached_at` records when the reused execution happened.
+
+    :param test_name: Human-friendly identifier of the test (used for output).
+    :param sql: SQL text of the test.
+    :param cached: The cache entry.
+    :return: TestResult marked as cached.
+    """
+    age = round((datetime.now() - cached.cached_at).total_seconds())
+    passed = not cached.row_count
+    if passed:
+        _emit(CACHED_SUCCESS_TEST_MESSAGE.format(test_name=test_name, age=age))
+    else:
+        _emit(CACHED_FAILED_TEST_MESSAGE.format(test_name=test_name, age=age, sql=sql, row_count=cached.row_count))
+    return TestResult(
+        name=test_name,
+        passed=passed,
+        duration=0.0,
+        sql=sql,
+        row_count=cached.row_count,
+        timestamp=datetime.now(),
+        failure_message=None if passed else f"Test returned {cached.row_count} rows. Expected 0 rows.",
+        cached_at=cached.cached_at,
+        failure_columns=cached.failure_columns,
+        failure_rows=list(cached.failure_rows) if cached.failure_rows is not None else None,
+    )
+
+
+def run_async_test_and_poll(
+    test_name: str,
+    test_file_path: str,
+    env: str | None,
+    capture_failure_data: bool = False,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+) -> TestResult:
+    """
+    Run a single SQL test asynchronously on the configured platform and evaluate its result.
+
+    A test is considered successful when the executed query returns zero rows.
+
+    :param test_name: Human-friendly identifier of the test (used for output).
+    :param test_file_path: Full path to the SQL file to execute.
+    :param env: Optional environment/agent name from es.ini; if None, default is used.
+    :param capture_failure_data: If True, fetch up to `sample_rows` rows and columns when the test fails.
+    :param sample_rows: Rows fetched for the failure sample.
+    :return: TestResult with pass/fail and details.
+    """
+    runner = resolve_runner(env)
+    if not capture_failure_data:
+        row_count, execution_time, sql = runner.dispatch_test(env=env, test_file_path=test_file_path)
+        return build_test_result(test_name, row_count, execution_time, sql)
+
+    # Count and sample come from the same execution; no second query for failing tests.
+    row_count, execution_time, sql, cols, rows = runner.dispatch_test_with_sample(
+        env=env, test_file_path=test_file_path, limit=sample_rows
+    )
+    return build_test_result(
+        test_name, row_count, execution_time, sql, failure_columns=cols, failure_rows=list(rows[:sample_rows])
+    )
+
+
+async def run_test_async(
+    test_name: str,
+    test_file_path: str,
+    env: str | None,
+    capture_failure_data: bool = False,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+) -> TestResult:
+    """
+    Coroutine variant of `run_async_test_and_poll` built on the async runner interface.
+
+    :param test_name: Human-friendly identifier of the test (used for output).
+    :param test_file_path: Full path to the SQL file to execute.
+    :param env: Optional environment/agent name from es.ini; if None, default is used.
+    :param capture_failure_data: If True, fetch up to `sample_rows` rows and columns when the test fails.
+    :param sample_rows: Rows fetched for the failure sample.
+    :return: TestResult with pass/fail and details.
+    """
+    runner = resolve_runner(env)
+    if not capture_failure_data:
+        row_count, execution_time, sql = await runner.dispatch_test_async(env=env, test_file_path=test_file_path)
+        return build_test_result(test_name, row_count, execution_time, sql)
+
+    if runner.supports_arrow():
+        # The sample stays an Arrow table; exporters build rows from it only when they write them
+        row_count, execution_time, sql, table = await runner.dispatch_test_with_arrow_sample_async(
+            env=env, test_file_path=test_file_path, limit=sample_rows
+        )
+        return build_test_result(
+            test_name,
+            row_count,
+            execution_time,
+            sql,
+            failure_columns=table.column_names if table is not None else [],
+            failure_table=table.slice(0, sample_rows) if table is not None else None,
+        )
+
+    row_count, execution_time, sql, cols, rows = await runner.dispatch_test_with_sample_async(
+        env=env, test_file_path=test_file_path, limit=sample_rows
+    )
+    return build_test_result(
+        test_name, row_count, execution_time, sql, failure_columns=cols, failure_rows=list(rows[:sample_rows])
+    )
@@ -0,0 +1,89 @@
+"""
+Duration-balanced sharding of a test suite across parallel CI jobs.
+
+`es run --shard i/N` runs one of N disjoint parts of the suite. Tests are assigned
+with the longest-processing-time rule: from the longest expected test to the
+shortest, each test goes to the shard with the smallest total so far. Expected
+durations come from the run history; tests without history count as the median
+duration, and without any history every test counts the same, which balances by
+file count.
+
+The partition only depends on the test names and the expectations, so every job
+computes the same assignment as long as all jobs see the same history (or none).
+"""
+
+from __future__ import annotations
+
+import heapq
+import re
+import statistics
+from collections.abc import Iterable, Mapping
+
+from echosphere.core.history import Expectation
+
+_SHARD = re.compile(r"^\s*(\d+)\s*/\s*(\d+)\s*$")
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """
+    Parse a `--shard` value.
+
+    :param value: Shard selector `i/N` with 1 <= i <= N.
+    :return: Tuple of (index, count), with a 1-based index.
+    :raises ValueError: If the value is malformed or out of range.
+    """
+    match = _SHARD.match(value)
+    if match is None:
+        raise ValueError(f"Invalid --shard value '{value}'. Use i/N, e.g. 2/4.")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid --shard value '{value}'. The index must be between 1 and N.")
+    return index, count
+
+
+def partition_tests(test_names: Iterable[str], expectations: Mapping[str, Expectation], count: int) -> list[list[str]]:
+    """
+    Split tests into `count` shards of about equal expected duration.
+
+    :param test_names: Names of all tests in the suite.
+    :param expectations: Expected durations from `DurationHistory.expectations` (may be empty).
+    :param count: Number of shards.
+    :return: List of `count` lists of test names, in the order the names were given.
+    """
+    names = list(test_names)
+    known = [expectations[n].duration for n in names if n in expectations]
+    # Without history every test weighs the same, which balances the shards by file count
+    unknown = statistics.median(known) if known else 1.0
+
+    def weight(name: str) -> float:
+        exp = expectations.get(name)
+        return exp.duration if exp is not None else unknown
+
+    # Sort by name first, so the assignment does not depend on discovery order
+    ordered = sorted(sorted(names), key=weight, reverse=True)
+    loads = [(0.0, shard) for shard in range(count)]
+    assigned: dict[str, int] = {}
+    for name in ordered:
+        load, shard = heapq.heappop(loads)
+        assigned[name] = shard
+        heapq.heappush(loads, (load + weight(name), shard))
+
+    shards: list[list[str]] = [[] for _ in range(count)]
+    for name in names:
+        shards[assigned[name]].append(name)
+    return shards
+
+
+def select_shard(
+    test_names: Iterable[str], expectations: Mapping[str, Expectation], index: int, count: int
+) -> list[str]:
+    """
+    Return the tests of one shard.
+
+    :param test_names: Names of all tests in the suite.
+    :param expectations: Expected durations from `DurationHistory.expectations` (may be empty).
+    :param index: 1-based shard index.
+    :param count: Number of shards.
+    :return: Names of the tests in shard `index`, in the order the names were given.
+    """
+    return partition_tests(test_names, expectations, count)[index - 1]
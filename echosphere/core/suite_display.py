@@ -12,7 +12,7 @@ from rich import print
 from rich.console import Console
 from rich.table import Table
 
-from echosphere.utils.sql_test_fetcher import get_sql_test_files
+from echosphere.utils.sql_test_fetcher import TestFileInfo, default_manifest_path, get_sql_test_files
 
 console = Console()
 
@@ -34,28 +34,27 @@ def display_no_tests_error() -> None:
     sys.exit(ERROR_EXIT_CODE)
 
 
-def display_test_names_table(subdir: str | None = None) -> None:
+def display_test_names_table(subdir: str | None = None, test_files: dict[str, TestFileInfo] | None = None) -> None:
     """
     Render a table of discovered test names.
 
-    The table lists the base names of `.es.sql` files. If a test resides in a
+    The table lists the qualified names of `.es.sql` files. If a test resides in a
     subsuite (subdirectory), the displayed name will be `subsuite/<test>`.
 
     :param subdir: Optional subsuite name. If provided, only tests within
                    this subsuite are shown. If None, shows all tests.
+    :param test_files: Already discovered tests to show instead of discovering them again.
     :return: None
     """
-    test_files = get_sql_test_files(subdir=subdir)
+    if test_files is None:
+        test_files = get_sql_test_files(subdir=subdir, manifest_path=default_manifest_path())
     if not test_files:
         display_no_tests_error()
         return
 
     table = Table(TABLE_TITLE)
-    for test_name, test_info in test_files.items():
-        display_name = test_name
-        if test_info["subfolder"]:
-            display_name = f"{test_info['subfolder']}/{test_name}"
-        table.add_row(display_name)
+    for test_name in test_files:
+        table.add_row(test_name)
 
     console.print(table)
 
@@ -68,21 +67,17 @@ def display_test_sql_code(test_identifier: str) -> None:
     """
     Print the SQL content for a given test identifier.
 
-    The identifier can be provided as either `<test_name>` or
-    `<subsuite>/<test_name>`. The test name is case-insensitive.
+    The identifier is the qualified name of the test: `<test_name>` in the suite
+    root or `<subsuite>/<test_name>`, where the subsuite may be nested
+    (`<subsuite>/<folder>/<test_name>`). The identifier is case-insensitive.
 
     :param test_identifier: Name of the test to display. May include an
                             optional subsuite prefix separated by `/`.
     :return: None
     """
-    subsuite: str | None = None
-    test_name = test_identifier
-    if "/" in test_identifier:
-        subsuite, test_name = test_identifier.split("/")
-
     # Get test files and normalize the test name
-    test_files = get_sql_test_files(subdir=subsuite)
-    normalized_name = test_name.lower()
+    test_files = get_sql_test_files(manifest_path=default_manifest_path())
+    normalized_name = test_identifier.lower()
 
     # Check if the test exists
     if normalized_name not in test_files:
@@ -1,8 +1,18 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from collections.abc import Iterator
+from dataclasses import dataclass, fields
 from datetime import datetime
-from typing import Optional, Sequence
+from typing import TYPE_CHECKING, Any, Optional, Sequence
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+    from echosphere.core.failure_spool import SampleRef
+
+_DATETIME_FIELDS = ("timestamp", "cached_at")
+# Fields referring to in-process data; `to_dict` sends their sample as `failure_rows`
+_LOCAL_FIELDS = ("failure_table", "failure_sample")
 
 
 @dataclass(slots=True)
@@ -18,11 +28,95 @@ class TestResult:
     row_count: int
     timestamp: datetime
     failure_message: Optional[str] = None
+    subsuite: Optional[str] = None
+    # Environment the test ran against; a run over several environments has one result per (env, name).
+    env: Optional[str] = None
+
+    # Set for tests that were not executed, e.g. unchanged inputs in an incremental run.
+    # Skipped tests keep passed=True, so they never fail a run.
+    skipped: bool = False
+    skip_message: Optional[str] = None
+
+    # Set for tests that did not complete, e.g. because they timed out; such tests have passed=False
+    # and are reported as errors rather than failures.
+    error_message: Optional[str] = None
 
-    # Optional data for failed tests export
+    # Set for results served from the result cache: when the reused execution happened.
+    cached_at: Optional[datetime] = None
+
+    # Optional data for failed tests export. Runners with an Arrow driver fill `failure_table`
+    # instead of `failure_rows`, and a `FailureSpool` replaces either by `failure_sample`;
+    # read the rows through `iter_failure_rows` to support all three.
     failure_columns: Optional[list[str]] = None
     failure_rows: Optional[list[Sequence[object]]] = None
+    failure_table: Optional[pa.Table] = None
+    failure_sample: Optional[SampleRef] = None
+
+    @property
+    def cached(self) -> bool:
+        return self.cached_at is not None
 
     @property
     def status(self) -> str:
+        if self.skipped:
+            return "skip"
+        if self.error_message is not None:
+            return "error"
         return "pass" if self.passed else "fail"
+
+    @property
+    def has_failure_sample(self) -> bool:
+        return self.failure_sample is not None or self.failure_table is not None or self.failure_rows is not None
+
+    @property
+    def sample_size(self) -> int:
+        """Number of rows in the failure sample."""
+        if self.failure_sample is not None:
+            return self.failure_sample.rows
+        if self.failure_table is not None:
+            return int(self.failure_table.num_rows)
+        return len(self.failure_rows or [])
+
+    def failure_arrow(self) -> pa.Table | None:
+        """Return the failure sample as an Arrow table if it was fetched as one, without converting rows."""
+        if self.failure_sample is not None and self.failure_sample.kind == "arrow":
+            return self.failure_sample.to_arrow()
+        return self.failure_table
+
+    def iter_failure_rows(self) -> Iterator[Sequence[Any]]:
+        """
+        Yield the rows of the failure sample.
+
+        A columnar sample is converted to tuples one record batch at a time, so Python
+        objects for its cells exist only while a consumer reads them.
+        """
+        if self.failure_sample is not None:
+            yield from self.failure_sample.iter_rows()
+        elif self.failure_table is not None:
+            for batch in self.failure_table.to_batches():
+                yield from zip(*(column.to_pylist() for column in batch.columns))
+        elif self.failure_rows is not None:
+            yield from self.failure_rows
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Return the result as a JSON-serializable dictionary, e.g. to send it to a coordinator.
+
+        Datetimes become ISO strings; failure sample values without a JSON type are converted by the caller's encoder.
+        """
+        data = {f.name: getattr(self, f.name) for f in fields(self) if f.name not in _LOCAL_FIELDS}
+        for name in _DATETIME_FIELDS:
+            if data[name] is not None:
+                data[name] = data[name].isoformat()
+        if self.has_failure_sample:
+            data["failure_rows"] = [list(row) for row in self.iter_failure_rows()]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> TestResult:
+        """Rebuild a result from `to_dict` output."""
+        values = dict(data)
+        for name in _DATETIME_FIELDS:
+            if values.get(name) is not None:
+                values[name] = datetime.fromisoformat(values[name])
+        return cls(**values)
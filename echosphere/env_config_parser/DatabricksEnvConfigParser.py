@@ -1,32 +1,37 @@
-from configparser import ConfigParser
+from __future__ import annotations
 
+from configparser import SectionProxy
+from dataclasses import dataclass
 
+from echosphere.env_config_parser.validation import require_options
+
+
+@dataclass(frozen=True, slots=True)
 class DatabricksAgentConfig:
-    """Load Databricks connection settings from es.ini for the selected environment."""
+    """Resolved, immutable Databricks connection settings of one `es.ini` environment."""
+
+    server_hostname: str
+    http_path: str
+    access_token: str
+
+    # Optional
+    catalog: str | None = None
+    schema: str | None = None
 
-    def __init__(self, env_name: str | None = None) -> None:
+    @classmethod
+    def from_section(cls, section: SectionProxy) -> DatabricksAgentConfig:
         """
-        Initialize configuration using the given env section or default.
+        Build the configuration from an `es.ini` environment section.
 
-        :param env_name: Environment section name; if None, use [default].env.
+        :param section: The environment section to read.
+        :return: The validated configuration.
+        :raises ConfigurationError: If required options are missing.
         """
-        config = ConfigParser()
-        config.read("es.ini")
-        section = config.get("default", "env") if not env_name else env_name
-        if not config.has_section(section):
-            raise Exception(f"Environment section '{section}' not found in es.ini")
-
-        required = ["server_hostname", "http_path", "access_token"]
-        missing = [k for k in required if not config.has_option(section, k)]
-        if missing:
-            raise Exception(
-                f"Missing required option(s) {missing} in section [{section}] of es.ini for Databricks configuration"
-            )
-
-        self.server_hostname: str = config.get(section, "server_hostname")
-        self.http_path: str = config.get(section, "http_path")
-        self.access_token: str = config.get(section, "access_token")
-
-        # Optional
-        self.catalog: str | None = config.get(section, "catalog", fallback=None)
-        self.schema: str | None = config.get(section, "schema", fallback=None)
+        require_options(section, ["server_hostname", "http_path", "access_token"], "Databricks")
+        return cls(
+            server_hostname=section["server_hostname"],
+            http_path=section["http_path"],
+            access_token=section["access_token"],
+            catalog=section.get("catalog", fallback=None),
+            schema=section.get("schema", fallback=None),
+        )
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections.abc import Iterable
+from configparser import ConfigParser
+from configparser import Error as ConfigParserError
+from dataclasses import dataclass
+from typing import TypeVar, Union
+
+from echosphere.env_config_parser.DatabricksEnvConfigParser import DatabricksAgentConfig
+from echosphere.env_config_parser.PostgresEnvConfigParser import PostgresAgentConfig
+from echosphere.env_config_parser.SnowflakeEnvConfigParser import SnowflakeAgentConfig
+from echosphere.env_config_parser.validation import ConfigurationError, read_typed_option
+
+INI_FILE = "es.ini"
+
+AgentConfig = Union[SnowflakeAgentConfig, PostgresAgentConfig, DatabricksAgentConfig]
+ConfigT = TypeVar("ConfigT", SnowflakeAgentConfig, PostgresAgentConfig, DatabricksAgentConfig)
+
+PLATFORM_CONFIGS: dict[str, type[AgentConfig]] = {
+    "snowflake": SnowflakeAgentConfig,
+    "postgres": PostgresAgentConfig,
+    "databricks": DatabricksAgentConfig,
+}
+
+# Runtime options that may be set per environment or in [default], with their value type
+RUNTIME_OPTIONS: dict[str, type] = {
+    "pool_size": int,
+    "max_concurrency": int,
+    "timeout": int,
+    "run_timeout": int,
+    "cache_ttl": int,
+    "cache_max_mb": int,
+    "sample_rows": int,
+    "sample_max_kb": int,
+    "spool_memory_mb": int,
+    **{f"max_concurrency.{platform}": int for platform in PLATFORM_CONFIGS},
+}
+
+
+@dataclass(frozen=True, slots=True)
+class ResolvedEnvironment:
+    """An es.ini environment with its name resolved and its connection settings validated."""
+
+    name: str
+    platform: str
+    config: AgentConfig
+
+
+class EnvironmentRegistry:
+    """
+    Process-wide cache of the environments defined in `es.ini`.
+
+    The file is parsed once and re-parsed only when its modification time (or size)
+    changes. Each environment is validated and resolved into an immutable config object
+    the first time it is requested; later requests (one per test and per failure sample)
+    are dictionary lookups.
+    """
+
+    def __init__(self, path: str = INI_FILE) -> None:
+        """
+        Initialize an empty registry for the given configuration file.
+
+        :param path: Path to the es.ini file.
+        """
+        self.path = path
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._signature: tuple[int, int] | None = None
+        self._parser = ConfigParser()
+        self._parse_error: str | None = None
+        self._resolved: dict[str, ResolvedEnvironment] = {}
+
+    def _snapshot(self) -> ConfigParser:
+        """Return the parsed file, re-reading it if it changed since the last load."""
+        try:
+            st = os.stat(self.path)
+            signature: tuple[int, int] | None = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            signature = None
+
+        with self._lock:
+            if self.loads == 0 or signature != self._signature:
+                parser = ConfigParser()
+                self._parse_error = None
+                if signature is not None:
+                    try:
+                        parser.read(self.path)
+                    except ConfigParserError as e:
+                        self._parse_error = f"Failed to parse {self.path}: {e}"
+                self._parser = parser
+                self._signature = signature
+                self._resolved = {}
+                self.loads += 1
+            if signature is None:
+                raise ConfigurationError([f"Configuration file '{self.path}' not found. Run 'es setup' first."])
+            if self._parse_error:
+                raise ConfigurationError([self._parse_error])
+            return self._parser
+
+    def resolve_name(self, env_name: str | None = None) -> str:
+        """
+        Return the environment section name that `env_name` resolves to.
+
+        :param env_name: Optional environment section; if None, uses `[default].env`.
+        :return: The resolved environment section name.
+        """
+        parser = self._snapshot()
+        if env_name:
+            return env_name
+        if not parser.has_option("default", "env"):
+            raise ConfigurationError(["No environment selected and no 'env' set in the [default] section of es.ini"])
+        return parser.get("default", "env")
+
+    def get(self, env_name: str | None = None) -> ResolvedEnvironment:
+        """
+        Return the resolved and validated environment.
+
+        :param env_name: Optional environment section; if None, uses `[default].env`.
+        :return: The cached ResolvedEnvironment.
+        :raises ConfigurationError: With all problems of the environment if it is invalid.
+        """
+        parser = self._snapshot()
+        name = self.resolve_name(env_name)
+        with self._lock:
+            cached = self._resolved.get(name)
+        if cached is not None:
+            return cached
+
+        resolved = self._build(parser, name)
+        with self._lock:
+            if parser is self._parser:
+                self._resolved[name] = resolved
+        return resolved
+
+    def config_for(self, env_name: str | None, config_type: type[ConfigT]) -> ConfigT:
+        """
+        Return the connection settings of an environment, checking they are of the expected platform.
+
+        :param env_name: Optional environment section; if None, uses `[default].env`.
+        :param config_type: Expected config class, e.g. SnowflakeAgentConfig.
+        :return: The immutable config object.
+        """
+        resolved = self.get(env_name)
+        if not isinstance(resolved.config, config_type):
+            raise ConfigurationError(
+                [
+                    f"Environment '{resolved.name}' is configured for platform '{resolved.platform}', not {config_type.__name__}"
+                ]
+            )
+        return resolved.config
+
+    def get_int_option(self, option: str, fallback: int, env_name: str | None = None) -> int:
+        """
+        Return an integer runtime option, looked up in the environment section first and `[default]` second.
+
+        :param option: Option key, e.g. "pool_size".
+        :param fallback: Value returned when neither section defines the option.
+        :param env_name: Optional environment section; if None, uses `[default].env`.
+        :return: The configured integer value or `fallback`.
+        """
+        value = self.get_optional_int(option, env_name)
+        return fallback if value is None else value
+
+    def get_optional_int(self, option: str, env_name: str | None = None, *, include_default: bool = True) -> int | None:
+        """
+        Return an integer runtime option, or None if it is not set.
+
+        :param option: Option key, e.g. "max_concurrency".
+        :param env_name: Optional environment section; if None, uses `[default].env`.
+        :param include_default: If True, fall back to the `[default]` section.
+        :return: The configured integer value or None.
+        """
+        parser = self._snapshot()
+        sections = [self.resolve_name(env_name)]
+        if include_default:
+            sections.append("default")
+        for section in sections:
+            if parser.has_option(section, option):
+                errors: list[str] = []
+                value: int | None = read_typed_option(parser[section], option, parser[section].getint, None, errors)
+                if errors:
+                    raise ConfigurationError(errors)
+                return value
+        return None
+
+    def validate(self, env_names: Iterable[str | None]) -> list[str]:
+        """
+        Validate the given environments and return every problem found (empty if valid).
+
+        :param env_names: Environments selected for a run; None stands for the default environment.
+        :return: List of human-readable error messages.
+        """
+        errors: list[str] = []
+        for env_name in env_names:
+            try:
+                self.get(env_name)
+            except ConfigurationError as e:
+                errors.extend(err for err in e.errors if err not in errors)
+        return errors
+
+    @staticmethod
+    def _build(parser: ConfigParser, name: str) -> ResolvedEnvironment:
+        """Validate one environment section and resolve it into a ResolvedEnvironment."""
+        if not parser.has_section(name):
+            raise ConfigurationError([f"Environment section '{name}' not found in es.ini"])
+        section = parser[name]
+        if "platform" not in section:
+            raise ConfigurationError([f"Missing 'platform' in section [{name}] of es.ini"])
+        platform = section["platform"].strip().lower()
+        config_type = PLATFORM_CONFIGS.get(platform)
+        if config_type is None:
+            raise ConfigurationError(
+                [
+                    f"Unsupported platform '{platform}' in section [{name}] of es.ini. "
+                    f"Should be one of: [{','.join(PLATFORM_CONFIGS)}]"
+                ]
+            )
+
+        errors: list[str] = []
+        config: AgentConfig | None = None
+        try:
+            config = config_type.from_section(section)
+        except ConfigurationError as e:
+            errors.extend(e.errors)
+
+        for sect in (section, parser["default"] if parser.has_section("default") else None):
+            if sect is None:
+                continue
+            for option, option_type in RUNTIME_OPTIONS.items():
+                getter = sect.getint if option_type is int else sect.getfloat
+                read_typed_option(sect, option, getter, None, errors)
+
+        if errors or config is None:
+            raise ConfigurationError(errors)
+        return ResolvedEnvironment(name=name, platform=platform, config=config)
+
+
+_REGISTRIES: dict[str, EnvironmentRegistry] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_registry(path: str = INI_FILE) -> EnvironmentRegistry:
+    """
+    Return the process-wide registry for the configuration file at `path` (relative to the working directory).
+
+    :param path: Path to the es.ini file.
+    :return: The shared EnvironmentRegistry.
+    """
+    key = os.path.abspath(path)
+    with _REGISTRIES_LOCK:
+        registry = _REGISTRIES.get(key)
+        if registry is None:
+            registry = EnvironmentRegistry(key)
+            _REGISTRIES[key] = registry
+        return registry
@@ -1,8 +1,8 @@
-from configparser import ConfigParser
+from echosphere.env_config_parser.EnvironmentRegistry import get_registry
 
 
 class PlatformExtractor:
-    """Utilities to read platform information from es.ini."""
+    """Utilities to read platform information from es.ini (served from the cached environment registry)."""
 
     @classmethod
     def extract_platform_info(cls, env_name: str | None = None) -> str:
@@ -12,12 +12,26 @@ class PlatformExtractor:
         :param env_name: Optional environment section to read; if None, uses `[default].env`.
         :return: The platform name (e.g., "snowflake").
         """
-        config = ConfigParser()
-        config.read("es.ini")
+        return get_registry().get(env_name).platform
 
-        if not env_name:
-            default_env = config.get("default", "env")
-        else:
-            default_env = env_name
+    @classmethod
+    def resolve_env_name(cls, env_name: str | None = None) -> str:
+        """
+        Return the environment section name that `env_name` resolves to.
+
+        :param env_name: Optional environment section; if None, uses `[default].env`.
+        :return: The resolved environment section name.
+        """
+        return get_registry().resolve_name(env_name)
 
-        return config.get(default_env, "platform").lower()
+    @classmethod
+    def extract_int_option(cls, option: str, fallback: int, env_name: str | None = None) -> int:
+        """
+        Return an integer runtime option, looked up in the environment section first and `[default]` second.
+
+        :param option: Option key, e.g. "pool_size".
+        :param fallback: Value returned when neither section defines the option.
+        :param env_name: Optional environment section; if None, uses `[default].env`.
+        :return: The configured integer value or `fallback`.
+        """
+        return get_registry().get_int_option(option, fallback, env_name)
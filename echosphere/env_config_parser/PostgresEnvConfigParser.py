@@ -1,50 +1,65 @@
-from configparser import ConfigParser
+from __future__ import annotations
 
+from configparser import SectionProxy
+from dataclasses import dataclass
 
+from echosphere.env_config_parser.validation import ConfigurationError, read_typed_option, require_options
+
+
+@dataclass(frozen=True, slots=True)
 class PostgresAgentConfig:
     """
-    Load PostgreSQL agent configuration from `es.ini`.
+    Resolved, immutable PostgreSQL connection settings of one `es.ini` environment.
 
-    This class reads the `es.ini` file and extracts the credentials and
-    connection parameters for a selected environment section. If no env name is
-    provided, it uses the `[default]` section's `env` key to resolve the
-    active environment.
-
-    :param env_name: Optional explicit environment section name to use. If None,
-                       the default env is read from `[default].env`.
+    Instances are built once per process by the environment registry
+    (`echosphere.env_config_parser.EnvironmentRegistry`), which resolves the
+    environment name (falling back to `[default].env`) and validates the section.
     """
 
-    def __init__(self, env_name: str | None = None) -> None:
+    host: str
+    database: str
+    user: str
+    password: str
+    port: int = 5432
+    schema: str | None = None
+    sslmode: str | None = None
+
+    # Optional pipelined async mode (psycopg 3)
+    pipeline: bool = False
+    pipeline_connections: int | None = None
+    pipeline_batch_size: int | None = None
+
+    @classmethod
+    def from_section(cls, section: SectionProxy) -> PostgresAgentConfig:
         """
-        Initializes a configuration object using specified or default environment settings.
+        Build the configuration from an `es.ini` environment section.
 
-        This method reads environmental configurations from an INI file (es.ini) to retrieve
-        details about the database connection and associated parameters. It validates that
-        all required options ("host", "database") exist and assigns their respective values
-        to instance attributes. Default and fallback options are used where applicable.
+        All problems of the section (missing options and malformed numbers or flags) are
+        reported together.
 
-        :param env_name: The name of the environment whose configuration will be used. If not
-            specified, it defaults to the "env" option within the "default" section of the
-            configuration file.
+        :param section: The environment section to read.
+        :return: The validated configuration.
+        :raises ConfigurationError: If the section is incomplete or invalid.
         """
-        config = ConfigParser()
-        config.read("es.ini")
-        section = config.get("default", "env") if not env_name else env_name
-        if not config.has_section(section):
-            raise Exception(f"Environment section '{section}' not found in es.ini")
-
-        if config.has_option(section, "host"):
-            self.host: str = config.get(section, "host")
-        else:
-            raise Exception(f"Missing 'host' in section [{section}] of es.ini")
-
-        if config.has_option(section, "database"):
-            self.database: str = config.get(section, "database")
-        else:
-            raise Exception(f"Missing 'database' in section [{section}] of es.ini")
-
-        self.user: str = config.get(section, "user")
-        self.password: str = config.get(section, "password")
-        self.port: int = config.getint(section, "port", fallback=5432)
-        self.schema: str | None = config.get(section, "schema", fallback=None)
-        self.sslmode: str | None = config.get(section, "sslmode", fallback=None)
+        require_options(section, ["host", "database", "user", "password"], "Postgres")
+
+        errors: list[str] = []
+        port = read_typed_option(section, "port", section.getint, 5432, errors)
+        pipeline = read_typed_option(section, "pipeline", section.getboolean, False, errors)
+        pipeline_connections = read_typed_option(section, "pipeline_connections", section.getint, None, errors)
+        pipeline_batch_size = read_typed_option(section, "pipeline_batch_size", section.getint, None, errors)
+        if errors:
+            raise ConfigurationError(errors)
+
+        return cls(
+            host=section["host"],
+            database=section["database"],
+            user=section["user"],
+            password=section["password"],
+            port=port,
+            schema=section.get("schema", fallback=None),
+            sslmode=section.get("sslmode", fallback=None),
+            pipeline=pipeline,
+            pipeline_connections=pipeline_connections,
+            pipeline_batch_size=pipeline_batch_size,
+        )
@@ -1,16 +1,20 @@
-from configparser import ConfigParser
+from __future__ import annotations
 
+from configparser import SectionProxy
+from dataclasses import dataclass
 
+from echosphere.env_config_parser.validation import require_options
+
+
+@dataclass(frozen=True, slots=True)
 class SnowflakeAgentConfig:
     """
-    Load Snowflake agent configuration from `es.ini`.
+    Resolved, immutable Snowflake connection settings of one `es.ini` environment.
 
-    This class reads the `es.ini` file and extracts the credentials and
-    connection parameters for a selected agent section. If no agent name is
-    provided, it uses the `[default]` section's `agent` key to resolve the
-    active agent.
+    Instances are built once per process by the environment registry
+    (`echosphere.env_config_parser.EnvironmentRegistry`) and shared by all tests.
 
-    Attributes set on instances:
+    Fields:
         user: Snowflake username.
         password: Snowflake password.
         account: Snowflake account identifier.
@@ -18,30 +22,25 @@ class SnowflakeAgentConfig:
         role: Snowflake role.
         database: Default database.
         schema: Default schema.
-
-    :param agent_name: Optional explicit agent section name to use. If None,
-                       the default agent is read from `[default].agent`.
     """
 
-    def __init__(self, agent_name: str | None = None) -> None:
+    user: str
+    password: str
+    account: str
+    warehouse: str
+    role: str
+    database: str
+    schema: str
+
+    @classmethod
+    def from_section(cls, section: SectionProxy) -> SnowflakeAgentConfig:
         """
-        Initialize the configuration by reading values from `es.ini`.
+        Build the configuration from an `es.ini` environment section.
 
-        :param agent_name: Optional agent section to read; if None, the
-                           default agent is resolved from `[default].agent`.
-        :return: None
+        :param section: The environment section to read.
+        :return: The validated configuration.
+        :raises ConfigurationError: If required options are missing.
         """
-        config = ConfigParser()
-        config.read("es.ini")
-        if not agent_name:
-            default_agent = config.get("default", "env")
-        else:
-            default_agent = agent_name
-
-        self.user: str = config.get(default_agent, "user")
-        self.password: str = config.get(default_agent, "password")
-        self.account: str = config.get(default_agent, "account")
-        self.warehouse: str = config.get(default_agent, "warehouse")
-        self.role: str = config.get(default_agent, "role")
-        self.database: str = config.get(default_agent, "database")
-        self.schema: str = config.get(default_agent, "schema")
+        required = ["user", "password", "account", "warehouse", "role", "database", "schema"]
+        require_options(section, required, "Snowflake")
+        return cls(**{k: section[k] for k in required})
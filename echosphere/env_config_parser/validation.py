@@ -0,0 +1,53 @@
+from collections.abc import Callable
+from configparser import SectionProxy
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class ConfigurationError(Exception):
+    """Raised when es.ini is invalid; carries every problem found, not just the first one."""
+
+    def __init__(self, errors: list[str]) -> None:
+        """
+        Initialize the error from a list of human-readable problems.
+
+        :param errors: One message per configuration problem.
+        """
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+def require_options(section: SectionProxy, required: list[str], platform_label: str) -> None:
+    """
+    Raise a ConfigurationError if any of `required` is missing from `section`.
+
+    :param section: The es.ini section to check.
+    :param required: Option keys that must be present.
+    :param platform_label: Platform name used in the message, e.g. "Snowflake".
+    """
+    missing = [k for k in required if k not in section]
+    if missing:
+        raise ConfigurationError(
+            [
+                f"Missing required option(s) {missing} in section [{section.name}] of es.ini for {platform_label} configuration"
+            ]
+        )
+
+
+def read_typed_option(section: SectionProxy, key: str, getter: Callable[..., T], fallback: T, errors: list[str]) -> T:
+    """
+    Read `key` with a typed SectionProxy getter, recording a message instead of raising on bad values.
+
+    :param section: The es.ini section to read from.
+    :param key: Option key.
+    :param getter: Typed getter bound to `section`, e.g. `section.getint`.
+    :param fallback: Value returned when the option is absent or malformed.
+    :param errors: List the problem message is appended to.
+    :return: The parsed value or `fallback`.
+    """
+    try:
+        return getter(key, fallback=fallback)
+    except ValueError:
+        errors.append(f"Invalid value '{section[key]}' for '{key}' in section [{section.name}] of es.ini")
+        return fallback
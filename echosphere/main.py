@@ -1,23 +1,25 @@
-import concurrent.futures
+import os
+import sqlite3
 import sys
 import time
-from typing import Optional, cast
+from typing import TYPE_CHECKING, Optional
 
 import typer
-from rich import print
-from rich.console import Console
 from typing_extensions import Annotated
 
-from echosphere.commands import view
-from echosphere.core.excel_export import FailedTestExporter
-from echosphere.core.junit_export import JUnitXmlExporter
-from echosphere.core.run_async_tests import run_async_test_and_poll
-from echosphere.core.setup_es import PlatformEnum, init_es
-from echosphere.core.suite_display import display_test_names_table
-from echosphere.core.test_result import TestResult
-from echosphere.utils.sql_test_fetcher import TestFileInfo, get_sql_test_files
+from echosphere.commands import report, view
+from echosphere.core.platforms import PlatformEnum
 
-console = Console()
+# Exporters, database drivers, the async engine and rich rendering are imported inside the
+# commands that use them, so `es --help`, `es view ...` or a run without exports does not
+# pay for openpyxl, ElementTree or the connectors at startup.
+if TYPE_CHECKING:
+    from rich.console import Console
+
+    from echosphere.core.failure_export import BackgroundFailureExporter
+    from echosphere.core.junit_export import StreamingJUnitWriter
+    from echosphere.core.test_result import TestResult
+    from echosphere.utils.sql_test_fetcher import TestFileInfo
 
 app = typer.Typer(
     name="EchoSphere Testing Suite",
@@ -29,6 +31,7 @@ app = typer.Typer(
 )
 
 app.add_typer(view.app, name="view")
+app.add_typer(report.app, name="report", help="Reports built from the run history.")
 
 
 @app.command(name="setup", help="Create the necessary setup.")
@@ -39,8 +42,12 @@ def configure_setup(platform: PlatformEnum = typer.Option(None, help="Platform t
     :param platform: Target platform to configure (e.g., PlatformEnum.SNOWFLAKE).
     :return: None
     """
+    from rich.console import Console
+
+    from echosphere.core.setup_es import init_es
+
     if platform is None:
-        console.print(
+        Console().print(
             "[bold red]Error:[/bold red] Please specify a platform. Use [bold green]--help[/bold green] for more info."
         )
         raise typer.Exit(code=-1)
@@ -50,7 +57,7 @@ def configure_setup(platform: PlatformEnum = typer.Option(None, help="Platform t
 @app.command(name="run", help="Run the current test suite.")
 def run_suite(
     env: Annotated[
-        Optional[str],
+        Optional[list[str]],
         typer.Option(
             ...,
             "--environment",
@@ -59,7 +66,7 @@ def run_suite(
             show_envvar=False,
             show_default=False,
             rich_help_panel="Options",
-            help="Environment name config.",
+            help="Environment name config. Repeat to run the suite against several environments at once.",
         ),
     ] = None,
     junitxml: Annotated[
@@ -72,71 +79,815 @@ def run_suite(
             show_default=False,
         ),
     ] = None,
+    junit_stream: Annotated[
+        bool,
+        typer.Option(
+            "--junit-stream",
+            help="Append each test case to the --junitxml file as it finishes, so an interrupted run still "
+            "leaves a valid report. '{subsuite}' and '{env}' in the path write one file per subsuite or environment.",
+            rich_help_panel="Options",
+        ),
+    ] = False,
     export_failures: Annotated[
         Optional[str],
         typer.Option(
             ...,
             "--export-failures",
-            help="Path to write failed test data to an Excel (.xlsx) file (directories will be created if missing).",
+            help="Path to write failed test data to: an Excel (.xlsx) file, or a directory with "
+            "--export-format parquet/csv (directories will be created if missing).",
+            rich_help_panel="Options",
+            show_default=False,
+        ),
+    ] = None,
+    export_format: Annotated[
+        str,
+        typer.Option(
+            ...,
+            "--export-format",
+            help="Format of --export-failures: 'xlsx' (one workbook), 'parquet' or 'csv' (a directory with one file "
+            "per failed test and a _metadata.json sidecar).",
+            rich_help_panel="Options",
+        ),
+    ] = "xlsx",
+    max_concurrency: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            ...,
+            "--max-concurrency",
+            help="Ceiling for tests in flight: N, <platform>=N or <environment>=N. Repeatable; overrides es.ini.",
+            rich_help_panel="Options",
+            show_default=False,
+        ),
+    ] = None,
+    fixed_concurrency: Annotated[
+        bool,
+        typer.Option(
+            "--fixed-concurrency",
+            help="Keep the concurrency ceiling in flight instead of adapting it to latency and throttling.",
+            rich_help_panel="Options",
+        ),
+    ] = False,
+    maxfail: Annotated[
+        Optional[int],
+        typer.Option(
+            ...,
+            "--maxfail",
+            min=1,
+            help="Stop after N failed tests and cancel the queries still running.",
             rich_help_panel="Options",
             show_default=False,
         ),
     ] = None,
+    exitfirst: Annotated[
+        bool,
+        typer.Option(
+            "--exitfirst",
+            "-x",
+            help="Stop at the first failed test; same as --maxfail 1.",
+            rich_help_panel="Options",
+        ),
+    ] = False,
+    timeout: Annotated[
+        Optional[float],
+        typer.Option(
+            ...,
+            "--timeout",
+            min=0,
+            help="Time limit per test in seconds (0: none); overrides 'timeout' in es.ini. "
+            "Tests can set their own with a '-- es:timeout = N' comment.",
+            rich_help_panel="Options",
+            show_default=False,
+        ),
+    ] = None,
+    run_timeout: Annotated[
+        Optional[float],
+        typer.Option(
+            ...,
+            "--run-timeout",
+            min=0,
+            help="Deadline for the whole run in seconds (0: none); overrides 'run_timeout' in es.ini.",
+            rich_help_panel="Options",
+            show_default=False,
+        ),
+    ] = None,
+    shard: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--shard",
+            help="Run shard i of N (e.g. 2/4), balanced by historical test durations. "
+            "'{shard}' in --junitxml is replaced by i.",
+            rich_help_panel="Options",
+            show_default=False,
+        ),
+    ] = None,
+    tag: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--tag",
+            help="Label this run in the run history, e.g. to use it as baseline for 'es report latency'.",
+            rich_help_panel="Options",
+            show_default=False,
+        ),
+    ] = None,
+    incremental: Annotated[
+        bool,
+        typer.Option(
+            "--incremental",
+            help="Skip tests whose SQL, environment and referenced tables are unchanged since they last passed.",
+            rich_help_panel="Options",
+        ),
+    ] = False,
+    use_cache: Annotated[
+        bool,
+        typer.Option(
+            "--cache",
+            help="Reuse results of the same SQL from the last 'cache_ttl' seconds instead of executing it again. "
+            "Off by default unless 'cache_ttl' is set in es.ini.",
+            rich_help_panel="Options",
+        ),
+    ] = False,
+    no_cache: Annotated[
+        bool,
+        typer.Option(
+            "--no-cache",
+            help="Execute every test, even if 'cache_ttl' is set in es.ini. This is the default without --cache; "
+            "executed results still refresh the cache.",
+            rich_help_panel="Options",
+        ),
+    ] = False,
+    no_history: Annotated[
+        bool,
+        typer.Option(
+            "--no-history",
+            help="Neither read nor record test durations in the run history next to es.ini.",
+            rich_help_panel="Options",
+        ),
+    ] = False,
+    progress: Annotated[
+        str,
+        typer.Option(
+            ...,
+            "--progress",
+            help="Output while tests run: 'live' progress view, 'ci' (only failures), 'plain' (every test) "
+            "or 'auto' (live on a terminal, ci otherwise).",
+            rich_help_panel="Options",
+        ),
+    ] = "auto",
 ) -> None:
     """
     Run all tests.
     :return:
     """
+    from rich import print
+    from rich.console import Console
+
+    from echosphere.core.concurrency import parse_concurrency_overrides, resolve_concurrency_ceiling
+    from echosphere.core.db_runner.connection_pool import close_all_pools
+    from echosphere.core.engine import AsyncTestEngine, EnvironmentRun
+    from echosphere.core.failure_export import EXPORT_FORMATS
+    from echosphere.core.failure_spool import DEFAULT_MEMORY_BUDGET_MB, DEFAULT_SAMPLE_MAX_KB, FailureSpool
+    from echosphere.core.history import DurationHistory, Expectation, default_history_path, order_longest_first
+    from echosphere.core.incremental import plan_incremental_run
+    from echosphere.core.reporter import PROGRESS_MODES, RunReporter, subsuite_summary
+    from echosphere.core.result_cache import DEFAULT_CACHE_MAX_MB, DEFAULT_CACHE_TTL, ResultCache, default_cache_path
+    from echosphere.core.run_async_tests import resolve_runner
+    from echosphere.core.sharding import parse_shard, select_shard
+    from echosphere.core.suite_display import display_no_tests_error
+    from echosphere.env_config_parser.EnvironmentRegistry import get_registry
+    from echosphere.env_config_parser.validation import ConfigurationError
+    from echosphere.utils.sql_test_fetcher import default_manifest_path, get_sql_test_files
+
+    console = Console()
     s_t = time.time()
+    # Validate the selected environments once, up front, so every configuration problem is
+    # reported together before any query is dispatched.
+    selected: list[str | None] = list(env) if env else [None]
+    config_errors = get_registry().validate(selected)
+    if use_cache and no_cache:
+        raise typer.BadParameter("--cache and --no-cache cannot be combined.", param_hint="--cache")
+    if incremental and no_history:
+        raise typer.BadParameter("--incremental needs the run history and cannot be used with --no-history.")
+    if export_format not in EXPORT_FORMATS:
+        raise typer.BadParameter(f"Use one of: {', '.join(EXPORT_FORMATS)}.", param_hint="--export-format")
+    if progress not in PROGRESS_MODES:
+        raise typer.BadParameter(f"Use one of: {', '.join(PROGRESS_MODES)}.", param_hint="--progress")
+    if junit_stream and not junitxml:
+        raise typer.BadParameter("--junit-stream needs a --junitxml path.", param_hint="--junit-stream")
+    shard_index, shard_count = 1, 1
+    if shard is not None:
+        try:
+            shard_index, shard_count = parse_shard(shard)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--shard")
+    envs: list[str] = []
+    ceilings: dict[str, int] = {}
+    if not config_errors:
+        try:
+            envs = list(dict.fromkeys(get_registry().resolve_name(env_name) for env_name in selected))
+            overrides = parse_concurrency_overrides(max_concurrency or [])
+            ceilings = {env_name: resolve_concurrency_ceiling(env_name, overrides) for env_name in envs}
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--max-concurrency")
+        except ConfigurationError as e:
+            config_errors = e.errors
+    if config_errors:
+        print("[bold red]Invalid es.ini configuration:[/bold red]")
+        for error in config_errors:
+            print(f"  - {error}")
+        sys.exit(-1)
+    multi_env = len(envs) > 1
+    if junit_stream and multi_env and junitxml and "{env}" not in junitxml:
+        raise typer.BadParameter(
+            "A streamed report holds one test suite per file: add '{env}' to the --junitxml path.",
+            param_hint="--junit-stream",
+        )
+
+    # The suite is discovered once; the manifest next to es.ini spares re-listing unchanged folders
+    discovered: dict[str, TestFileInfo] = get_sql_test_files(manifest_path=default_manifest_path(get_registry().path))
+
+    if not discovered:
+        display_no_tests_error()
+
+    # Large suites are summarized per subsuite after the run instead of listed up front
+    subsuites = {info["subfolder"] for info in discovered.values()}
     print("================================================================")
-    print("[bold]Test Suite[/bold]")
-    print("================================================================")
-    display_test_names_table()
-    print("\n================================================================")
-    print("[bold]Starting Async EchoSphere Test Run[/bold]")
+    print(f"[bold]Starting Async EchoSphere Test Run[/bold]: {len(discovered)} tests in {len(subsuites)} subsuite(s)")
     print("================================================================")
 
-    results: list[TestResult] = []
-    test_files: dict[str, TestFileInfo] = get_sql_test_files()
-    with concurrent.futures.ThreadPoolExecutor(max_workers=50) as executor:
-        futures: list[concurrent.futures.Future[TestResult]] = []
-        for t_n, t_fp in test_files.items():
-            fut = executor.submit(
-                run_async_test_and_poll,
-                t_n,
-                t_fp["full_path"],
-                env,
-                bool(export_failures),
+    history: DurationHistory | None = None
+    if not no_history:
+        try:
+            history = DurationHistory(default_history_path(get_registry().path))
+        except sqlite3.Error as e:
+            console.print(f"[bold yellow]Run history unavailable, using discovery order:[/bold yellow] {e}")
+
+    # Every environment gets its own schedule: durations, shards and unchanged tests differ between environments
+    runs: list[EnvironmentRun] = []
+    expectations: dict[str, dict[str, Expectation]] = {}
+    fingerprints: dict[str, dict[str, str]] = {}
+    skipped_results: list[TestResult] = []
+    for env_name in envs:
+        label = f"[{env_name}] " if multi_env else ""
+        expectations[env_name] = {}
+        if history is not None:
+            try:
+                expectations[env_name] = history.expectations(env_name)
+            except sqlite3.Error as e:
+                console.print(f"[bold yellow]{label}Run history unavailable, using discovery order:[/bold yellow] {e}")
+        test_files = discovered
+        if shard is not None:
+            # Every CI job computes the same partition, so each test runs in exactly one shard
+            test_files = {
+                name: discovered[name]
+                for name in select_shard(discovered, expectations[env_name], shard_index, shard_count)
+            }
+            expected = sum(expectations[env_name][n].duration for n in test_files if n in expectations[env_name])
+            console.print(
+                f"[bold]{label}Shard {shard_index}/{shard_count}:[/bold] {len(test_files)} of {len(discovered)} tests"
+                + (f", about {expected:.0f}s expected" if expected else "")
             )
-            futures.append(cast(concurrent.futures.Future[TestResult], fut))  # type: ignore
-        for future in concurrent.futures.as_completed(futures):
-            results.append(future.result())
+        # Start the longest expected tests first, based on the durations of previous runs
+        test_files = {name: test_files[name] for name in order_longest_first(test_files, expectations[env_name])}
 
-    # Export JUnit XML if requested
-    if junitxml:
-        try:
-            j_exporter = JUnitXmlExporter()
-            j_exporter.add_results(results)
-            abs_path = j_exporter.write_to_file(junitxml)
-            console.print(f"[bold green]JUnit XML results written to:[/bold green] {abs_path}")
-        except Exception as e:
-            console.print(f"[bold red]Failed to write JUnit XML:[/bold red] {e}")
-
-    # Export failed test details to Excel if requested
-    if export_failures:
+        # In incremental mode, tests whose inputs did not change since they last passed are skipped
+        fingerprints[env_name] = {}
+        if incremental and history is not None:
+            plan = plan_incremental_run(resolve_runner(env_name), env_name, test_files, history)
+            if plan.warning:
+                console.print(
+                    f"[bold yellow]{label}Incremental mode unavailable, running all tests:[/bold yellow] {plan.warning}"
+                )
+            test_files, fingerprints[env_name] = plan.to_run, plan.fingerprints
+            for r in plan.skipped:
+                r.env = env_name
+            skipped_results.extend(plan.skipped)
+
+        env_timeout = timeout if timeout is not None else get_registry().get_optional_int("timeout", env_name)
+        # Failure samples keep `sample_rows` rows and at most `sample_max_kb` KB per test (0: no byte limit)
+        sample_max_kb = get_registry().get_int_option("sample_max_kb", DEFAULT_SAMPLE_MAX_KB, env_name)
+        runs.append(
+            EnvironmentRun(
+                env_name,
+                test_files,
+                max_in_flight=ceilings[env_name],
+                timeout=env_timeout or None,
+                sample_rows=get_registry().get_optional_int("sample_rows", env_name) or None,
+                sample_max_bytes=sample_max_kb * 1024 or None,
+                expected_durations={name: e.duration for name, e in expectations[env_name].items()},
+            )
+        )
+
+    # Executed tests refresh the cache. Reading it is opt-in, so a rerun after fixing data never reports
+    # a stale pass: results are reused with --cache, or when `cache_ttl` is set for every selected
+    # environment, and never with --no-cache. A `cache_ttl` of 0 disables the cache. The cache file
+    # is shared by all environments, so the strictest settings of the selected environments apply.
+    cache: ResultCache | None = None
+    configured_ttls = [get_registry().get_optional_int("cache_ttl", env_name) for env_name in envs]
+    cache_ttl = min(DEFAULT_CACHE_TTL if ttl is None else ttl for ttl in configured_ttls)
+    read_cache = not no_cache and (use_cache or all(ttl is not None for ttl in configured_ttls))
+    if cache_ttl > 0:
         try:
-            e_exporter = FailedTestExporter()
-            e_exporter.add_results(results)
-            abs_xlsx = e_exporter.write_to_file(export_failures)
-            failed_count = sum(1 for r in results if not r.passed)
-            console.print(
-                f"[bold green]Failed test data exported to:[/bold green] {abs_xlsx} ({failed_count} tests exported)"
+            cache = ResultCache(
+                default_cache_path(get_registry().path),
+                ttl=cache_ttl,
+                max_mb=min(
+                    get_registry().get_int_option("cache_max_mb", DEFAULT_CACHE_MAX_MB, env_name) for env_name in envs
+                ),
+            )
+        except sqlite3.Error as e:
+            console.print(f"[bold yellow]Result cache unavailable:[/bold yellow] {e}")
+
+    if run_timeout is None:
+        # One deadline covers the run over all environments: the earliest configured one applies
+        configured = [get_registry().get_optional_int("run_timeout", env_name) for env_name in envs]
+        run_timeout = min((t for t in configured if t), default=None)
+
+    # Outcomes are queued to the reporter thread, so test coroutines never wait on the terminal
+    reporter = RunReporter(sum(len(r.test_files) for r in runs), progress, console=console, show_env=multi_env)
+
+    suite_name = f"EchoSphere SQL Tests (shard {shard_index}/{shard_count})" if shard is not None else None
+    if junitxml and shard is not None:
+        # Distinct suite names keep the shards apart when their reports are merged
+        junitxml = junitxml.replace("{shard}", str(shard_index))
+    junit_writer = _open_junit_stream(console, junitxml, suite_name) if junit_stream else None
+    if junit_writer is not None:
+        junit_writer.add_results(skipped_results)
+    # Failed tests are exported by a background writer while the run goes on
+    failure_export = _open_failure_export(console, export_failures, export_format, show_env=multi_env)
+    # Captured samples wait for the export in a spool: serialized, in memory up to a budget, then on disk
+    spool = None
+    if failure_export is not None:
+        spool = FailureSpool(
+            min(
+                get_registry().get_int_option("spool_memory_mb", DEFAULT_MEMORY_BUDGET_MB, env_name)
+                for env_name in envs
             )
-        except Exception as e:
-            console.print(f"[bold red]Failed to export failed test data:[/bold red] {e}")
+            * 1024
+            * 1024
+        )
+
+    def on_result(result: "TestResult") -> None:
+        reporter.test_finished(result)
+        if junit_writer is not None:
+            junit_writer.add_result(result)
+        if failure_export is not None:
+            failure_export.add_result(result)
+
+    # Tests run as coroutines; blocking runners borrow sessions from the per-environment
+    # connection pools inside the engine's bounded executor. Close the pools once the run is done.
+    engine = AsyncTestEngine(
+        max_in_flight=max(ceilings.values()),
+        adaptive=not fixed_concurrency,
+        cache=cache,
+        read_cache=read_cache,
+        max_failures=1 if exitfirst else maxfail,
+        timeout=timeout or None,
+        run_timeout=run_timeout or None,
+        on_result=on_result,
+        on_start=reporter.test_started,
+        spool=spool,
+    )
+    try:
+        with reporter:
+            results: list[TestResult] = skipped_results + engine.run_environments(runs, bool(export_failures))
+    finally:
+        close_all_pools()
+        if cache is not None:
+            cache.close()
+        if junit_writer is not None:
+            junit_writer.close()
+        if failure_export is not None:
+            _close_failure_export(console, failure_export)
+        if spool is not None:
+            spool.close()
+
+    if engine.stopped_early:
+        not_run = sum(1 for r in results if r.skipped) - len(skipped_results)
+        console.print(
+            f"[bold red]Stopped after {engine.max_failures} failed test(s):[/bold red] "
+            f"{not_run} test(s) not run, {engine.cancelled_queries} running query(s) cancelled on the server."
+        )
+
+    if engine.deadline_exceeded:
+        console.print(
+            f"[bold red]Run deadline of {engine.run_timeout:g}s exceeded:[/bold red] "
+            f"{engine.cancelled_queries} running query(s) cancelled on the server."
+        )
+    errors = sum(1 for r in results if r.status == "error")
+    if errors:
+        console.print(f"[bold magenta]{errors} test(s) did not complete (see errors above).[/bold magenta]")
+
+    cached_count = sum(1 for r in results if r.cached)
+    if cached_count:
+        console.print(
+            f"[bold cyan]{cached_count} result(s) reused from the result cache.[/bold cyan] Use --no-cache to re-run them."
+        )
+
+    if history is not None:
+        try:
+            for env_name in envs:
+                env_results = [r for r in results if r.env == env_name]
+                run_id = history.record_run(
+                    env_name, env_results, expectations[env_name], tag=tag, fingerprints=fingerprints[env_name]
+                )
+                console.print(
+                    f"[bold green]Run recorded in history:[/bold green] run {run_id}"
+                    + (f" ({env_name})" if multi_env else "")
+                )
+        except sqlite3.Error as e:
+            console.print(f"[bold yellow]Failed to record run history:[/bold yellow] {e}")
+        finally:
+            history.close()
+
+    console.print(subsuite_summary(results))
+    if multi_env:
+        _print_environment_summary(console, envs, results)
+
+    if junit_writer is not None:
+        _print_junit_stream(console, junit_writer)
+    elif junitxml and not junit_stream:
+        _write_junit(console, results, junitxml, suite_name)
+    _print_summary(results, s_t)
+
+
+@app.command(name="coordinator", help="Serve the test suite to 'es worker' processes and collect their results.")
+def run_coordinator(
+    env: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--environment",
+            "-e",
+            envvar="ES_ENV_NAME",
+            show_envvar=False,
+            show_default=False,
+            rich_help_panel="Options",
+            help="Environment name config.",
+        ),
+    ] = None,
+    host: Annotated[
+        str,
+        typer.Option(..., "--host", help="Interface to listen on for workers.", rich_help_panel="Options"),
+    ] = "127.0.0.1",
+    port: Annotated[
+        int,
+        typer.Option(..., "--port", min=0, max=65535, help="Port to listen on for workers.", rich_help_panel="Options"),
+    ] = 8765,
+    junitxml: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--junitxml",
+            help="Path to write JUnit XML results (directories will be created if missing).",
+            rich_help_panel="Options",
+            show_default=False,
+        ),
+    ] = None,
+    junit_stream: Annotated[
+        bool,
+        typer.Option(
+            "--junit-stream",
+            help="Append each test case to the --junitxml file as it finishes, so an interrupted run still "
+            "leaves a valid report. '{subsuite}' and '{env}' in the path write one file per subsuite or environment.",
+            rich_help_panel="Options",
+        ),
+    ] = False,
+    export_failures: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--export-failures",
+            help="Path to write failed test data to: an Excel (.xlsx) file, or a directory with "
+            "--export-format parquet/csv (directories will be created if missing).",
+            rich_help_panel="Options",
+            show_default=False,
+        ),
+    ] = None,
+    export_format: Annotated[
+        str,
+        typer.Option(
+            ...,
+            "--export-format",
+            help="Format of --export-failures: 'xlsx' (one workbook), 'parquet' or 'csv' (a directory with one file "
+            "per failed test and a _metadata.json sidecar).",
+            rich_help_panel="Options",
+        ),
+    ] = "xlsx",
+    tag: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--tag",
+            help="Label this run in the run history, e.g. to use it as baseline for 'es report latency'.",
+            rich_help_panel="Options",
+            show_default=False,
+        ),
+    ] = None,
+    no_history: Annotated[
+        bool,
+        typer.Option(
+            "--no-history",
+            help="Neither read nor record test durations in the run history next to es.ini.",
+            rich_help_panel="Options",
+        ),
+    ] = False,
+) -> None:
+    """
+    Hand out the tests of the suite to workers, longest expected first, and report the run.
+    :return:
+    """
+    import asyncio
+
+    from rich import print
+    from rich.console import Console
+
+    from echosphere.core.distributed import Coordinator
+    from echosphere.core.failure_export import EXPORT_FORMATS
+    from echosphere.core.failure_spool import DEFAULT_MEMORY_BUDGET_MB, DEFAULT_SAMPLE_MAX_KB, FailureSpool
+    from echosphere.core.history import DurationHistory, Expectation, default_history_path, order_longest_first
+    from echosphere.env_config_parser.EnvironmentRegistry import get_registry
+    from echosphere.utils.sql_test_fetcher import default_manifest_path, get_sql_test_files
+
+    console = Console()
+    s_t = time.time()
+    if junit_stream and not junitxml:
+        raise typer.BadParameter("--junit-stream needs a --junitxml path.", param_hint="--junit-stream")
+    if export_format not in EXPORT_FORMATS:
+        raise typer.BadParameter(f"Use one of: {', '.join(EXPORT_FORMATS)}.", param_hint="--export-format")
+    config_errors = get_registry().validate([env])
+    if config_errors:
+        print("[bold red]Invalid es.ini configuration:[/bold red]")
+        for error in config_errors:
+            print(f"  - {error}")
+        sys.exit(-1)
+
+    test_files: dict[str, TestFileInfo] = get_sql_test_files(manifest_path=default_manifest_path(get_registry().path))
+    resolved_env = get_registry().resolve_name(env)
+    history: DurationHistory | None = None
+    expectations: dict[str, Expectation] = {}
+    if not no_history:
+        try:
+            history = DurationHistory(default_history_path(get_registry().path))
+            expectations = history.expectations(resolved_env)
+        except sqlite3.Error as e:
+            console.print(f"[bold yellow]Run history unavailable, using discovery order:[/bold yellow] {e}")
+    test_files = {name: test_files[name] for name in order_longest_first(test_files, expectations)}
+
+    junit_writer = _open_junit_stream(console, junitxml) if junit_stream else None
+    failure_export = _open_failure_export(console, export_failures, export_format)
+    spool = None
+    if failure_export is not None:
+        spool = FailureSpool(
+            get_registry().get_int_option("spool_memory_mb", DEFAULT_MEMORY_BUDGET_MB, resolved_env) * 1024 * 1024
+        )
+    sample_max_bytes = get_registry().get_int_option("sample_max_kb", DEFAULT_SAMPLE_MAX_KB, resolved_env) * 1024
+
+    def on_result(result: "TestResult") -> None:
+        if spool is not None:
+            # Samples received from workers wait for the export in the spool
+            spool.add(result, sample_max_bytes or None)
+        colour = {"pass": "green", "fail": "red", "error": "magenta", "skip": "yellow"}[result.status]
+        console.print(f"[{colour}]{result.status.upper():5}[/{colour}] {result.name} ({result.duration:.2f}s)")
+        if junit_writer is not None:
+            junit_writer.add_result(result)
+        if failure_export is not None:
+            failure_export.add_result(result)
+
+    coordinator = Coordinator(
+        test_files,
+        resolved_env,
+        host=host,
+        port=port,
+        capture_failure_data=bool(export_failures),
+        on_result=on_result,
+    )
+
+    def ready(bound_port: int) -> None:
+        console.print(
+            f"[bold]Serving {len(test_files)} tests for '{resolved_env}' on {host}:{bound_port}.[/bold] "
+            f"Start workers with: es worker --host <this host> --port {bound_port}"
+        )
+
+    try:
+        results: list[TestResult] = asyncio.run(coordinator.serve(ready))
+    except OSError as e:
+        console.print(f"[bold red]Cannot listen on {host}:{port}:[/bold red] {e}")
+        sys.exit(-1)
+    finally:
+        if junit_writer is not None:
+            junit_writer.close()
+        if failure_export is not None:
+            _close_failure_export(console, failure_export)
+        if spool is not None:
+            spool.close()
+    console.print(f"[bold]{coordinator.workers_seen} worker connection(s) served.[/bold]")
+
+    if history is not None:
+        try:
+            run_id = history.record_run(resolved_env, results, expectations, tag=tag)
+            console.print(f"[bold green]Run recorded in history:[/bold green] run {run_id}")
+        except sqlite3.Error as e:
+            console.print(f"[bold yellow]Failed to record run history:[/bold yellow] {e}")
+        finally:
+            history.close()
+
+    if junit_writer is not None:
+        _print_junit_stream(console, junit_writer)
+    elif junitxml and not junit_stream:
+        _write_junit(console, results, junitxml)
+    _print_summary(results, s_t)
+
+
+@app.command(name="worker", help="Run tests handed out by an 'es coordinator'.")
+def run_worker(
+    host: Annotated[
+        str,
+        typer.Option(..., "--host", help="Host of the coordinator.", rich_help_panel="Options"),
+    ] = "127.0.0.1",
+    port: Annotated[
+        int,
+        typer.Option(..., "--port", min=1, max=65535, help="Port of the coordinator.", rich_help_panel="Options"),
+    ] = 8765,
+    max_concurrency: Annotated[
+        Optional[int],
+        typer.Option(
+            ...,
+            "--max-concurrency",
+            min=1,
+            help="Ceiling for tests in flight on this worker (default: the ceiling in es.ini for the environment).",
+            rich_help_panel="Options",
+            show_default=False,
+        ),
+    ] = None,
+    fixed_concurrency: Annotated[
+        bool,
+        typer.Option(
+            "--fixed-concurrency",
+            help="Keep the concurrency ceiling in flight instead of adapting it to latency and throttling.",
+            rich_help_panel="Options",
+        ),
+    ] = False,
+) -> None:
+    """
+    Connect to a coordinator and run the tests it hands out until the run is finished.
+    :return:
+    """
+    import asyncio
+
+    from rich.console import Console
+
+    from echosphere.core.db_runner.connection_pool import close_all_pools
+    from echosphere.core.distributed import Worker
+
+    console = Console()
+    worker = Worker(host, port, max_in_flight=max_concurrency, adaptive=not fixed_concurrency)
+    try:
+        executed = asyncio.run(worker.run())
+    except OSError as e:
+        console.print(f"[bold red]Cannot reach the coordinator at {host}:{port}:[/bold red] {e}")
+        sys.exit(-1)
+    finally:
+        close_all_pools()
+    console.print(f"[bold green]Worker finished:[/bold green] {executed} test(s) run.")
+
+
+def _write_junit(console: "Console", results: "list[TestResult]", junitxml: str, suite_name: str | None = None) -> None:
+    """
+    Write the JUnit XML report of a run once it is finished; export errors are printed, not raised.
+
+    :param console: Console for status messages.
+    :param results: Results of the run.
+    :param junitxml: Path of the JUnit XML file.
+    :param suite_name: Optional JUnit test suite name.
+    :return: None
+    """
+    try:
+        from echosphere.core.junit_export import JUnitXmlExporter
+
+        j_exporter = JUnitXmlExporter(suite_name=suite_name) if suite_name else JUnitXmlExporter()
+        j_exporter.add_results(results)
+        abs_path = j_exporter.write_to_file(junitxml)
+        console.print(f"[bold green]JUnit XML results written to:[/bold green] {abs_path}")
+    except Exception as e:
+        console.print(f"[bold red]Failed to write JUnit XML:[/bold red] {e}")
+
+
+def _open_failure_export(
+    console: "Console", export_failures: str | None, export_format: str, *, show_env: bool = False
+) -> "BackgroundFailureExporter | None":
+    """
+    Start the export of failed tests; an export that cannot be started is printed, not raised.
+
+    :param console: Console for status messages.
+    :param export_failures: Output path (Excel file or directory), if requested.
+    :param export_format: One of `EXPORT_FORMATS` in `echosphere.core.failure_export`.
+    :param show_env: If True, sheet and file names start with the environment.
+    :return: The exporter, or None if no export is written.
+    """
+    if not export_failures:
+        return None
+    try:
+        from echosphere.core.failure_export import open_failure_exporter
+
+        return open_failure_exporter(export_failures, export_format, show_env=show_env)
+    except Exception as e:
+        console.print(f"[bold red]Failed to export failed test data:[/bold red] {e}")
+        return None
+
+
+def _close_failure_export(console: "Console", failure_export: "BackgroundFailureExporter") -> None:
+    """
+    Finish the export of failed tests and print where it was written.
+
+    :param console: Console for status messages.
+    :param failure_export: The running exporter.
+    :return: None
+    """
+    try:
+        abs_xlsx = failure_export.close()
+    except Exception as e:
+        console.print(f"[bold red]Failed to export failed test data:[/bold red] {e}")
+        return
+    if failure_export.error is not None:
+        console.print(f"[bold red]Failed to export failed test data:[/bold red] {failure_export.error}")
+    console.print(
+        f"[bold green]Failed test data exported to:[/bold green] {abs_xlsx} ({failure_export.exported} tests exported)"
+    )
+
+
+def _open_junit_stream(
+    console: "Console", junitxml: str | None, suite_name: str | None = None
+) -> "StreamingJUnitWriter | None":
+    """
+    Create the streaming JUnit XML writer of a run; a report that cannot be created is printed, not raised.
+
+    :param console: Console for status messages.
+    :param junitxml: Path of the JUnit XML file, optionally with `{subsuite}` and `{env}` placeholders.
+    :param suite_name: Optional JUnit test suite name.
+    :return: The writer, or None if no report is written.
+    """
+    from echosphere.core.junit_export import StreamingJUnitWriter
+
+    if not junitxml:
+        return None
+    try:
+        return StreamingJUnitWriter(junitxml, suite_name) if suite_name else StreamingJUnitWriter(junitxml)
+    except Exception as e:
+        console.print(f"[bold red]Failed to write JUnit XML:[/bold red] {e}")
+        return None
+
+
+def _print_junit_stream(console: "Console", junit_writer: "StreamingJUnitWriter") -> None:
+    """
+    Print where a streamed JUnit XML report was written.
+
+    :param console: Console for the output.
+    :param junit_writer: The closed writer.
+    :return: None
+    """
+    paths = junit_writer.paths
+    if junit_writer.error is not None:
+        console.print(f"[bold red]Failed to write JUnit XML:[/bold red] {junit_writer.error}")
+    if len(paths) == 1:
+        console.print(f"[bold green]JUnit XML results written to:[/bold green] {paths[0]}")
+    elif paths:
+        folder = os.path.commonpath([os.path.dirname(p) for p in paths])
+        console.print(f"[bold green]JUnit XML results written to {len(paths)} files in:[/bold green] {folder}")
+
+
+def _print_environment_summary(console: "Console", envs: list[str], results: "list[TestResult]") -> None:
+    """
+    Print the outcome of a run over several environments, one line per environment.
+
+    :param console: Console for the output.
+    :param envs: Environments of the run, in the order they were selected.
+    :param results: Results of the run.
+    :return: None
+    """
+    from rich.table import Table
+
+    table = Table(title="Results by Environment")
+    for column in ("Environment", "Passed", "Failed", "Errors", "Skipped"):
+        table.add_column(column, justify="left" if column == "Environment" else "right")
+    for e in envs:
+        statuses = [r.status for r in results if r.env == e]
+        table.add_row(e, *(str(statuses.count(status)) for status in ("pass", "fail", "error", "skip")))
+    console.print(table)
+
+
+def _print_summary(results: "list[TestResult]", started_at: float) -> None:
+    """
+    Print the final verdict of a run and exit non-zero if it failed.
+
+    :param results: Results of the run.
+    :param started_at: `time.time()` at the start of the run.
+    :return: None
+    """
+    from rich import print
 
-    e_t = time.time()
-    cum_t = round(e_t - s_t, 3)
+    cum_t = round(time.time() - started_at, 3)
     print("================================================================")
     if len(results) == 0:
         print("[bold]No Tests Executed.[/bold]")
@@ -0,0 +1,46 @@
+"""
+Per-test settings written as SQL comments in a test file.
+
+A directive is a line comment of the form `-- es:<name> = <value>`, e.g.
+
+    -- es:timeout = 600
+    SELECT * FROM orders WHERE amount < 0
+
+Directives can appear anywhere in the file; the database ignores them as comments.
+"""
+
+from __future__ import annotations
+
+import re
+
+_DIRECTIVE = re.compile(r"^\s*--\s*es:([A-Za-z_][\w.]*)\s*=\s*(.*?)\s*$", re.M)
+
+
+def parse_directives(sql: str) -> dict[str, str]:
+    """
+    Return the `-- es:<name> = <value>` directives of a test; later lines win.
+
+    :param sql: Test SQL.
+    :return: Mapping of lower-case directive name to its raw value.
+    """
+    return {m.group(1).lower(): m.group(2) for m in _DIRECTIVE.finditer(sql)}
+
+
+def read_timeout(sql: str) -> float | None:
+    """
+    Return the `es:timeout` directive of a test in seconds.
+
+    :param sql: Test SQL.
+    :return: Timeout in seconds (0 disables the timeout for the test), or None if not set.
+    :raises ValueError: If the value is not a non-negative number.
+    """
+    raw = parse_directives(sql).get("timeout")
+    if raw is None:
+        return None
+    try:
+        value = float(raw)
+    except ValueError:
+        raise ValueError(f"Invalid es:timeout directive '{raw}'. Use a number of seconds.")
+    if value < 0:
+        raise ValueError(f"Invalid es:timeout directive '{raw}'. The timeout cannot be negative.")
+    return value
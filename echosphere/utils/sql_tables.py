@@ -0,0 +1,113 @@
+"""
+Lightweight helpers for test SQL: normalization and extraction of the tables a query reads from.
+
+This is not a SQL parser: it finds identifiers after `FROM` and `JOIN` once
+comments and string literals are removed, and drops names defined as CTEs.
+False positives (e.g. `EXTRACT(YEAR FROM col)`) are harmless for callers that
+treat unknown tables conservatively.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+_IDENT = r'(?:"(?:[^"]|"")+"|`[^`]+`|[A-Za-z_][\w$]*)'
+_QUALIFIED = rf"{_IDENT}(?:\s*\.\s*{_IDENT}){{0,2}}"
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_TABLE = re.compile(rf"\b(?:from|join)\s+({_QUALIFIED})", re.I)
+# `, <table>` after a FROM item (optionally aliased), for implicit joins
+_CONTINUATION = re.compile(rf"\s*(?:(?:as\s+)?{_IDENT}\s*)?,\s*({_QUALIFIED})", re.I)
+_CTE = re.compile(rf"(?:\bwith\b(?:\s+recursive\b)?|,)\s*({_IDENT})\s*(?:\([^)]*\)\s*)?\bas\s*\(", re.I)
+_PART = re.compile(_IDENT)
+# Tokens relevant to normalization: literals and quoted identifiers are kept verbatim
+_NORMALIZE_TOKENS = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|--[^\n]*|/\*.*?\*/|\s+""", re.S)
+
+# Words that can follow FROM/JOIN without being a table name
+_NOT_TABLES = {"lateral", "table", "unnest", "select", "values", "only"}
+
+
+@dataclass(frozen=True, slots=True)
+class TableRef:
+    """A possibly qualified table name as written in SQL; each part records whether it was quoted."""
+
+    parts: tuple[tuple[str, bool], ...]
+
+    def folded(self, upper: bool) -> tuple[str, ...]:
+        """
+        Return the name parts with unquoted identifiers case-folded as the platform does.
+
+        :param upper: True to fold unquoted parts to upper case (Snowflake), False for lower case.
+        :return: Tuple of 1 to 3 name parts.
+        """
+        return tuple(p if quoted else (p.upper() if upper else p.lower()) for p, quoted in self.parts)
+
+    def __str__(self) -> str:
+        """Return the name in SQL notation, quoting parts that were quoted."""
+        return ".".join('"' + p.replace('"', '""') + '"' if quoted else p for p, quoted in self.parts)
+
+
+def _parse_part(raw: str) -> tuple[str, bool]:
+    """Return (identifier, was_quoted) for one name part."""
+    if raw.startswith('"'):
+        return raw[1:-1].replace('""', '"'), True
+    if raw.startswith("`"):
+        return raw[1:-1], True
+    return raw, False
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Return `sql` without comments, with runs of whitespace collapsed and trailing semicolons removed.
+
+    String literals and quoted identifiers are left untouched, so two queries normalize to the
+    same text only if they differ in formatting alone.
+
+    :param sql: Query text.
+    :return: Normalized query text.
+    """
+    parts: list[str] = []
+    pos = 0
+    for match in _NORMALIZE_TOKENS.finditer(sql):
+        if match.start() > pos:
+            parts.append(sql[pos : match.start()])
+        token = match.group(0)
+        if token[0] in "'\"`":
+            parts.append(token)
+        elif parts and not parts[-1].endswith(" "):
+            parts.append(" ")
+        pos = match.end()
+    parts.append(sql[pos:])
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def extract_table_references(sql: str) -> list[TableRef]:
+    """
+    Return the tables referenced after FROM/JOIN in `sql`, without CTE names, in order of appearance.
+
+    :param sql: Query text.
+    :return: List of unique TableRef objects.
+    """
+    text = _STRINGS.sub("''", _COMMENTS.sub(" ", sql))
+    ctes = {_parse_part(m.group(1))[0].lower() for m in _CTE.finditer(text)}
+
+    names: list[str] = []
+    for match in _TABLE.finditer(text):
+        names.append(match.group(1))
+        pos = match.end()
+        while (cont := _CONTINUATION.match(text, pos)) is not None:
+            names.append(cont.group(1))
+            pos = cont.end()
+
+    refs: list[TableRef] = []
+    for name in names:
+        parts = tuple(_parse_part(p) for p in _PART.findall(name))
+        first = parts[0]
+        if len(parts) == 1 and (first[0].lower() in ctes or (not first[1] and first[0].lower() in _NOT_TABLES)):
+            continue
+        ref = TableRef(parts)
+        if ref not in refs:
+            refs.append(ref)
+    return refs
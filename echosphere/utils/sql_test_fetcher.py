@@ -1,6 +1,32 @@
-import glob
+"""
+Discovery of `.es.sql` test files.
+
+The suite directory is walked with `os.scandir` to any depth. Every test is keyed by
+its qualified name: the path relative to the suite directory, lower-cased, with `/`
+separators and without the `.es.sql` suffix (`smoke/orders/no_nulls`). Tests in the
+suite root keep their bare name. Hidden directories and symbolic links to directories
+are not followed.
+
+With a manifest file, the listing of every directory is stored together with the
+directory's modification time. Creating, deleting or renaming an entry changes the
+modification time of its directory, so a later discovery only re-reads directories
+whose modification time changed and takes the other listings from the manifest. A
+directory modified within `MTIME_SLACK_NS` of its scan is always re-read, because a
+second change in the same timestamp tick would not be visible.
+"""
+
+from __future__ import annotations
+
+import json
 import os
-from typing import TypedDict
+import time
+from typing import Any, TypedDict
+
+SQL_FILE_EXT = ".es.sql"
+MANIFEST_FILE = ".es_manifest.json"
+MANIFEST_VERSION = 1
+# Directories whose modification time is this close to their scan time are re-read
+MTIME_SLACK_NS = 2_000_000_000
 
 
 class TestFileInfo(TypedDict):
@@ -10,47 +36,123 @@ class TestFileInfo(TypedDict):
     subfolder: str | None
 
 
-def get_sql_test_files(path: str = "./es_suite", subdir: str | None = None) -> dict[str, TestFileInfo]:
+def default_manifest_path(ini_path: str = "es.ini") -> str:
+    """
+    Return the path of the discovery manifest that sits next to the given es.ini.
+
+    :param ini_path: Path to es.ini.
+    :return: Path of the manifest file.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(ini_path)), MANIFEST_FILE)
+
+
+def get_sql_test_files(
+    path: str = "./es_suite", subdir: str | None = None, manifest_path: str | None = None
+) -> dict[str, TestFileInfo]:
     """
     Generates a dictionary of SQL test file identifiers and their corresponding file information
-    from the specified directory and its immediate subfolders. The function searches for files
-    with the `.es.sql` extension and creates a mapping where the keys are the base names
-    of the files (without the `.es.sql` suffix) in lower case, and the values are dictionaries
-    containing the full path and subfolder information.
+    from the specified directory and all of its subfolders. The function searches for files
+    with the `.es.sql` extension and creates a mapping where the keys are the qualified names
+    of the tests in lower case (`<subfolder>/<name>`, or `<name>` in the suite root), and the
+    values are dictionaries containing the full path and subfolder information.
 
     :param path: Directory path where the `.es.sql` test files are stored. Defaults to "./es_suite".
     :param subdir: Optional subfolder name to filter results. If provided, only
-                   files from this subfolder will be included.
-    :return: A dictionary mapping the base names of the `.es.sql` files to dictionaries containing:
+                   files from this subfolder and its own subfolders will be included.
+    :param manifest_path: Optional manifest file caching directory listings between calls.
+    :return: A dictionary mapping the qualified names of the `.es.sql` files to dictionaries containing:
              - 'full_path': The complete path to the file
-             - 'subfolder': The subfolder name if the file is in a subfolder, None otherwise
+             - 'subfolder': The subfolder path (with `/` separators) if the file is in a subfolder, None otherwise
     """
-    SQL_FILE_EXT = ".es.sql"
+    root = os.path.abspath(path)
+    cached = _load_manifest(manifest_path, root) if manifest_path else {}
+    listings: dict[str, dict[str, Any]] = {}
+    changed = _scan(root, "", cached, listings)
+    if manifest_path and (changed or listings.keys() != cached.keys()):
+        _save_manifest(manifest_path, root, listings)
 
-    def process_file_path(f_p: str) -> tuple[str, str | None]:
-        """Extract the file name and subfolder from a file path."""
-        f_n = os.path.basename(f_p)[: -len(SQL_FILE_EXT)].lower()
-        relative_path = os.path.relpath(f_p, path)
-        subfolder = os.path.dirname(relative_path) if os.path.dirname(relative_path) else None
-        return f_n, subfolder
-
-    # Create the result dictionary
     file_info: dict[str, TestFileInfo] = {}
+    suffix_len = len(SQL_FILE_EXT)
+    for folder, listing in listings.items():
+        if subdir and folder != subdir and not folder.startswith(f"{subdir}/"):
+            continue
+        # Join paths once per folder; suites can hold tens of thousands of files
+        dir_prefix = os.path.join(path, *folder.split("/"), "")
+        key_prefix = f"{folder.lower()}/" if folder else ""
+        subfolder = folder or None
+        for file_name in listing["files"]:
+            file_info[key_prefix + file_name[:-suffix_len].lower()] = {
+                "full_path": dir_prefix + file_name,
+                "subfolder": subfolder,
+            }
+    return file_info
 
-    # Process all files with the SQL extension (both in the main dir and subfolders)
-    all_patterns = [
-        os.path.join(path, f"*{SQL_FILE_EXT}"),  # Main directory
-        os.path.join(path, "*", f"*{SQL_FILE_EXT}"),  # Subfolders
-    ]
 
-    for pattern in all_patterns:
-        for file_path in glob.glob(pattern):
-            file_name, folder = process_file_path(file_path)
+def _scan(root: str, folder: str, cached: dict[str, dict[str, Any]], listings: dict[str, dict[str, Any]]) -> bool:
+    """
+    Collect the listing of `folder` and its subfolders into `listings`, depth first in name order.
 
-            # Skip if we are filtering by subfolder and this file is not in that subfolder
-            if subdir and folder != subdir:
-                continue
+    :param root: Absolute path of the suite directory.
+    :param folder: Folder relative to `root` with `/` separators ("" for the root).
+    :param cached: Listings from the manifest.
+    :param listings: Output mapping of folder to listing.
+    :return: True if any listing had to be read from disk.
+    """
+    directory = os.path.join(root, *folder.split("/")) if folder else root
+    try:
+        mtime = os.stat(directory).st_mtime_ns
+    except OSError:
+        return False
 
-            file_info[file_name] = {"full_path": file_path, "subfolder": folder}
+    listing = cached.get(folder)
+    changed = listing is None or listing["mtime_ns"] != mtime or listing["scanned_ns"] - mtime < MTIME_SLACK_NS
+    if changed:
+        files: list[str] = []
+        dirs: list[str] = []
+        scanned = time.time_ns()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                    elif entry.name.endswith(SQL_FILE_EXT) and entry.is_file():
+                        files.append(entry.name)
+        except OSError:
+            # Unreadable folders contribute no tests, as with glob
+            files, dirs = [], []
+        listing = {"mtime_ns": mtime, "scanned_ns": scanned, "files": sorted(files), "dirs": sorted(dirs)}
 
-    return file_info
+    assert listing is not None
+    listings[folder] = listing
+    for name in listing["dirs"]:
+        changed |= _scan(root, f"{folder}/{name}" if folder else name, cached, listings)
+    return changed
+
+
+def _load_manifest(manifest_path: str, root: str) -> dict[str, dict[str, Any]]:
+    """Return the folder listings stored for `root`, or an empty mapping if the manifest is missing or stale."""
+    try:
+        with open(manifest_path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION or data.get("root") != root:
+        return {}
+    listings: dict[str, dict[str, Any]] = data.get("folders", {})
+    return listings
+
+
+def _save_manifest(manifest_path: str, root: str, listings: dict[str, dict[str, Any]]) -> None:
+    """Write the folder listings atomically; a manifest that cannot be written is simply not cached."""
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "root": root, "folders": listings}, f, separators=(",", ":"))
+        os.replace(tmp_path, manifest_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
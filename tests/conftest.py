@@ -1,8 +1,13 @@
 import os
+from collections.abc import Callable
+from datetime import datetime
 from pathlib import Path
+from typing import Any
 
 import pytest
 
+from echosphere.core.test_result import TestResult
+
 
 @pytest.fixture(scope="session", autouse=True)
 def set_cwd_to_repo_root() -> None:
@@ -26,8 +31,29 @@ def patch_suite_display_fetcher(monkeypatch: pytest.MonkeyPatch, example_suites_
     from echosphere.core import suite_display as sd
     from echosphere.utils import sql_test_fetcher as fetcher
 
-    def replacement(subdir: str | None = None):
+    def replacement(subdir: str | None = None, manifest_path: str | None = None):
         return fetcher.get_sql_test_files(path=str(example_suites_path), subdir=subdir)
 
     monkeypatch.setattr(sd, "get_sql_test_files", replacement)
     yield
+
+
+@pytest.fixture
+def make_result() -> Callable[..., TestResult]:
+    """
+    Return a factory for TestResult objects: a passing test that ran `SELECT 1`, with any
+    field overridden by keyword.
+    """
+
+    def make(name: str, **fields: Any) -> TestResult:
+        values: dict[str, Any] = {
+            "passed": True,
+            "duration": 0.5,
+            "sql": "SELECT 1",
+            "row_count": 0,
+            "timestamp": datetime.fromisoformat("2023-07-15T14:30:24"),
+        }
+        values.update(fields)
+        return TestResult(name=name, **values)
+
+    return make
@@ -0,0 +1,89 @@
+import asyncio
+from typing import Any
+
+import pytest
+
+from echosphere.core.db_runner.BaseClass import BaseRunner
+
+
+class TwoStepRunner(BaseRunner):
+    sample_calls = 0
+    sample_error: Exception | None = None
+
+    @classmethod
+    def dispatch_test(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        return int(test_file_path), 0.5, "SELECT * FROM t"
+
+    @classmethod
+    def fetch_failure_sample(cls, env: str | None, sql: str, limit: int = 1000) -> tuple[list[str], list[tuple[Any]]]:
+        cls.sample_calls += 1
+        if cls.sample_error:
+            raise cls.sample_error
+        return ["a"], [(1,)]
+
+
+class ArrowRunner(TwoStepRunner):
+    ARROW_SAMPLES = True
+
+    @classmethod
+    def fetch_failure_sample_arrow(cls, env: str | None, sql: str, limit: int = 1000) -> Any:
+        import pyarrow as pa
+
+        cls.sample_calls += 1
+        return pa.table({"a": [1, 2]})
+
+
+class TestBaseRunner:
+    def test_windowed_sample_sql_wraps_query(self) -> None:
+        sql = BaseRunner._windowed_sample_sql("SELECT * FROM orders;\n", 10)
+        assert sql == ("SELECT t.*, COUNT(*) OVER () AS __es_total_rows FROM (SELECT * FROM orders) AS t LIMIT 10")
+
+    def test_split_windowed_sample(self) -> None:
+        row_count, cols, rows = BaseRunner._split_windowed_sample(
+            ["id", "name", "__es_total_rows"], [(1, "a", 250), (2, "b", 250)]
+        )
+        assert row_count == 250
+        assert cols == ["id", "name"]
+        assert rows == [(1, "a"), (2, "b")]
+
+    def test_split_windowed_sample_empty_result_is_zero_rows(self) -> None:
+        assert BaseRunner._split_windowed_sample(["id", "__es_total_rows"], []) == (0, ["id"], [])
+
+    def test_default_with_sample_skips_sample_for_passing_test(self) -> None:
+        TwoStepRunner.sample_calls = 0
+        result = TwoStepRunner.dispatch_test_with_sample(env=None, test_file_path="0")
+        assert result == (0, 0.5, "SELECT * FROM t", [], [])
+        assert TwoStepRunner.sample_calls == 0
+
+    def test_default_with_sample_tolerates_sample_errors(self) -> None:
+        TwoStepRunner.sample_error = RuntimeError("warehouse suspended")
+        try:
+            result = TwoStepRunner.dispatch_test_with_sample(env=None, test_file_path="4")
+        finally:
+            TwoStepRunner.sample_error = None
+        assert result == (4, 0.5, "SELECT * FROM t", [], [])
+
+    def test_arrow_samples_are_opt_in(self) -> None:
+        assert not TwoStepRunner.supports_arrow()
+
+    def test_split_windowed_arrow(self) -> None:
+        pa = pytest.importorskip("pyarrow")
+        table = pa.table({"id": [1, 2], "__es_total_rows": [250, 250]})
+
+        row_count, sample = BaseRunner._split_windowed_arrow(table)
+
+        assert row_count == 250
+        assert sample.column_names == ["id"]
+        assert BaseRunner._split_windowed_arrow(table.slice(0, 0))[0] == 0
+
+    def test_default_with_arrow_sample_fetches_only_for_failing_tests(self) -> None:
+        pytest.importorskip("pyarrow")
+        ArrowRunner.sample_calls = 0
+        assert ArrowRunner.supports_arrow()
+
+        assert ArrowRunner.dispatch_test_with_arrow_sample(env=None, test_file_path="0")[3] is None
+        row_count, _, _, table = asyncio.run(ArrowRunner.dispatch_test_with_arrow_sample_async(None, "2"))
+
+        assert row_count == 2
+        assert table.column("a").to_pylist() == [1, 2]
+        assert ArrowRunner.sample_calls == 1
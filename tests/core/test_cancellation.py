@@ -0,0 +1,39 @@
+import pytest
+
+from echosphere.core.db_runner.cancellation import InFlightQueries, QueryCancelledError
+
+
+class TestInFlightQueries:
+    def test_cancels_only_running_queries(self) -> None:
+        registry = InFlightQueries()
+        cancelled: list[str] = []
+        with registry.track(lambda: cancelled.append("done")):
+            pass
+        with registry.track(lambda: cancelled.append("running")):
+            assert registry.cancel_all() == 1
+        assert cancelled == ["running"]
+
+    def test_refuses_new_queries_until_reset(self) -> None:
+        registry = InFlightQueries()
+        registry.cancel_all()
+        cancelled: list[str] = []
+        with pytest.raises(QueryCancelledError):
+            with registry.track(lambda: cancelled.append("late")):
+                raise AssertionError("must not run")
+        # A query submitted just before the abort is still cancelled on the server
+        assert cancelled == ["late"]
+
+        registry.reset()
+        with registry.track(lambda: None):
+            pass
+
+    def test_failing_cancel_does_not_stop_others(self) -> None:
+        registry = InFlightQueries()
+        cancelled: list[int] = []
+
+        def broken() -> None:
+            raise RuntimeError("connection lost")
+
+        with registry.track(broken), registry.track(lambda: cancelled.append(1)):
+            assert registry.cancel_all() == 2
+        assert cancelled == [1]
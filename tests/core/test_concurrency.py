@@ -0,0 +1,144 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from echosphere.core.concurrency import (
+    AdaptiveConcurrencyLimiter,
+    parse_concurrency_overrides,
+    resolve_concurrency_ceiling,
+)
+from echosphere.env_config_parser.validation import ConfigurationError
+
+INI = """
+[default]
+env = env.pg.dev
+max_concurrency = 40
+max_concurrency.snowflake = 100
+
+[env.pg.dev]
+platform = postgres
+host = localhost
+database = db
+user = u
+password = p
+max_concurrency = 6
+
+[env.sf.prod]
+platform = snowflake
+user = u
+password = p
+account = a
+warehouse = w
+role = r
+database = d
+schema = s
+"""
+
+
+async def _run(limiter: AdaptiveConcurrencyLimiter, count: int, delay: float) -> None:
+    async def one() -> None:
+        async with limiter.slot(delay):
+            await asyncio.sleep(delay)
+
+    await asyncio.gather(*(one() for _ in range(count)))
+
+
+class TestAdaptiveConcurrencyLimiter:
+    def test_starts_at_ceiling(self) -> None:
+        limiter = AdaptiveConcurrencyLimiter(10)
+        assert limiter.limit == 10
+
+        asyncio.run(_run(limiter, 30, 0.002))
+
+        assert limiter.peak_in_flight == 10
+
+    def test_slow_start_grows_up_to_ceiling(self) -> None:
+        # Ignore latency so scheduler jitter cannot trigger a decrease
+        limiter = AdaptiveConcurrencyLimiter(10, initial_limit=4, latency_tolerance=float("inf"))
+        assert limiter.limit == 4
+
+        asyncio.run(_run(limiter, 60, 0.002))
+
+        assert limiter.limit == 10
+        assert limiter.peak_in_flight <= 10
+        assert limiter.in_flight == 0
+
+    def test_latency_inflation_decreases_limit(self) -> None:
+        limiter = AdaptiveConcurrencyLimiter(50, initial_limit=20)
+        for _ in range(40):
+            limiter._take()
+            limiter._release(0.01)
+        grown = limiter.limit
+
+        for _ in range(5):
+            limiter._take()
+            limiter._release(1.0)
+
+        assert limiter.decreases >= 1
+        assert limiter.limit < grown
+
+    def test_latency_is_relative_to_expected_duration(self) -> None:
+        async def one(expected: float | None, delay: float) -> None:
+            async with limiter.slot(expected):
+                await asyncio.sleep(delay)
+
+        async def mixed() -> None:
+            await asyncio.gather(*(one(0.001, 0.001) for _ in range(20)))
+            await asyncio.gather(*(one(0.05, 0.05) for _ in range(5)), *(one(None, 0.05) for _ in range(5)))
+
+        limiter = AdaptiveConcurrencyLimiter(10)
+        asyncio.run(mixed())
+
+        # Long tests that take as long as expected, or have no expectation, do not read as latency growth
+        assert limiter.decreases == 0
+        assert limiter.limit == 10
+
+    def test_throttling_halves_limit(self) -> None:
+        limiter = AdaptiveConcurrencyLimiter(32, initial_limit=16)
+        limiter.on_throttled()
+        limiter.on_throttled()
+        assert limiter.limit == 4
+        assert limiter.throttles == 2
+
+    def test_fixed_limiter_stays_at_ceiling(self) -> None:
+        limiter = AdaptiveConcurrencyLimiter(7, adaptive=False)
+        limiter.on_throttled()
+        asyncio.run(_run(limiter, 30, 0.001))
+        assert limiter.limit == 7
+        assert limiter.peak_in_flight == 7
+
+
+class TestConcurrencyCeiling:
+    def test_parse_overrides(self) -> None:
+        assert parse_concurrency_overrides(["8", "postgres=4", "env.sf.prod=128"]) == {
+            None: 8,
+            "postgres": 4,
+            "env.sf.prod": 128,
+        }
+        with pytest.raises(ValueError):
+            parse_concurrency_overrides(["postgres=0"])
+        with pytest.raises(ValueError):
+            parse_concurrency_overrides(["many"])
+
+    def test_precedence(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        (tmp_path / "es.ini").write_text(INI)
+        monkeypatch.chdir(tmp_path)
+
+        # es.ini: environment section, then [default] per platform
+        assert resolve_concurrency_ceiling(None) == 6
+        assert resolve_concurrency_ceiling("env.sf.prod") == 100
+        # CLI: environment, then platform, then bare value
+        assert resolve_concurrency_ceiling("env.pg.dev", {None: 3}) == 3
+        assert resolve_concurrency_ceiling("env.pg.dev", {None: 3, "postgres": 9}) == 9
+        assert resolve_concurrency_ceiling("env.pg.dev", {"postgres": 9, "env.pg.dev": 2}) == 2
+
+    def test_builtin_platform_default_and_invalid_value(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        ini = INI.replace("max_concurrency = 40\nmax_concurrency.snowflake = 100\n", "")
+        (tmp_path / "es.ini").write_text(ini)
+        monkeypatch.chdir(tmp_path)
+        assert resolve_concurrency_ceiling("env.sf.prod") == 64
+
+        (tmp_path / "es.ini").write_text(ini.replace("max_concurrency = 6", "max_concurrency = 0 "))
+        with pytest.raises(ConfigurationError, match="at least 1"):
+            resolve_concurrency_ceiling(None)
@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+
+from echosphere.core.db_runner.connection_pool import ConnectionPool, close_all_pools, get_pool
+
+
+class FakeConnection:
+    def __init__(self, ident: int) -> None:
+        """Create the fake."""
+        self.ident = ident
+        self.closed = False
+        self.healthy = True
+
+
+def _make_pool(max_size: int = 2, health_check_interval: float = 30.0) -> tuple[ConnectionPool, list[FakeConnection]]:
+    created: list[FakeConnection] = []
+
+    def factory() -> FakeConnection:
+        conn = FakeConnection(len(created))
+        created.append(conn)
+        return conn
+
+    def closer(conn: FakeConnection) -> None:
+        conn.closed = True
+
+    pool = ConnectionPool(
+        factory=factory,
+        health_check=lambda c: c.healthy,
+        closer=closer,
+        max_size=max_size,
+        health_check_interval=health_check_interval,
+    )
+    return pool, created
+
+
+class TestConnectionPool:
+    def test_reuses_released_connection(self) -> None:
+        pool, created = _make_pool()
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        assert first is second
+        assert len(created) == 1
+
+    def test_opens_up_to_max_size_then_blocks(self) -> None:
+        pool, created = _make_pool(max_size=2)
+        acquired = threading.Event()
+
+        with pool.connection(), pool.connection():
+            assert pool.open_connections == 2
+
+            def borrow() -> None:
+                with pool.connection():
+                    acquired.set()
+
+            t = threading.Thread(target=borrow)
+            t.start()
+            assert not acquired.wait(0.1)
+        t.join(timeout=1)
+        assert acquired.is_set()
+        assert len(created) == 2
+
+    def test_unhealthy_connection_is_replaced_after_error(self) -> None:
+        pool, _ = _make_pool()
+        with pytest.raises(RuntimeError):
+            with pool.connection() as conn:
+                conn.healthy = False
+                raise RuntimeError("query failed")
+
+        with pool.connection() as replacement:
+            pass
+        assert replacement is not conn
+        assert conn.closed is True
+        assert pool.open_connections == 1
+
+    def test_stale_connection_is_health_checked(self) -> None:
+        pool, created = _make_pool(health_check_interval=0.0)
+        with pool.connection() as conn:
+            pass
+        conn.healthy = False
+        with pool.connection() as replacement:
+            pass
+        assert replacement is not conn
+        assert len(created) == 2
+
+    def test_close_closes_idle_connections(self) -> None:
+        pool, created = _make_pool()
+        with pool.connection():
+            pass
+        pool.close()
+        assert all(c.closed for c in created)
+        with pytest.raises(RuntimeError):
+            with pool.connection():
+                pass
+
+    def test_registry_returns_same_pool_per_key(self) -> None:
+        pool, _ = _make_pool()
+        try:
+            assert get_pool(("Runner", "env.a"), lambda: pool) is pool
+            assert get_pool(("Runner", "env.a"), lambda: _make_pool()[0]) is pool
+        finally:
+            close_all_pools()
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import time
+from typing import Any
+
+import pytest
+
+from echosphere.core import run_async_tests
+from echosphere.core.db_runner.BaseClass import BaseRunner
+from echosphere.core.distributed import Coordinator, Worker
+
+
+class RowsRunner(BaseRunner):
+    """Runner returning the number of rows encoded in the test file name."""
+
+    @classmethod
+    def dispatch_test(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        if test_file_path.startswith("slow"):
+            time.sleep(0.3)
+        return int(test_file_path.rsplit("_", 1)[-1]), 0.01, f"SELECT '{test_file_path}'"
+
+    @classmethod
+    def fetch_failure_sample(cls, env: str | None, sql: str, limit: int = 1000) -> tuple[list[str], list[tuple[Any]]]:
+        return ["col"], [("value",)]
+
+
+@pytest.fixture(autouse=True)
+def _suite(tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "es.ini").write_text("[default]\nenv = dev\n")
+    monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: RowsRunner)
+
+
+def _test_files(names: list[str]) -> dict[str, Any]:
+    files = {}
+    for name in names:
+        with open(name, "w") as f:
+            f.write("SELECT 1")
+        files[name] = {"full_path": name, "subfolder": "smoke"}
+    return files
+
+
+async def _run(coordinator: Coordinator, *clients: Any) -> tuple[list[Any], list[Any]]:
+    ready = asyncio.Event()
+    serving = asyncio.create_task(coordinator.serve(lambda port: ready.set()))
+    await ready.wait()
+    outcomes = await asyncio.gather(*(client(coordinator.port) for client in clients))
+    return await serving, list(outcomes)
+
+
+class TestCoordinator:
+    def test_workers_share_the_suite_and_results_arrive_in_dispatch_order(self) -> None:
+        names = [f"t{i}_{i % 3 == 0:d}" for i in range(20)]
+        coordinator = Coordinator(_test_files(names), "dev", port=0, capture_failure_data=True)
+
+        results, executed = asyncio.run(
+            _run(coordinator, *(lambda port: Worker(port=port, max_in_flight=2).run() for _ in range(3)))
+        )
+
+        assert [r.name for r in results] == names
+        assert sum(executed) == len(names)
+        assert coordinator.workers_seen == 3
+        failed = [r for r in results if not r.passed]
+        assert {r.name for r in failed} == {n for n in names if n.endswith("_1")}
+        assert all(r.failure_columns == ["col"] and r.subsuite == "smoke" for r in failed)
+
+    def test_tests_of_a_lost_worker_are_requeued(self) -> None:
+        names = [f"t{i}_0" for i in range(6)]
+        coordinator = Coordinator(_test_files(names), "dev", port=0)
+        leased: list[str] = []
+
+        async def vanishing_worker(port: int) -> None:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b'{"type": "hello", "name": "flaky"}\n{"type": "request", "slots": 4}\n')
+            await reader.readline()  # welcome
+            leased.extend(t["name"] for t in json.loads(await reader.readline())["tests"])
+            writer.close()
+
+        async def late_worker(port: int) -> int:
+            await asyncio.sleep(0.1)
+            return await Worker(port=port, max_in_flight=2).run()
+
+        results, (_, executed) = asyncio.run(_run(coordinator, vanishing_worker, late_worker))
+
+        assert leased
+        assert executed == len(names)
+        assert [r.name for r in results] == names
+        assert all(r.passed for r in results)
+
+    def test_a_slow_test_does_not_hold_back_the_other_slots(self) -> None:
+        names = ["slow_0", *(f"t{i}_0" for i in range(6))]
+        finished: list[str] = []
+        coordinator = Coordinator(_test_files(names), "dev", port=0, on_result=lambda r: finished.append(r.name))
+
+        _, (executed,) = asyncio.run(_run(coordinator, lambda port: Worker(port=port, max_in_flight=2).run()))
+
+        assert executed == len(names)
+        # The second slot keeps pulling tests while the slow one runs
+        assert finished[-1] == "slow_0"
+
+    def test_batches_shrink_as_the_queue_drains(self) -> None:
+        coordinator = Coordinator(_test_files([f"t{i}_0" for i in range(8)]), "dev", port=0)
+        coordinator._connected = 2
+
+        assert coordinator._batch_size(100) == 2
+        assert coordinator._batch_size(1) == 1
+        coordinator._queue.clear()
+        assert coordinator._batch_size(100) == 1
+
+    def test_empty_suite_returns_at_once(self) -> None:
+        assert asyncio.run(Coordinator({}, "dev", port=0).serve()) == []
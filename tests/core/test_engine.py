@@ -0,0 +1,310 @@
+import asyncio
+import threading
+import time
+from typing import Any
+
+import pytest
+
+from echosphere.core import engine, run_async_tests
+from echosphere.core.db_runner.BaseClass import BaseRunner
+from echosphere.core.db_runner.cancellation import QueryCancelledError, track_query
+from echosphere.core.engine import AsyncTestEngine, EnvironmentRun
+
+
+class BlockingRunner(BaseRunner):
+    """Runner without a native async driver; rows are encoded in the test file name."""
+
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    @classmethod
+    def dispatch_test(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        time.sleep(0.01)
+        with cls.lock:
+            cls.active -= 1
+        return int(test_file_path.rsplit("_", 1)[-1]), 0.01, f"SELECT '{test_file_path}'"
+
+    @classmethod
+    def fetch_failure_sample(cls, env: str | None, sql: str, limit: int = 1000) -> tuple[list[str], list[tuple[Any]]]:
+        return ["col"], [("value",)]
+
+
+class NativeAsyncRunner(BlockingRunner):
+    """Runner overriding the async contract, as a native async driver would."""
+
+    in_flight = 0
+    peak_in_flight = 0
+
+    @classmethod
+    def dispatch_test(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        raise AssertionError("blocking path must not be used")
+
+    @classmethod
+    async def dispatch_test_async(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        cls.in_flight += 1
+        cls.peak_in_flight = max(cls.peak_in_flight, cls.in_flight)
+        await asyncio.sleep(0.01)
+        cls.in_flight -= 1
+        return 0, 0.01, "SELECT 1"
+
+
+class ThrottledRunner(NativeAsyncRunner):
+    """Runner whose first call is rejected with a throttling error."""
+
+    calls = 0
+
+    @classmethod
+    async def dispatch_test_async(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        cls.calls += 1
+        if cls.calls == 1:
+            raise RuntimeError("Too many connections")
+        return 0, 0.01, "SELECT 1"
+
+
+class MixedDurationRunner(NativeAsyncRunner):
+    """Runner whose "long" tests take much longer than the others."""
+
+    @classmethod
+    async def dispatch_test_async(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        duration = 0.2 if test_file_path.startswith("long") else 0.005
+        await asyncio.sleep(duration)
+        return 0, duration, "SELECT 1"
+
+
+class CancellableRunner(NativeAsyncRunner):
+    """Runner whose "fail" tests fail at once while the others run until cancelled on the server."""
+
+    @classmethod
+    async def dispatch_test_async(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        if "fail" in test_file_path:
+            await asyncio.sleep(0.01)
+            return 1, 0.01, "SELECT 1"
+        stop = threading.Event()
+        with track_query(stop.set):
+            if await asyncio.to_thread(stop.wait, 5):
+                raise QueryCancelledError("cancelled")
+        return 0, 5.0, "SELECT 1"
+
+
+@pytest.fixture(autouse=True)
+def _in_tmp_path(tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    # The engine reads every test file for its directives; test files are created in the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def _test_file(path: str, subfolder: str | None = None, sql: str = "SELECT 1") -> dict[str, Any]:
+    with open(path, "w") as f:
+        f.write(sql)
+    return {"full_path": path, "subfolder": subfolder}
+
+
+def _test_files(count: int, rows: int = 0) -> dict[str, Any]:
+    return {f"t{i}": _test_file(f"t{i}_{rows}") for i in range(count)}
+
+
+class TestAsyncTestEngine:
+    def test_blocking_runner_is_bounded_by_executor(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: BlockingRunner)
+        BlockingRunner.peak = 0
+
+        results = AsyncTestEngine(max_in_flight=100, blocking_workers=3).run(_test_files(20), env=None)
+
+        assert len(results) == 20
+        assert all(r.passed for r in results)
+        assert BlockingRunner.peak <= 3
+
+    def test_native_async_runner_respects_in_flight_limit(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: NativeAsyncRunner)
+        NativeAsyncRunner.peak_in_flight = 0
+
+        results = AsyncTestEngine(max_in_flight=5, adaptive=False).run(_test_files(30), env=None)
+
+        assert len(results) == 30
+        assert NativeAsyncRunner.peak_in_flight == 5
+
+    def test_adaptive_engine_stays_below_ceiling(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: NativeAsyncRunner)
+        NativeAsyncRunner.peak_in_flight = 0
+
+        eng = AsyncTestEngine(max_in_flight=5)
+        results = eng.run(_test_files(30), env=None)
+
+        assert len(results) == 30
+        assert NativeAsyncRunner.peak_in_flight <= 5
+        assert eng.limiter is not None and eng.limiter.in_flight == 0
+
+    def test_adaptive_engine_keeps_up_with_fixed_concurrency_on_mixed_durations(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: MixedDurationRunner)
+        test_files = {
+            **{f"long{i}": _test_file(f"long{i}_0") for i in range(8)},
+            **{f"short{i}": _test_file(f"short{i}_0") for i in range(200)},
+        }
+        expected = {name: 0.2 if name.startswith("long") else 0.005 for name in test_files}
+        run = EnvironmentRun(None, test_files, expected_durations=expected)
+
+        def elapsed(eng: AsyncTestEngine) -> float:
+            start = time.monotonic()
+            assert len(eng.run_environments([run])) == 208
+            return time.monotonic() - start
+
+        fixed = elapsed(AsyncTestEngine(max_in_flight=10, adaptive=False))
+        adaptive_engine = AsyncTestEngine(max_in_flight=10)
+        adaptive = elapsed(adaptive_engine)
+
+        assert adaptive_engine.limiter is not None and adaptive_engine.limiter.decreases == 0
+        assert adaptive < fixed * 1.5
+
+    def test_failure_sample_is_captured(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: BlockingRunner)
+
+        results = AsyncTestEngine().run(_test_files(2, rows=3), env=None, capture_failure_data=True)
+
+        assert all(not r.passed for r in results)
+        assert all(r.row_count == 3 for r in results)
+        assert all(r.failure_columns == ["col"] for r in results)
+        assert all(r.failure_rows == [("value",)] for r in results)
+
+    def test_throttled_test_is_retried_and_limit_cut(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: ThrottledRunner)
+        monkeypatch.setattr(engine, "THROTTLE_BACKOFF_SECONDS", 0)
+        ThrottledRunner.calls = 0
+
+        eng = AsyncTestEngine(max_in_flight=8)
+        results = eng.run(_test_files(1), env=None)
+
+        assert [r.passed for r in results] == [True]
+        assert ThrottledRunner.calls == 2
+        assert eng.limiter is not None and eng.limiter.throttles == 1
+
+    def test_invalid_limits_raise(self) -> None:
+        with pytest.raises(ValueError):
+            AsyncTestEngine(max_in_flight=0)
+        with pytest.raises(ValueError):
+            AsyncTestEngine(max_failures=0)
+
+    def test_max_failures_stops_run_and_cancels_queries(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: CancellableRunner)
+        files: dict[str, Any] = {f"slow{i}": _test_file(f"slow{i}") for i in range(3)}
+        files |= {f"fail{i}": _test_file(f"fail{i}", "s") for i in range(4)}
+        files |= {f"late{i}": _test_file(f"late{i}") for i in range(5)}
+
+        start = time.monotonic()
+        eng = AsyncTestEngine(max_in_flight=7, adaptive=False, max_failures=2)
+        results = eng.run(files, env=None)
+
+        # The event loop only closes once the executor threads finished, i.e. after the cancellation
+        assert time.monotonic() - start < 4
+        assert eng.stopped_early
+        assert eng.cancelled_queries >= 3
+        assert sorted(r.name for r in results) == sorted(files)
+        failed = [r for r in results if not r.passed]
+        assert len(failed) >= 2
+        skipped = [r for r in results if r.skipped]
+        assert {r.name for r in skipped} >= {f"late{i}" for i in range(5)} | {f"slow{i}" for i in range(3)}
+        assert all(r.skip_message == "not run: stopped after 2 failed test(s)" for r in skipped)
+
+    def test_cached_results_skip_execution(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Any) -> None:
+        from echosphere.core.result_cache import ResultCache
+
+        monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: BlockingRunner)
+        (tmp_path / "es.ini").write_text("[default]\nenv = dev\n")
+        files = {}
+        for name in ("a_0", "b_2"):
+            (tmp_path / name).write_text(f"SELECT '{name}'")
+            files[name] = {"full_path": str(tmp_path / name), "subfolder": "smoke"}
+
+        with ResultCache(str(tmp_path / "cache.sqlite")) as cache:
+            first = AsyncTestEngine(cache=cache).run(files, env="dev")
+            assert not any(r.cached for r in first)
+
+            BlockingRunner.peak = 0
+            second = AsyncTestEngine(cache=cache).run(files, env="dev")
+            assert BlockingRunner.peak == 0
+            assert all(r.cached and r.subsuite == "smoke" for r in second)
+            assert {r.name: r.row_count for r in second} == {"a_0": 0, "b_2": 2}
+
+            # A failure sample was never captured, so exports still execute the failing test
+            third = AsyncTestEngine(cache=cache).run(files, env="dev", capture_failure_data=True)
+            assert {r.name: r.cached for r in third} == {"a_0": True, "b_2": False}
+
+            refreshed = AsyncTestEngine(cache=cache, read_cache=False).run(files, env="dev")
+            assert not any(r.cached for r in refreshed)
+
+    def test_timed_out_test_is_cancelled_and_reported_as_error(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: CancellableRunner)
+        files = {
+            "slow": _test_file("slow"),
+            "slow_directive": _test_file("slow_directive", sql="-- es:timeout = 0.1\nSELECT 1"),
+            "fail": _test_file("fail"),
+        }
+
+        start = time.monotonic()
+        results = {r.name: r for r in AsyncTestEngine(timeout=0.2).run(files, env=None)}
+
+        assert time.monotonic() - start < 4
+        assert results["fail"].status == "fail"
+        for name in ("slow", "slow_directive"):
+            assert results[name].status == "error"
+            assert "Timed out" in (results[name].error_message or "")
+        assert results["slow_directive"].duration < results["slow"].duration
+
+    def test_run_deadline_cancels_running_and_skips_pending_tests(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: CancellableRunner)
+        files = {f"slow{i}": _test_file(f"slow{i}") for i in range(4)}
+
+        eng = AsyncTestEngine(max_in_flight=2, adaptive=False, run_timeout=0.2)
+        results = eng.run(files, env=None)
+
+        assert eng.deadline_exceeded and eng.cancelled_queries == 2
+        assert sorted(r.status for r in results) == ["error", "error", "skip", "skip"]
+
+    def test_invalid_timeout_directive_is_an_error(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: BlockingRunner)
+        files = {"t": _test_file("t_0", sql="-- es:timeout = soon\nSELECT 1")}
+
+        [result] = AsyncTestEngine().run(files, env=None)
+
+        assert result.status == "error"
+        assert "es:timeout" in (result.error_message or "")
+
+    def test_on_start_is_called_once_per_executed_test(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: BlockingRunner)
+        started: list[tuple[str, str | None]] = []
+
+        results = AsyncTestEngine(on_start=lambda name, env: started.append((name, env))).run(_test_files(3), "dev")
+
+        assert sorted(started) == [("t0", "dev"), ("t1", "dev"), ("t2", "dev")]
+        assert len(results) == 3
+
+
+class TestEnvironmentRuns:
+    def test_each_environment_runs_the_suite_under_its_own_limit(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        from echosphere.core.engine import EnvironmentRun
+
+        monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: BlockingRunner)
+        files = {"pass": _test_file("pass_0"), "fail": _test_file("fail_3")}
+        eng = AsyncTestEngine(max_in_flight=4)
+
+        results = eng.run_environments(
+            [EnvironmentRun("dev", files, max_in_flight=1), EnvironmentRun("prod", files, max_in_flight=3)]
+        )
+
+        assert sorted((r.env, r.name, r.passed) for r in results) == [
+            ("dev", "fail", False),
+            ("dev", "pass", True),
+            ("prod", "fail", False),
+            ("prod", "pass", True),
+        ]
+        assert {env: limiter.max_limit for env, limiter in eng.limiters.items()} == {"dev": 1, "prod": 3}
+
+    def test_environments_must_be_distinct(self) -> None:
+        from echosphere.core.engine import EnvironmentRun
+
+        with pytest.raises(ValueError):
+            AsyncTestEngine().run_environments([EnvironmentRun("dev", {}), EnvironmentRun("dev", {})])
@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+
+import pytest
+from openpyxl import load_workbook
+
+from echosphere.core.excel_export import FailedTestExporter, StreamingFailedTestExporter
+
+# Overrides for a failed test whose sample holds aware and naive datetimes
+FAILED = {
+    "passed": False,
+    "sql": "SELECT order_id, note, created_at FROM orders WHERE amount < 0",
+    "row_count": 2,
+    "failure_columns": ["order_id", "note", "created_at"],
+    "failure_rows": [
+        (1, "refund issued twice for this order", datetime(2023, 7, 1, 12, tzinfo=timezone.utc)),
+        (2, None, datetime(2023, 7, 2, 8)),
+    ],
+}
+
+
+def test_streaming_export_matches_the_in_memory_export(tmp_path, make_result) -> None:
+    results = [make_result("negative_amounts", **FAILED), make_result("ok")]
+    in_memory = FailedTestExporter()
+    in_memory.add_results(results)
+    expected = load_workbook(in_memory.write_to_file(str(tmp_path / "expected.xlsx")))["negative_amounts"]
+
+    with StreamingFailedTestExporter(str(tmp_path / "reports" / "failures")) as exporter:
+        for r in results:
+            exporter.add_result(r)
+
+    assert exporter.exported == 1 and exporter.error is None
+    ws = load_workbook(tmp_path / "reports" / "failures.xlsx")["negative_amounts"]
+    assert list(ws.values) == list(expected.values)
+    assert ws.freeze_panes == expected.freeze_panes == "A8"
+    assert ws["A1"].font.b and ws["A7"].font.b
+    for column in ("A", "B", "C"):
+        assert ws.column_dimensions[column].width == expected.column_dimensions[column].width
+    # Aware datetimes are stored without their time zone
+    assert ws["C8"].value == datetime(2023, 7, 1, 12)
+
+
+def test_streaming_export_names_sheets_after_the_environment(tmp_path, make_result) -> None:
+    exporter = StreamingFailedTestExporter(str(tmp_path / "failures.xlsx"), show_env=True)
+    exporter.add_results(
+        [make_result("negative_amounts", env="dev", **FAILED), make_result("negative_amounts", env="prod", **FAILED)]
+    )
+
+    wb = load_workbook(exporter.close())
+
+    assert wb.sheetnames == ["dev negative_amounts", "prod negative_amounts"]
+    assert wb["prod negative_amounts"]["B2"].value == "prod"
+
+
+def test_streaming_export_without_failures_writes_a_placeholder_sheet(tmp_path, make_result) -> None:
+    exporter = StreamingFailedTestExporter(str(tmp_path / "failures.xlsx"))
+    exporter.add_result(make_result("ok"))
+
+    wb = load_workbook(exporter.close())
+
+    assert wb.sheetnames == ["No Failures"]
+    assert exporter.exported == 0
+
+
+def test_streaming_export_writes_arrow_samples_like_rows(tmp_path, make_result) -> None:
+    pa = pytest.importorskip("pyarrow")
+    expected = make_result("negative_amounts", **FAILED)
+    columnar = make_result("negative_amounts", **FAILED)
+    columnar.failure_rows = None
+    columnar.failure_table = pa.Table.from_pylist(
+        [dict(zip(expected.failure_columns or [], row)) for row in expected.failure_rows or []]
+    )
+
+    sheets = []
+    for name, r in (("rows", expected), ("arrow", columnar)):
+        with StreamingFailedTestExporter(str(tmp_path / f"{name}.xlsx")) as exporter:
+            exporter.add_result(r)
+        sheets.append(list(load_workbook(tmp_path / f"{name}.xlsx")["negative_amounts"].values))
+
+    assert sheets[0] == sheets[1]
+    assert columnar.to_dict()["failure_rows"][1][:2] == [2, None]
@@ -0,0 +1,64 @@
+import csv
+import gzip
+import json
+
+import pytest
+
+from echosphere.core.failure_export import (
+    CsvFailureExporter,
+    ParquetFailureExporter,
+    open_failure_exporter,
+)
+
+# Overrides for a failed test whose sample mixes value types in one column
+FAILED = {
+    "passed": False,
+    "sql": "SELECT id, code FROM orders WHERE amount < 0",
+    "row_count": 1200,
+    "subsuite": "daily/orders",
+    "failure_columns": ["id", "code"],
+    "failure_rows": [(1, "A"), (2, 7), (3, None)],
+}
+
+
+def test_csv_export_writes_one_gzip_file_per_failed_test_and_a_sidecar(tmp_path, make_result) -> None:
+    with CsvFailureExporter(str(tmp_path / "failures")) as exporter:
+        exporter.add_results([make_result("daily/orders/negative", **FAILED), make_result("ok")])
+
+    with gzip.open(tmp_path / "failures" / "daily_orders_negative.csv.gz", "rt", newline="") as f:
+        assert list(csv.reader(f)) == [["id", "code"], ["1", "A"], ["2", "7"], ["3", ""]]
+    metadata = json.loads((tmp_path / "failures" / "_metadata.json").read_text())
+    assert metadata["format"] == "csv"
+    [entry] = metadata["tests"]
+    assert entry["name"] == "daily/orders/negative"
+    assert entry["sql"].startswith("SELECT id")
+    assert (entry["row_count"], entry["sample_rows"]) == (1200, 3)
+    assert entry["timestamp"] == "2023-07-15T14:30:24"
+    assert entry["file"] == "daily_orders_negative.csv.gz"
+
+
+def test_parquet_export_keeps_types_and_embeds_the_metadata(tmp_path, make_result) -> None:
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    columnar = make_result("negative", env="prod", **FAILED)
+    columnar.failure_rows = None
+    columnar.failure_table = pa.table({"id": [1, 2], "amount": [-1.5, -2.0]})
+
+    exporter = ParquetFailureExporter(str(tmp_path), show_env=True)
+    exporter.add_results([make_result("negative", env="dev", **FAILED), columnar])
+    exporter.close()
+
+    table = pq.read_table(tmp_path / "prod__negative.parquet")
+    assert table.column("amount").to_pylist() == [-1.5, -2.0]
+    assert table.schema.metadata[b"echosphere.test"] == b"negative"
+    assert table.schema.metadata[b"echosphere.row_count"] == b"1200"
+    # Mixed values in a row sample become strings instead of failing the export
+    mixed = pq.read_table(tmp_path / "dev__negative.parquet")
+    assert mixed.column("code").to_pylist() == ["A", "7", None]
+    assert mixed.column("id").type == pa.int64()
+    assert [e["env"] for e in json.loads((tmp_path / "_metadata.json").read_text())["tests"]] == ["dev", "prod"]
+
+
+def test_unknown_export_format_raises(tmp_path, make_result) -> None:
+    with pytest.raises(ValueError):
+        open_failure_exporter(str(tmp_path), "json")
@@ -0,0 +1,64 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from echosphere.core.failure_spool import FailureSpool
+from echosphere.core.test_result import TestResult
+
+
+def _result(rows: list[tuple[object, ...]]) -> TestResult:
+    return TestResult(
+        name="negative_amounts",
+        passed=False,
+        duration=0.5,
+        sql="SELECT id, note FROM orders WHERE amount < 0",
+        row_count=len(rows),
+        timestamp=datetime.fromisoformat("2023-07-15T14:30:24"),
+        failure_columns=["id", "note"],
+        failure_rows=rows,
+    )
+
+
+def test_samples_spill_to_disk_beyond_the_memory_budget(tmp_path) -> None:
+    rows = [(i, f"note {i}") for i in range(200)]
+    first, second = _result(rows), _result(rows)
+
+    with FailureSpool(memory_budget=4096, directory=str(tmp_path)) as spool:
+        spool.add(first)
+        spool.add(second)
+
+        assert first.failure_rows is None and second.failure_rows is None
+        assert first.failure_sample is not None and spool.in_memory == first.failure_sample.nbytes
+        assert spool.spilled == 1 and len(os.listdir(next(tmp_path.iterdir()))) == 1
+        assert list(first.iter_failure_rows()) == list(second.iter_failure_rows()) == rows
+        assert second.to_dict()["failure_rows"][0] == [0, "note 0"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_byte_limit_truncates_the_sample() -> None:
+    result = _result([(i, f"{i:0>100}") for i in range(1000)])
+
+    with FailureSpool() as spool:
+        spool.add(result, max_bytes=10 * 1024)
+        ref = result.failure_sample
+
+        assert ref is not None and ref.truncated
+        assert ref.nbytes <= 10 * 1024
+        assert 0 < result.sample_size == ref.rows < 1000
+        assert result.row_count == 1000
+
+
+def test_arrow_samples_are_read_back_from_spool_files(tmp_path) -> None:
+    pa = pytest.importorskip("pyarrow")
+    result = _result([])
+    result.failure_rows = None
+    result.failure_table = pa.table({"id": [1, 2], "amount": [-1.5, -2.0]})
+
+    with FailureSpool(memory_budget=0, directory=str(tmp_path)) as spool:
+        spool.add(result)
+
+        assert result.failure_table is None and spool.spilled == 1
+        table = result.failure_arrow()
+        assert table is not None and table.column("amount").to_pylist() == [-1.5, -2.0]
+        assert list(result.iter_failure_rows()) == [(1, -1.5), (2, -2.0)]
@@ -0,0 +1,90 @@
+from collections.abc import Callable
+from pathlib import Path
+
+from echosphere.core.history import DurationHistory, Expectation, order_longest_first
+from echosphere.core.test_result import TestResult
+
+
+class TestDurationHistory:
+    def test_records_and_estimates_per_environment(
+        self, tmp_path: Path, make_result: Callable[..., TestResult]
+    ) -> None:
+        with DurationHistory(str(tmp_path / "h.sqlite")) as history:
+            history.record_run(
+                "dev", [make_result("a", duration=1.0), make_result("b", duration=10.0, subsuite="sales")]
+            )
+            history.record_run(
+                "dev", [make_result("a", duration=3.0), make_result("b", duration=10.0, subsuite="sales")]
+            )
+            history.record_run("prod", [make_result("a", duration=100.0)])
+
+            dev = history.expectations("dev")
+
+        assert dev["a"].duration == 2.0
+        assert dev["a"].samples == 2
+        assert dev["b"].variance == 0.0
+        assert "a" in DurationHistory(str(tmp_path / "h.sqlite")).expectations("prod")
+
+    def test_window_limits_samples_and_expected_error_is_used(
+        self, tmp_path: Path, make_result: Callable[..., TestResult]
+    ) -> None:
+        with DurationHistory(str(tmp_path / "h.sqlite")) as history:
+            for _ in range(5):
+                history.record_run("dev", [make_result("a", duration=1.0)])
+            history.record_run("dev", [make_result("a", duration=2.0)], {"a": Expectation(1.0, 0.0, 5)})
+
+            exp = history.expectations("dev", window=2)["a"]
+
+        assert exp.samples == 2
+        assert exp.duration == 1.5
+        # One scheduled observation, 100% off its expectation
+        assert exp.variance == 1.0
+
+    def test_errors_are_not_recorded(self, tmp_path: Path, make_result: Callable[..., TestResult]) -> None:
+        timed_out = make_result("a", duration=0.5)
+        timed_out.passed = False
+        timed_out.error_message = "Timed out after 0.5s; the query was cancelled."
+        with DurationHistory(str(tmp_path / "h.sqlite")) as history:
+            history.record_run("dev", [make_result("a", duration=30.0)])
+            history.record_run("dev", [timed_out, make_result("b", duration=2.0)])
+
+            dev = history.expectations("dev")
+
+        assert (dev["a"].duration, dev["a"].samples) == (30.0, 1)
+        assert dev["b"].samples == 1
+
+
+class TestOrderLongestFirst:
+    def test_longest_first_with_variance_tie_break(self) -> None:
+        expectations = {
+            "short": Expectation(1.0, 0.0, 3),
+            "long_noisy": Expectation(60.0, 0.5, 3),
+            "long_stable": Expectation(60.0, 0.01, 3),
+            "mid": Expectation(10.0, 0.0, 3),
+        }
+        order = order_longest_first(["short", "new", "long_noisy", "mid", "long_stable"], expectations)
+        # Unknown tests take the median expected duration (35s here)
+        assert order == ["long_stable", "long_noisy", "new", "mid", "short"]
+
+    def test_without_history_keeps_discovery_order(self) -> None:
+        assert order_longest_first(["c", "a", "b"], {}) == ["c", "a", "b"]
+
+
+def test_upgrades_version_1_database(tmp_path: Path, make_result: Callable[..., TestResult]) -> None:
+    import sqlite3
+
+    path = tmp_path / "h.sqlite"
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT, started_at TEXT NOT NULL, env TEXT NOT NULL, tag TEXT);
+        CREATE TABLE results (run_id INTEGER NOT NULL, test TEXT NOT NULL, subsuite TEXT, duration REAL NOT NULL,
+                              expected REAL, passed INTEGER NOT NULL);
+        PRAGMA user_version = 1;
+        """
+    )
+    conn.close()
+
+    with DurationHistory(str(path)) as history:
+        history.record_run("dev", [make_result("a", duration=1.0)], fingerprints={"a": "f1"})
+        assert history.passing_fingerprints("dev", ["f1", "f2"]) == {"f1"}
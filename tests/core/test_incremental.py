@@ -0,0 +1,76 @@
+from collections.abc import Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import Any, ClassVar
+
+from echosphere.core.db_runner.BaseClass import BaseRunner
+from echosphere.core.history import DurationHistory
+from echosphere.core.incremental import plan_incremental_run
+from echosphere.core.test_result import TestResult
+from echosphere.utils.sql_tables import TableRef
+
+
+class VersionedRunner(BaseRunner):
+    versions: ClassVar[dict[str, str | None]] = {}
+
+    @classmethod
+    def dispatch_test(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        raise AssertionError("not executed in planning")
+
+    @classmethod
+    def fetch_failure_sample(cls, env: str | None, sql: str, limit: int = 1000) -> tuple[list[str], list[tuple[Any]]]:
+        raise AssertionError("not executed in planning")
+
+    @classmethod
+    def table_versions(cls, env: str | None, tables: Sequence[TableRef]) -> dict[TableRef, str | None]:
+        return {ref: cls.versions.get(str(ref)) for ref in tables}
+
+
+class PlainRunner(VersionedRunner):
+    @classmethod
+    def table_versions(cls, env: str | None, tables: Sequence[TableRef]) -> dict[TableRef, str | None]:
+        return BaseRunner.table_versions(env, tables)
+
+
+def _suite(tmp_path: Path) -> dict[str, Any]:
+    files = {"orders": "SELECT * FROM orders WHERE id IS NULL", "mixed": "SELECT * FROM orders JOIN my_view ON 1=1"}
+    out = {}
+    for name, sql in files.items():
+        path = tmp_path / f"{name}.es.sql"
+        path.write_text(sql)
+        out[name] = {"full_path": str(path), "subfolder": None}
+    return out
+
+
+def _passed(name: str) -> TestResult:
+    return TestResult(name=name, passed=True, duration=1.0, sql="", row_count=0, timestamp=datetime.now())
+
+
+class TestIncrementalPlan:
+    def test_skips_unchanged_passing_tests_only(self, tmp_path: Path) -> None:
+        suite = _suite(tmp_path)
+        VersionedRunner.versions = {"orders": "2024-01-01", "my_view": None}
+        with DurationHistory(str(tmp_path / "h.sqlite")) as history:
+            first = plan_incremental_run(VersionedRunner, "dev", suite, history)
+            # The view has no change marker, so only "orders" can ever be skipped
+            assert set(first.to_run) == {"orders", "mixed"}
+            assert set(first.fingerprints) == {"orders"}
+            history.record_run("dev", [_passed("orders"), _passed("mixed")], fingerprints=first.fingerprints)
+
+            second = plan_incremental_run(VersionedRunner, "dev", suite, history)
+            assert set(second.to_run) == {"mixed"}
+            assert [r.name for r in second.skipped] == ["orders"]
+            assert second.skipped[0].skipped and second.skipped[0].passed
+
+            # Another environment has no passing history for the same fingerprint inputs
+            assert set(plan_incremental_run(VersionedRunner, "prod", suite, history).to_run) == {"orders", "mixed"}
+
+            VersionedRunner.versions["orders"] = "2024-01-02"
+            assert "orders" in plan_incremental_run(VersionedRunner, "dev", suite, history).to_run
+
+    def test_unsupported_platform_runs_everything(self, tmp_path: Path) -> None:
+        suite = _suite(tmp_path)
+        with DurationHistory(str(tmp_path / "h.sqlite")) as history:
+            plan = plan_incremental_run(PlainRunner, "dev", suite, history)
+        assert set(plan.to_run) == set(suite)
+        assert plan.warning and "does not support incremental runs" in plan.warning
@@ -2,7 +2,7 @@ import os
 import xml.etree.ElementTree as ET
 from datetime import datetime
 
-from echosphere.core.junit_export import JUnitXmlExporter
+from echosphere.core.junit_export import JUnitXmlExporter, StreamingJUnitWriter
 from echosphere.core.test_result import TestResult
 
 
@@ -95,3 +95,161 @@ def test_junit_exporter_adds_xml_extension_when_missing(tmp_path) -> None:
     written = exporter.write_to_file(str(out_path))
     assert written.endswith(".xml")
     assert os.path.exists(written)
+
+
+def test_junit_exporter_marks_skipped_tests(tmp_path) -> None:
+    exporter = JUnitXmlExporter()
+    exporter.add_result(
+        TestResult(
+            name="Unchanged",
+            passed=True,
+            duration=0.0,
+            sql="SELECT 1;",
+            row_count=0,
+            timestamp=datetime.now(),
+            skipped=True,
+            skip_message="inputs unchanged since last passing run",
+        )
+    )
+
+    root = ET.parse(exporter.write_to_file(str(tmp_path / "junit.xml"))).getroot()
+    suite = root.find("testsuite")
+    assert suite is not None
+    assert suite.get("skipped") == "1"
+    assert suite.get("failures") == "0"
+    skipped = root.find(".//testcase/skipped")
+    assert skipped is not None
+    assert skipped.get("message") == "inputs unchanged since last passing run"
+
+
+def test_junit_exporter_marks_cached_results(tmp_path) -> None:
+    exporter = JUnitXmlExporter()
+    exporter.add_result(
+        TestResult(
+            name="Reused",
+            passed=True,
+            duration=0.0,
+            sql="SELECT 1;",
+            row_count=0,
+            timestamp=datetime.now(),
+            cached_at=datetime(2024, 5, 1, 12, 0, 0),
+        )
+    )
+
+    root = ET.parse(exporter.write_to_file(str(tmp_path / "junit.xml"))).getroot()
+    props = {p.get("name"): p.get("value") for p in root.iterfind(".//testcase/properties/property")}
+    assert props == {"cached": "true", "cached_at": "2024-05-01T12:00:00"}
+
+
+def test_junit_exporter_reports_timeouts_as_errors(tmp_path) -> None:
+    exporter = JUnitXmlExporter()
+    exporter.add_result(
+        TestResult(
+            name="Slow",
+            passed=False,
+            duration=30.0,
+            sql="SELECT 1;",
+            row_count=0,
+            timestamp=datetime.now(),
+            error_message="Timed out after 30s; the query was cancelled.",
+        )
+    )
+
+    root = ET.parse(exporter.write_to_file(str(tmp_path / "junit.xml"))).getroot()
+    suite = root.find("testsuite")
+    assert suite is not None
+    assert (suite.get("errors"), suite.get("failures")) == ("1", "0")
+    error = root.find(".//testcase/error")
+    assert error is not None
+    assert error.get("message") == "Timed out after 30s; the query was cancelled."
+    assert root.find(".//testcase/failure") is None
+
+
+def test_junit_exporter_writes_one_suite_per_environment(tmp_path) -> None:
+    now = datetime.fromisoformat("2023-07-15T14:30:24")
+    results = []
+    for env in ("dev", "prod"):
+        for r in _sample_results(now):
+            r.env = env
+            results.append(r)
+    results[-1].passed = False
+    exporter = JUnitXmlExporter()
+    exporter.add_results(results)
+
+    root = ET.parse(exporter.write_to_file(str(tmp_path / "results.xml"))).getroot()
+
+    suites = root.findall("testsuite")
+    assert [s.get("name") for s in suites] == ["EchoSphere SQL Tests [dev]", "EchoSphere SQL Tests [prod]"]
+    assert [s.get("failures") for s in suites] == ["1", "2"]
+    assert {tc.get("classname") for tc in suites[1].findall("testcase")} == {"echosphere.sql_tests.prod"}
+
+
+def test_streaming_writer_keeps_a_valid_report_after_every_test_case(tmp_path) -> None:
+    now = datetime.fromisoformat("2023-07-15T14:30:24")
+    path = str(tmp_path / "reports" / "results")
+    writer = StreamingJUnitWriter(path)
+
+    # An empty suite before the first result, e.g. when the run is killed at once
+    suite = ET.parse(f"{path}.xml").getroot().find("testsuite")
+    assert suite is not None and suite.get("tests") == "0"
+
+    for i, r in enumerate(_sample_results(now), start=1):
+        writer.add_result(r)
+        # Not closed: this is what a run killed at this point leaves behind
+        suite = ET.parse(f"{path}.xml").getroot().find("testsuite")
+        assert suite is not None
+        assert suite.get("tests") == str(i)
+        assert len(suite.findall("testcase")) == i
+
+    assert writer.close() == [os.path.abspath(f"{path}.xml")]
+    assert suite.get("failures") == "1"
+    assert suite.get("time") == "2.456"
+    assert suite.get("timestamp") == "2023-07-15T14:30:24"
+    failure = suite.find("testcase[@name='Check Order Integrity']/failure")
+    assert failure is not None and "NOT IN" in (failure.text or "")
+
+
+def test_streaming_writer_splits_files_per_subsuite_and_environment(tmp_path) -> None:
+    now = datetime.fromisoformat("2023-07-15T14:30:24")
+    results = _sample_results(now)
+    for r, subsuite in zip(results, ("daily/orders", None, "daily/orders")):
+        r.subsuite = subsuite
+        r.env = "prod"
+
+    with StreamingJUnitWriter(str(tmp_path / "junit-{env}-{subsuite}.xml")) as writer:
+        writer.add_results(results)
+
+    assert sorted(os.listdir(tmp_path)) == ["junit-prod-_root.xml", "junit-prod-daily.orders.xml"]
+    suite = ET.parse(tmp_path / "junit-prod-daily.orders.xml").getroot().find("testsuite")
+    assert suite is not None
+    assert suite.get("name") == "EchoSphere SQL Tests [prod] (daily/orders)"
+    assert suite.get("tests") == "2"
+    assert {tc.get("classname") for tc in suite.findall("testcase")} == {"echosphere.sql_tests.prod.daily.orders"}
+
+
+def test_streaming_writer_reopens_files_closed_by_the_open_file_cap(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr("echosphere.core.junit_export.MAX_OPEN_FILES", 2)
+    results = [r for _ in range(2) for r in _sample_results(datetime.now())]
+    for i, r in enumerate(results):
+        r.subsuite = f"s{i % 3}"
+
+    writer = StreamingJUnitWriter(str(tmp_path / "junit-{subsuite}.xml"))
+    for r in results:
+        writer.add_result(r)
+        assert sum(suite.is_open for suite in writer._suites.values()) <= 2
+    writer.close()
+
+    assert writer.error is None
+    for name in ("s0", "s1", "s2"):
+        suite = ET.parse(tmp_path / f"junit-{name}.xml").getroot().find("testsuite")
+        assert suite is not None and suite.get("tests") == "2" and len(suite.findall("testcase")) == 2
+
+
+def test_streaming_writer_keeps_write_errors_instead_of_raising(tmp_path) -> None:
+    writer = StreamingJUnitWriter(str(tmp_path / "{subsuite}" / "x" / "results.xml"))
+    (tmp_path / "_root").write_text("a file where a folder is needed")
+
+    writer.add_results(_sample_results(datetime.now()))
+
+    assert writer.error is not None
+    assert writer.close() == []
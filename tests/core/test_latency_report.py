@@ -0,0 +1,61 @@
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from echosphere.core.history import DurationHistory, default_history_path
+from echosphere.core.latency_report import build_latency_report, percentile
+from echosphere.core.test_result import TestResult
+from echosphere.main import app
+
+INI = """
+[default]
+env = env.pg.dev
+
+[env.pg.dev]
+platform = postgres
+host = localhost
+database = db
+user = u
+password = p
+"""
+
+
+class TestLatencyReport:
+    def test_percentile_interpolates(self) -> None:
+        assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+        assert percentile([5.0], 95) == 5.0
+        assert percentile(list(map(float, range(101))), 95) == 95.0
+
+    def test_regression_needs_ratio_and_delta(self) -> None:
+        current = {"slow": ("sales", [30.0]), "noisy": ("sales", [0.05]), "new": (None, [1.0])}
+        baseline = {"slow": ("sales", [2.0, 3.0, 100.0]), "noisy": ("sales", [0.01])}
+
+        report = build_latency_report(9, current, [7, 8], baseline, max_ratio=2.0, min_delta=1.0)
+
+        assert [t.name for t in report.regressions] == ["slow"]
+        assert report.regressions[0].baseline == 3.0
+        assert report.failed
+        suites = {s.subsuite: s for s in report.subsuites}
+        assert suites["sales"].tests == 2
+        assert suites["(root)"].baseline_p50 is None
+
+    def test_cli_compares_with_tagged_run(
+        self, tmp_path: Path, make_result: Callable[..., TestResult], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        (tmp_path / "es.ini").write_text(INI)
+        monkeypatch.chdir(tmp_path)
+        with DurationHistory(default_history_path()) as history:
+            history.record_run("env.pg.dev", [make_result("orders", duration=1.0, subsuite="sales")], tag="v1")
+            history.record_run("env.pg.dev", [make_result("orders", duration=1.1, subsuite="sales")])
+            history.record_run("env.pg.dev", [make_result("orders", duration=12.0, subsuite="sales")])
+
+        runner = CliRunner()
+        failing = runner.invoke(app, ["report", "latency", "--baseline-tag", "v1"])
+        assert failing.exit_code == 1
+        assert "orders" in failing.output
+
+        passing = runner.invoke(app, ["report", "latency", "--max-ratio", "20"])
+        assert passing.exit_code == 0
+        assert "No latency regressions" in passing.output
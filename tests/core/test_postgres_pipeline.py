@@ -0,0 +1,194 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any
+
+import pytest
+
+from echosphere.core.db_runner.cancellation import query_scope
+from echosphere.core.db_runner.postgres_pipeline import PostgresPipeline
+
+
+class FakeCursor:
+    def __init__(self, conn: "FakeAsyncConnection") -> None:
+        """Create the fake."""
+        self.conn = conn
+        self.row: tuple[Any, ...] | None = None
+
+    async def execute(self, sql: str) -> None:
+        self.conn.executed.append(sql)
+        if "boom" in sql:
+            if self.conn.in_pipeline:
+                self.conn.pipeline_error = True
+                return
+            raise RuntimeError("syntax error")
+        n = int(sql.rsplit(" ", 1)[-1])
+        self.row = (n,)
+        if self.conn.clock is not None:
+            # Each query takes n seconds on the server
+            self.conn.clock += timedelta(seconds=n)
+            self.row = (n, self.conn.clock)
+
+    async def fetchone(self) -> tuple[Any, ...] | None:
+        return self.row
+
+
+class FakeAsyncConnection:
+    """Mimics the subset of psycopg.AsyncConnection used by the pipeline."""
+
+    def __init__(self) -> None:
+        """Create the fake."""
+        self.executed: list[str] = []
+        self.settings: list[str] = []
+        self.clock: datetime | None = None
+        self.pipelines = 0
+        self.in_pipeline = False
+        self.pipeline_error = False
+        self.closed = False
+        self.cancelled = False
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self)
+
+    async def execute(self, sql: str) -> None:
+        self.settings.append(sql)
+
+    @asynccontextmanager
+    async def pipeline(self):
+        self.pipelines += 1
+        self.in_pipeline = True
+        self.pipeline_error = False
+        try:
+            yield self
+        finally:
+            self.in_pipeline = False
+        if self.pipeline_error:
+            raise RuntimeError("pipeline aborted")
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def _pipeline(
+    connections: int = 2, batch_size: int = 64, clock: datetime | None = None
+) -> tuple[PostgresPipeline, list[FakeAsyncConnection]]:
+    conns: list[FakeAsyncConnection] = []
+
+    async def connect() -> Any:
+        conn = FakeAsyncConnection()
+        conn.clock = clock
+        conns.append(conn)
+        return conn
+
+    return PostgresPipeline(connect, connections=connections, batch_size=batch_size), conns
+
+
+class TestPostgresPipeline:
+    def test_results_are_matched_to_their_queries(self) -> None:
+        async def scenario() -> tuple[list[tuple[int, float]], list[FakeAsyncConnection]]:
+            pipeline, conns = _pipeline(connections=2)
+            try:
+                results = await asyncio.gather(*(pipeline.count(f"SELECT {i}") for i in range(100)))
+            finally:
+                await pipeline.close()
+            return results, conns
+
+        results, conns = asyncio.run(scenario())
+        assert [r[0] for r in results] == list(range(100))
+        assert len(conns) == 2
+        assert all(c.closed for c in conns)
+        # Many queries share few pipelines
+        assert sum(c.pipelines for c in conns) < 100
+
+    def test_batch_size_limits_queries_per_pipeline(self) -> None:
+        async def scenario() -> FakeAsyncConnection:
+            pipeline, conns = _pipeline(connections=1, batch_size=10)
+            try:
+                await asyncio.gather(*(pipeline.count(f"SELECT {i}") for i in range(35)))
+            finally:
+                await pipeline.close()
+            return conns[0]
+
+        conn = asyncio.run(scenario())
+        assert conn.pipelines >= 4
+
+    def test_error_is_attributed_to_failing_query_only(self) -> None:
+        async def scenario() -> list[Any]:
+            pipeline, _ = _pipeline(connections=1)
+            try:
+                return await asyncio.gather(
+                    pipeline.count("SELECT 1"),
+                    pipeline.count("SELECT boom"),
+                    pipeline.count("SELECT 3"),
+                    return_exceptions=True,
+                )
+            finally:
+                await pipeline.close()
+
+        first, failed, third = asyncio.run(scenario())
+        assert first[0] == 1
+        assert isinstance(failed, RuntimeError)
+        assert third[0] == 3
+
+    def test_connect_failure_fails_queries(self) -> None:
+        async def connect() -> Any:
+            raise ConnectionError("no route to host")
+
+        async def scenario() -> None:
+            pipeline = PostgresPipeline(connect, connections=1)
+            try:
+                await pipeline.count("SELECT 1")
+            finally:
+                await pipeline.close()
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(scenario())
+
+    def test_one_failed_connection_leaves_the_others_serving(self) -> None:
+        attempts: list[int] = []
+
+        async def connect() -> Any:
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError("too many clients")
+            return FakeAsyncConnection()
+
+        async def scenario() -> list[tuple[int, float]]:
+            pipeline = PostgresPipeline(connect, connections=2)
+            try:
+                return await asyncio.gather(*(pipeline.count(f"SELECT {i}") for i in range(10)))
+            finally:
+                await pipeline.close()
+
+        assert [r[0] for r in asyncio.run(scenario())] == list(range(10))
+
+    def test_batch_time_is_split_by_server_clock_readings(self) -> None:
+        async def scenario() -> list[tuple[int, float]]:
+            pipeline, _ = _pipeline(connections=1, clock=datetime(2024, 1, 1))
+            try:
+                return await asyncio.gather(*(pipeline.count(f"SELECT {i}") for i in (1, 2, 3)))
+            finally:
+                await pipeline.close()
+
+        results = asyncio.run(scenario())
+        assert [r[1] for r in results[1:]] == [2.0, 3.0]
+
+    def test_each_query_runs_with_its_tests_timeout(self) -> None:
+        async def scenario() -> FakeAsyncConnection:
+            pipeline, conns = _pipeline(connections=1)
+
+            async def limited() -> tuple[int, float]:
+                with query_scope(2.5):
+                    return await pipeline.count("SELECT 1")
+
+            try:
+                await asyncio.gather(limited(), pipeline.count("SELECT 2"))
+            finally:
+                await pipeline.close()
+            return conns[0]
+
+        conn = asyncio.run(scenario())
+        assert conn.settings == ["SET statement_timeout = 2500", "SET statement_timeout = 0"]
@@ -0,0 +1,89 @@
+import io
+from datetime import datetime
+
+import pytest
+from rich.console import Console
+
+from echosphere.core import run_async_tests
+from echosphere.core.reporter import RunReporter, subsuite_summary
+from echosphere.core.test_result import TestResult
+
+
+def _result(name: str, status: str, subsuite: str | None = None) -> TestResult:
+    return TestResult(
+        name=name,
+        passed=status in ("pass", "skip"),
+        duration=1.5,
+        sql="SELECT 1",
+        row_count=3 if status == "fail" else 0,
+        timestamp=datetime.now(),
+        subsuite=subsuite,
+        skipped=status == "skip",
+        error_message="Timed out after 1s" if status == "error" else None,
+    )
+
+
+def _console(terminal: bool) -> Console:
+    return Console(file=io.StringIO(), force_terminal=terminal, width=200)
+
+
+class TestRunReporter:
+    def test_ci_mode_prints_only_failures_and_errors(self, capsys: pytest.CaptureFixture[str]) -> None:
+        console = _console(terminal=False)
+        with RunReporter(3, "auto", console=console) as reporter:
+            assert reporter.mode == "ci"
+            for name, status in (("ok", "pass"), ("bad", "fail"), ("slow", "error")):
+                reporter.test_started(name)
+                run_async_tests.build_test_result(name, 0, 0.1, "SELECT 1")
+                reporter.test_finished(_result(name, status))
+
+        out = console.file.getvalue()  # type: ignore[attr-defined]
+        assert "FAIL  bad" in out and "3 row(s)" in out
+        assert "ERROR slow" in out and "Timed out" in out
+        assert "ok" not in out
+        # Per-test messages are off while the reporter runs and on again afterwards
+        assert "Passed" not in capsys.readouterr().out
+        assert reporter.counts == {"pass": 1, "fail": 1, "error": 1, "skip": 0}
+        run_async_tests.build_test_result("after", 0, 0.1, "SELECT 1")
+        assert "after" in capsys.readouterr().out
+
+    def test_live_view_shows_counts_running_tests_and_eta(self) -> None:
+        reporter = RunReporter(4, "auto", console=_console(terminal=True), show_env=True)
+        assert reporter.mode == "live"
+        reporter._apply(("started", ("prod", "slow"), 0.0))
+        reporter._apply(("finished", _result("quick", "pass"), 0.0))
+
+        view = reporter._render().plain
+
+        assert "1/4" in view and "1 passed" in view
+        assert "1 running" in view and "slowest: slow [prod]" in view
+        assert "ETA" in view
+
+    def test_plain_mode_keeps_per_test_messages(self, capsys: pytest.CaptureFixture[str]) -> None:
+        with RunReporter(1, "plain", console=_console(terminal=True)) as reporter:
+            reporter.test_finished(_result("ok", "pass"))
+            run_async_tests.build_test_result("ok", 0, 0.1, "SELECT 1")
+        assert "Passed" in capsys.readouterr().out
+
+    def test_unknown_mode_raises(self) -> None:
+        with pytest.raises(ValueError):
+            RunReporter(1, "fancy")
+
+
+def test_subsuite_summary_counts_outcomes_per_subsuite() -> None:
+    results = [
+        _result("a", "pass", "smoke"),
+        _result("b", "fail", "smoke"),
+        _result("c", "skip", None),
+        _result("d", "error", "daily/orders"),
+    ]
+
+    table = subsuite_summary(results)
+
+    columns = {c.header: list(c.cells) for c in table.columns}
+    assert columns["Subsuite"] == ["(root)", "daily/orders", "smoke"]
+    assert columns["Tests"] == ["1", "1", "2"]
+    assert columns["Failed"] == ["0", "0", "1"]
+    assert columns["Errors"] == ["0", "1", "0"]
+    assert columns["Skipped"] == ["1", "0", "0"]
+    assert columns["Time"] == ["1.5s", "1.5s", "3.0s"]
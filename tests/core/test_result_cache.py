@@ -0,0 +1,141 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import pytest
+from typer.testing import CliRunner
+
+from echosphere.core import result_cache, run_async_tests
+from echosphere.core.db_runner.BaseClass import BaseRunner
+from echosphere.core.result_cache import ResultCache, cache_key
+from echosphere.core.test_result import TestResult
+from echosphere.main import app
+
+INI = """
+[default]
+env = env.pg.dev
+
+[env.pg.dev]
+platform = postgres
+host = localhost
+database = db
+user = u
+password = p
+"""
+
+
+class CountingRunner(BaseRunner):
+    """Runner counting how often a test is actually executed."""
+
+    executed = 0
+
+    @classmethod
+    def dispatch_test(cls, env: str | None, test_file_path: str) -> tuple[int, float, str]:
+        cls.executed += 1
+        return 0, 0.01, "SELECT 1"
+
+    @classmethod
+    def fetch_failure_sample(cls, env: str | None, sql: str, limit: int = 1000) -> tuple[list[str], list[tuple[Any]]]:
+        return [], []
+
+
+def _result(row_count: int = 0, sample: bool = False) -> TestResult:
+    return TestResult(
+        name="t",
+        passed=not row_count,
+        duration=1.5,
+        sql="",
+        row_count=row_count,
+        timestamp=datetime.now(),
+        failure_columns=["id", "ts"] if sample else None,
+        failure_rows=[(1, datetime(2024, 1, 1))] if sample else None,
+    )
+
+
+def test_key_ignores_formatting_but_not_environment() -> None:
+    assert cache_key("dev", "SELECT *\n  FROM t -- note\n;") == cache_key("dev", "SELECT * FROM t")
+    assert cache_key("dev", "SELECT 'a  b'") != cache_key("dev", "SELECT 'a b'")
+    assert cache_key("dev", "SELECT 1") != cache_key("prod", "SELECT 1")
+
+
+def test_roundtrip_with_failure_sample(tmp_path: Path) -> None:
+    with ResultCache(str(tmp_path / "c.sqlite")) as cache:
+        assert cache.get("dev", "SELECT 1") is None
+        cache.put("dev", "SELECT 1", _result(row_count=1, sample=True))
+        hit = cache.get("dev", "SELECT 1", need_sample=True)
+    assert hit is not None
+    assert hit.row_count == 1 and hit.duration == 1.5
+    assert hit.failure_columns == ["id", "ts"]
+    assert hit.failure_rows == [[1, "2024-01-01 00:00:00"]]
+
+
+def test_arrow_failure_sample_is_stored_as_rows(tmp_path: Path) -> None:
+    pa = pytest.importorskip("pyarrow")
+    result = _result(row_count=2)
+    result.failure_columns = ["id", "name"]
+    result.failure_table = pa.table({"id": [1, 2], "name": ["a", None]})
+
+    with ResultCache(str(tmp_path / "c.sqlite")) as cache:
+        cache.put("dev", "SELECT 1", result)
+        hit = cache.get("dev", "SELECT 1", need_sample=True)
+
+    assert hit is not None
+    assert hit.failure_rows == [[1, "a"], [2, None]]
+
+
+def test_failing_entry_without_sample_is_a_miss_when_sample_needed(tmp_path: Path) -> None:
+    with ResultCache(str(tmp_path / "c.sqlite")) as cache:
+        cache.put("dev", "SELECT 1", _result(row_count=3))
+        assert cache.get("dev", "SELECT 1") is not None
+        assert cache.get("dev", "SELECT 1", need_sample=True) is None
+
+
+def test_entries_expire_after_ttl(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 1_000_000.0
+    monkeypatch.setattr(result_cache.time, "time", lambda: now)
+    with ResultCache(str(tmp_path / "c.sqlite"), ttl=60) as cache:
+        cache.put("dev", "SELECT 1", _result())
+        now += 59
+        assert cache.get("dev", "SELECT 1") is not None
+        now += 2
+        assert cache.get("dev", "SELECT 1") is None
+        assert cache.prune() == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 1_000_000.0
+    monkeypatch.setattr(result_cache.time, "time", lambda: now)
+    # Each entry holds a 64-character key; room for two entries
+    with ResultCache(str(tmp_path / "c.sqlite"), max_mb=130 / 1024 / 1024) as cache:
+        for sql in ("SELECT 1", "SELECT 2", "SELECT 3"):
+            cache.put("dev", sql, _result())
+            now += 1
+        assert cache.get("dev", "SELECT 1") is not None  # most recently used now
+        assert cache.prune() == 1
+        assert cache.get("dev", "SELECT 2") is None
+        assert cache.get("dev", "SELECT 1") is not None
+        assert cache.get("dev", "SELECT 3") is not None
+
+
+def test_cli_reads_the_cache_only_when_asked(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    (tmp_path / "es.ini").write_text(INI)
+    (tmp_path / "es_suite").mkdir()
+    (tmp_path / "es_suite" / "orders.es.sql").write_text("SELECT 1")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(run_async_tests, "resolve_runner", lambda env: CountingRunner)
+    monkeypatch.setattr(CountingRunner, "executed", 0)
+    runner = CliRunner()
+
+    def run(*args: str) -> int:
+        result = runner.invoke(app, ["run", "--no-history", *args])
+        assert result.exit_code == 0, result.output
+        return CountingRunner.executed
+
+    assert run() == 1
+    assert run() == 2
+    assert run("--cache") == 2
+    assert runner.invoke(app, ["run", "--cache", "--no-cache"]).exit_code != 0
+
+    (tmp_path / "es.ini").write_text(INI.replace("env = env.pg.dev", "env = env.pg.dev\ncache_ttl = 600"))
+    assert run() == 2
+    assert run("--no-cache") == 3
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from echosphere.core.history import Expectation
+from echosphere.core.sharding import parse_shard, partition_tests, select_shard
+
+
+def _exp(duration: float) -> Expectation:
+    return Expectation(duration=duration, variance=0.0, samples=5)
+
+
+class TestSharding:
+    def test_parse_shard(self) -> None:
+        assert parse_shard("2/4") == (2, 4)
+        assert parse_shard(" 1 / 1 ") == (1, 1)
+        for bad in ("0/4", "5/4", "2", "a/b", "1/0"):
+            with pytest.raises(ValueError):
+                parse_shard(bad)
+
+    def test_shards_cover_suite_exactly_once(self) -> None:
+        names = [f"t{i}" for i in range(23)]
+        shards = partition_tests(names, {}, 4)
+        assert sorted(n for shard in shards for n in shard) == sorted(names)
+        # Without history the shards are balanced by file count
+        assert sorted(len(s) for s in shards) == [5, 6, 6, 6]
+
+    def test_balances_by_expected_duration(self) -> None:
+        expectations = {"huge": _exp(100.0), **{f"small{i}": _exp(10.0) for i in range(10)}}
+        shards = partition_tests(["new", *expectations], expectations, 2)
+        totals = sorted(sum(expectations.get(n, _exp(10.0)).duration for n in s) for s in shards)
+        assert totals == [100.0, 110.0]
+        # The long test is balanced by many short ones instead of stacking with them
+        assert len(next(s for s in shards if "huge" in s)) <= 2
+
+    def test_partition_does_not_depend_on_discovery_order(self) -> None:
+        expectations = {f"t{i}": _exp(float(i % 7)) for i in range(40)}
+        names = list(expectations)
+        shuffled = names[:]
+        random.Random(1).shuffle(shuffled)
+        for index in (1, 2, 3):
+            assert set(select_shard(names, expectations, index, 3)) == set(
+                select_shard(shuffled, expectations, index, 3)
+            )
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from echosphere.core.db_runner.connection_pool import ConnectionPool
+from echosphere.core.db_runner.snowflake_poller import SnowflakeQueryPoller
+
+
+class FakeServer:
+    """Runs each submitted query for the number of seconds given in its SQL text."""
+
+    def __init__(self) -> None:
+        """Create the fake."""
+        self.finish_at: dict[str, float] = {}
+        self.lock = threading.Lock()
+
+
+class FakeCursor:
+    def __init__(self, server: FakeServer) -> None:
+        """Create the fake."""
+        self.server = server
+        self.sfqid: str | None = None
+
+    def execute_async(self, sql: str) -> None:
+        with self.server.lock:
+            self.sfqid = f"q{len(self.server.finish_at)}"
+            self.server.finish_at[self.sfqid] = time.monotonic() + float(sql.rsplit(" ", 1)[-1])
+
+    def close(self) -> None:
+        pass
+
+
+class FakeConnection:
+    def __init__(self, server: FakeServer) -> None:
+        """Create the fake."""
+        self.server = server
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self.server)
+
+    def get_query_status_throw_if_error(self, qry_id: str) -> str:
+        if qry_id == "q_error":
+            raise ValueError("bad query")
+        return "RUNNING" if time.monotonic() < self.server.finish_at[qry_id] else "SUCCESS"
+
+    @staticmethod
+    def is_still_running(status: str) -> bool:
+        return status == "RUNNING"
+
+
+def _poller(server: FakeServer, **kwargs: float) -> SnowflakeQueryPoller:
+    pool: ConnectionPool[FakeConnection] = ConnectionPool(
+        factory=lambda: FakeConnection(server), health_check=lambda c: True, closer=lambda c: None, max_size=2
+    )
+    return SnowflakeQueryPoller(pool, **kwargs)
+
+
+class TestSnowflakeQueryPoller:
+    def test_short_query_finishes_well_under_two_seconds(self) -> None:
+        poller = _poller(FakeServer())
+        try:
+            start = time.time()
+            _, done = poller.submit("SELECT 0.05")
+            end = done.result(timeout=5)
+        finally:
+            poller.close()
+        assert 0.05 <= end - start < 0.5
+
+    def test_tracks_many_queries_on_one_thread(self) -> None:
+        poller = _poller(FakeServer())
+        threads_before = threading.active_count()
+        try:
+            futures = [poller.submit(f"SELECT {0.01 * (i % 5)}")[1] for i in range(50)]
+            assert threading.active_count() <= threads_before + 1
+            for f in futures:
+                f.result(timeout=5)
+        finally:
+            poller.close()
+        assert poller.in_flight == 0
+
+    def test_backoff_reduces_poll_traffic(self) -> None:
+        poller = _poller(FakeServer(), min_interval=0.01, max_interval=0.2, backoff=2.0)
+        try:
+            _, done = poller.submit("SELECT 0.6")
+            done.result(timeout=5)
+        finally:
+            poller.close()
+        # A fixed 10ms interval would need ~60 checks
+        assert poller.status_requests < 15
+
+    def test_query_error_is_raised_from_future(self) -> None:
+        server = FakeServer()
+        poller = _poller(server)
+        try:
+            _, done = poller.submit("SELECT 0")
+            server.finish_at["q_error"] = 0.0
+            with poller._cond:
+                poller._queries["q_error"] = poller._queries.pop("q0")
+                poller._queries["q_error"].query_id = "q_error"
+            with pytest.raises(ValueError):
+                done.result(timeout=5)
+        finally:
+            poller.close()
+
+    def test_close_fails_pending_queries(self) -> None:
+        poller = _poller(FakeServer())
+        _, done = poller.submit("SELECT 60")
+        poller.close()
+        with pytest.raises(RuntimeError):
+            done.result(timeout=1)
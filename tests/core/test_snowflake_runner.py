@@ -0,0 +1,88 @@
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from echosphere.core.db_runner.connection_pool import ConnectionPool
+from echosphere.core.db_runner.SnowflakeRunner import SnowflakeRunner
+from echosphere.env_config_parser.PlatformExtractor import PlatformExtractor
+
+
+class RecordingCursor:
+    def __init__(self, executed: list[str]) -> None:
+        """Create the fake."""
+        self.executed = executed
+        self.description = [("ORDER_ID",), ("CUSTOMER_ID",)]
+
+    def execute(self, sql: str) -> None:
+        self.executed.append(sql)
+
+    def fetchone(self) -> tuple[int]:
+        return (3,)
+
+    def fetchmany(self, size: int) -> list[tuple[Any, ...]]:
+        return [(1, 10), (2, 20), (3, 30)][:size]
+
+    def close(self) -> None:
+        pass
+
+
+class RecordingConnection:
+    def __init__(self) -> None:
+        """Create the fake."""
+        self.executed: list[str] = []
+
+    def cursor(self) -> RecordingCursor:
+        return RecordingCursor(self.executed)
+
+
+class ImmediatePoller:
+    def submit(self, sql: str) -> tuple[str, Future[float]]:
+        done: Future[float] = Future()
+        done.set_result(0.0)
+        return "01b2c3d4-0000-0000-0000-000000000001", done
+
+
+@pytest.fixture
+def fake_snowflake(monkeypatch: pytest.MonkeyPatch) -> RecordingConnection:
+    conn = RecordingConnection()
+    pool: ConnectionPool[RecordingConnection] = ConnectionPool(
+        factory=lambda: conn, health_check=lambda c: True, closer=lambda c: None, max_size=1
+    )
+    monkeypatch.setattr(SnowflakeRunner, "connection_pool", classmethod(lambda cls, env: pool))
+    monkeypatch.setattr(SnowflakeRunner, "_poller", classmethod(lambda cls, env: ImmediatePoller()))
+    monkeypatch.setattr(PlatformExtractor, "resolve_env_name", classmethod(lambda cls, env=None: env or "env.dev"))
+    return conn
+
+
+class TestSnowflakeRunner:
+    def test_row_count_comes_from_server_side_count(self, fake_snowflake: RecordingConnection, tmp_path: Path) -> None:
+        test_file = tmp_path / "orders.es.sql"
+        test_file.write_text("SELECT * FROM orders WHERE customer_id IS NULL")
+
+        row_count, _, sql = SnowflakeRunner.dispatch_test(env=None, test_file_path=str(test_file))
+
+        assert row_count == 3
+        assert sql == "SELECT * FROM orders WHERE customer_id IS NULL"
+        assert fake_snowflake.executed == [
+            "SELECT COUNT(*) FROM TABLE(RESULT_SCAN('01b2c3d4-0000-0000-0000-000000000001'))"
+        ]
+
+    def test_failure_sample_reuses_query_result(self, fake_snowflake: RecordingConnection, tmp_path: Path) -> None:
+        test_file = tmp_path / "orders.es.sql"
+        test_file.write_text("SELECT * FROM expensive_view")
+        _, _, sql = SnowflakeRunner.dispatch_test(env=None, test_file_path=str(test_file))
+
+        cols, rows = SnowflakeRunner.fetch_failure_sample(env=None, sql=sql, limit=2)
+
+        assert cols == ["ORDER_ID", "CUSTOMER_ID"]
+        assert rows == [(1, 10), (2, 20)]
+        assert fake_snowflake.executed[-1] == (
+            "SELECT * FROM TABLE(RESULT_SCAN('01b2c3d4-0000-0000-0000-000000000001')) LIMIT 2"
+        )
+        assert all("expensive_view" not in q for q in fake_snowflake.executed)
+
+    def test_unknown_sql_falls_back_to_limit_wrapper(self, fake_snowflake: RecordingConnection) -> None:
+        SnowflakeRunner.fetch_failure_sample(env="env.other", sql="SELECT 1;", limit=5)
+        assert fake_snowflake.executed[-1] == "SELECT * FROM (SELECT 1) AS t LIMIT 5"
@@ -22,7 +22,7 @@ class TestSuiteDisplay:
         assert "example" not in out
 
     def test_display_test_names_table_no_tests_exits(self, monkeypatch) -> None:
-        monkeypatch.setattr(sd, "get_sql_test_files", lambda subdir=None: {})
+        monkeypatch.setattr(sd, "get_sql_test_files", lambda subdir=None, manifest_path=None: {})
         with pytest.raises(SystemExit) as ex:
             sd.display_test_names_table()
         assert ex.value.code == -1
@@ -47,7 +47,7 @@ class TestSuiteDisplay:
         monkeypatch.setattr(
             sd,
             "get_sql_test_files",
-            lambda subdir=None: {"example": {"full_path": None, "subfolder": None}},
+            lambda subdir=None, manifest_path=None: {"example": {"full_path": None, "subfolder": None}},
         )
         with pytest.raises(SystemExit) as ex:
             sd.display_test_sql_code("example")
@@ -0,0 +1,95 @@
+import dataclasses
+import os
+from pathlib import Path
+
+import pytest
+
+from echosphere.env_config_parser.EnvironmentRegistry import EnvironmentRegistry
+from echosphere.env_config_parser.PostgresEnvConfigParser import PostgresAgentConfig
+from echosphere.env_config_parser.SnowflakeEnvConfigParser import SnowflakeAgentConfig
+from echosphere.env_config_parser.validation import ConfigurationError
+
+VALID_INI = """
+[default]
+env = pg.dev
+pool_size = 8
+
+[pg.dev]
+platform = postgres
+host = localhost
+database = db
+user = u
+password = p
+port = 5433
+"""
+
+
+def write_ini(path: Path, content: str) -> None:
+    path.write_text(content)
+    # Force a distinct modification time even on coarse-grained file systems
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+class TestEnvironmentRegistry:
+    def test_resolves_default_env_and_caches_config(self, tmp_path: Path) -> None:
+        ini = tmp_path / "es.ini"
+        write_ini(ini, VALID_INI)
+        registry = EnvironmentRegistry(str(ini))
+
+        first = registry.config_for(None, PostgresAgentConfig)
+        second = registry.config_for("pg.dev", PostgresAgentConfig)
+
+        assert first is second
+        assert first.port == 5433
+        assert registry.get_int_option("pool_size", 50) == 8
+        assert registry.loads == 1
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            first.port = 1  # type: ignore[misc]
+
+    def test_reloads_when_file_changes(self, tmp_path: Path) -> None:
+        ini = tmp_path / "es.ini"
+        write_ini(ini, VALID_INI)
+        registry = EnvironmentRegistry(str(ini))
+        assert registry.config_for(None, PostgresAgentConfig).port == 5433
+
+        write_ini(ini, VALID_INI.replace("port = 5433", "port = 6543"))
+
+        assert registry.config_for(None, PostgresAgentConfig).port == 6543
+        assert registry.loads == 2
+
+    def test_validate_reports_all_errors(self, tmp_path: Path) -> None:
+        ini = tmp_path / "es.ini"
+        write_ini(
+            ini,
+            """
+[default]
+env = pg.dev
+pool_size = many
+
+[pg.dev]
+platform = postgres
+host = localhost
+database = db
+user = u
+password = p
+port = abc
+pipeline = maybe
+""",
+        )
+        errors = EnvironmentRegistry(str(ini)).validate([None, "missing"])
+
+        assert len(errors) == 4
+        assert any("port" in e for e in errors)
+        assert any("pipeline" in e for e in errors)
+        assert any("pool_size" in e for e in errors)
+        assert any("'missing' not found" in e for e in errors)
+
+    def test_platform_mismatch_and_missing_file(self, tmp_path: Path) -> None:
+        ini = tmp_path / "es.ini"
+        write_ini(ini, VALID_INI)
+        with pytest.raises(ConfigurationError, match="not SnowflakeAgentConfig"):
+            EnvironmentRegistry(str(ini)).config_for(None, SnowflakeAgentConfig)
+
+        errors = EnvironmentRegistry(str(tmp_path / "nope.ini")).validate([None])
+        assert errors and "not found" in errors[0]
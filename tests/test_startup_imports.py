@@ -0,0 +1,25 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["openpyxl", "xml.etree.ElementTree", "snowflake.connector", "psycopg2", "psycopg", "databricks.sql"]
+
+
+def imported_heavy_modules(code: str) -> list[str]:
+    """Run `code` in a fresh interpreter and return the heavy modules it left in sys.modules."""
+    probe = f"import sys\n{code}\nprint(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+    return [m for m in out.strip().split(",") if m]
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import echosphere.main",
+        "from echosphere.commands import view",
+        "import echosphere.core.engine",
+    ],
+)
+def test_cli_startup_does_not_import_exporters_or_drivers(code: str) -> None:
+    assert imported_heavy_modules(code) == []
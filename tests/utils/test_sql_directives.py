@@ -0,0 +1,15 @@
+import pytest
+
+from echosphere.utils.sql_directives import parse_directives, read_timeout
+
+
+class TestSqlDirectives:
+    def test_parses_directive_comments(self) -> None:
+        sql = "-- es:timeout = 600\n--es:Owner=data-team\nSELECT 1 -- es:ignored = inline\n"
+        assert parse_directives(sql) == {"timeout": "600", "owner": "data-team"}
+
+    def test_read_timeout(self) -> None:
+        assert read_timeout("SELECT 1") is None
+        assert read_timeout("-- es:timeout = 1.5\nSELECT 1") == 1.5
+        with pytest.raises(ValueError):
+            read_timeout("-- es:timeout = -1\nSELECT 1")
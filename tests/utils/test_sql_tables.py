@@ -0,0 +1,30 @@
+from echosphere.utils.sql_tables import TableRef, extract_table_references, normalize_sql
+
+
+class TestExtractTableReferences:
+    def test_finds_qualified_joined_and_implicit_tables(self) -> None:
+        sql = """
+        -- FROM commented_out
+        SELECT * FROM analytics.orders o, "Raw"."Events" e
+        JOIN db.sales.customers c ON c.id = o.customer_id
+        WHERE o.status = 'from nowhere'
+        """
+        refs = [str(r) for r in extract_table_references(sql)]
+        assert refs == ["analytics.orders", '"Raw"."Events"', "db.sales.customers"]
+
+    def test_skips_ctes_and_subqueries(self) -> None:
+        sql = (
+            "WITH recent AS (SELECT * FROM orders) SELECT * FROM recent, LATERAL (SELECT 1) x JOIN (SELECT 2) y ON 1=1"
+        )
+        assert [str(r) for r in extract_table_references(sql)] == ["orders"]
+
+    def test_folding_respects_quotes(self) -> None:
+        ref = TableRef((("Raw", True), ("events", False)))
+        assert ref.folded(upper=True) == ("Raw", "EVENTS")
+        assert ref.folded(upper=False) == ("Raw", "events")
+
+
+class TestNormalizeSql:
+    def test_collapses_whitespace_and_comments_outside_literals(self) -> None:
+        sql = "SELECT  *\n-- note\nFROM t /* x */ WHERE a = '  -- kept  ' AND \"Col  Name\" = 1;\n"
+        assert normalize_sql(sql) == "SELECT * FROM t WHERE a = '  -- kept  ' AND \"Col  Name\" = 1"
@@ -1,6 +1,9 @@
 import os
 from pathlib import Path
 
+import pytest
+
+from echosphere.utils import sql_test_fetcher
 from echosphere.utils.sql_test_fetcher import get_sql_test_files
 
 
@@ -9,7 +12,7 @@ class TestGetSqlTestFiles:
         files = get_sql_test_files(path=str(example_suites_path))
 
         assert "example" in files
-        assert "sub_test" in files
+        assert "hello/sub_test" in files
 
         # Root file
         root_info = files["example"]
@@ -18,15 +21,15 @@ class TestGetSqlTestFiles:
         assert os.path.exists(root_info["full_path"]) is True
 
         # Subfolder file
-        sub_info = files["sub_test"]
+        sub_info = files["hello/sub_test"]
         assert sub_info["subfolder"] == "hello"
         assert isinstance(sub_info["full_path"], str)
         assert os.path.exists(sub_info["full_path"]) is True
 
     def test_filter_by_subdir(self, example_suites_path: Path) -> None:
         files = get_sql_test_files(path=str(example_suites_path), subdir="hello")
-        assert set(files.keys()) == {"sub_test"}
-        info = files["sub_test"]
+        assert set(files.keys()) == {"hello/sub_test"}
+        info = files["hello/sub_test"]
         assert info["subfolder"] == "hello"
 
     def test_name_normalization_lowercase(self, tmp_path: Path) -> None:
@@ -44,3 +47,60 @@ class TestGetSqlTestFiles:
         for info in files.values():
             assert info["full_path"], "full_path should be populated"
             assert Path(info["full_path"]).exists(), f"{info['full_path']} should exist"
+
+    def test_recurses_and_keys_by_qualified_path(self, tmp_path: Path) -> None:
+        for folder in ("smoke", "smoke/orders/daily", "integrity"):
+            (tmp_path / folder).mkdir(parents=True, exist_ok=True)
+            (tmp_path / folder / "totals.es.sql").write_text("SELECT 1;")
+        (tmp_path / ".hidden").mkdir()
+        (tmp_path / ".hidden" / "ignored.es.sql").write_text("SELECT 1;")
+
+        files = get_sql_test_files(path=str(tmp_path))
+
+        assert list(files) == ["integrity/totals", "smoke/totals", "smoke/orders/daily/totals"]
+        assert files["smoke/orders/daily/totals"]["subfolder"] == "smoke/orders/daily"
+        assert set(get_sql_test_files(path=str(tmp_path), subdir="smoke")) == {
+            "smoke/totals",
+            "smoke/orders/daily/totals",
+        }
+
+
+class TestManifest:
+    @pytest.fixture(autouse=True)
+    def _no_slack(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # Trust listings right away instead of re-reading recently modified folders
+        monkeypatch.setattr(sql_test_fetcher, "MTIME_SLACK_NS", -(10**18))
+
+    def test_unchanged_folders_are_not_listed_again(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        suite = tmp_path / "suite"
+        (suite / "a").mkdir(parents=True)
+        (suite / "a" / "one.es.sql").write_text("SELECT 1;")
+        manifest = str(tmp_path / "manifest.json")
+        first = get_sql_test_files(path=str(suite), manifest_path=manifest)
+
+        def fail(path: str) -> None:
+            raise AssertionError(f"{path} listed again")
+
+        monkeypatch.setattr(sql_test_fetcher.os, "scandir", fail)
+        assert get_sql_test_files(path=str(suite), manifest_path=manifest) == first
+
+    def test_changed_folder_is_listed_again(self, tmp_path: Path) -> None:
+        suite = tmp_path / "suite"
+        (suite / "a").mkdir(parents=True)
+        (suite / "a" / "one.es.sql").write_text("SELECT 1;")
+        manifest = str(tmp_path / "manifest.json")
+        get_sql_test_files(path=str(suite), manifest_path=manifest)
+
+        (suite / "a" / "two.es.sql").write_text("SELECT 1;")
+        os.utime(suite / "a", ns=(0, os.stat(suite / "a").st_mtime_ns + 1_000_000_000))
+
+        assert set(get_sql_test_files(path=str(suite), manifest_path=manifest)) == {"a/one", "a/two"}
+
+    def test_manifest_of_another_suite_is_ignored(self, tmp_path: Path) -> None:
+        for name in ("x", "y"):
+            (tmp_path / name).mkdir()
+            (tmp_path / name / f"{name}.es.sql").write_text("SELECT 1;")
+        manifest = str(tmp_path / "manifest.json")
+
+        assert set(get_sql_test_files(path=str(tmp_path / "x"), manifest_path=manifest)) == {"x"}
+        assert set(get_sql_test_files(path=str(tmp_path / "y"), manifest_path=manifest)) == {"y"}